@@ -30,36 +30,80 @@ LOG = log.getLogger(__name__)
 class AlarmsController(RootRestController):
 
     @pecan.expose('json')
-    def index(self, vitrage_id=None):
-        return self.post(vitrage_id)
+    def index(self, vitrage_id=None, limit=None, offset=None,
+              count_only=None, fields=None):
+        return self.post(vitrage_id, limit, offset, count_only, fields)
 
     @pecan.expose('json')
-    def post(self, vitrage_id):
+    def post(self, vitrage_id, limit=None, offset=None, count_only=None,
+             fields=None):
+        """List the alarms
+
+        :param limit: return at most limit alarms
+        :param offset: skip the first offset alarms
+        :param count_only: 'true' to return only {'count': <alarms number>}
+        :param fields: comma separated properties to return for each alarm
+        """
         enforce("list alarms", pecan.request.headers,
                 pecan.request.enforcer, {})
 
         LOG.info(_LI('received list alarms with vitrage id %s') %
                  vitrage_id)
 
+        try:
+            options = self._parse_options(limit, offset, count_only, fields)
+        except ValueError as e:
+            abort(400, str(e))
+
         try:
             if pecan.request.cfg.api.use_mock_file:
                 return self.get_mock_data('alarms.sample.json')
             else:
-                return self.get_alarms(vitrage_id)
+                return self.get_alarms(vitrage_id, **options)
         except Exception as e:
             LOG.exception('failed to get alarms %s', e)
             abort(404, str(e))
 
     @staticmethod
-    def get_alarms(vitrage_id=None):
+    def _parse_options(limit, offset, count_only, fields):
+        """The paging and projection options given to the request
+
+        Only the given options are passed on to vitrage-graph.
+        """
+        options = {}
+        if limit is not None:
+            options['limit'] = int(limit)
+            if options['limit'] < 0:
+                raise ValueError('limit must not be negative')
+        if offset is not None:
+            options['offset'] = int(offset)
+            if options['offset'] < 0:
+                raise ValueError('offset must not be negative')
+        if count_only is not None:
+            if not isinstance(count_only, bool):
+                count_only = str(count_only).lower() in ('true', '1', 'yes')
+            options['count_only'] = count_only
+        if fields is not None:
+            if not isinstance(fields, list):
+                fields = [field.strip() for field in fields.split(',')
+                          if field.strip()]
+            options['fields'] = fields
+        return options
+
+    @staticmethod
+    def get_alarms(vitrage_id=None, **options):
+        """The alarms list, or {'count': ...} if options['count_only']"""
         alarms_json = pecan.request.client.call(pecan.request.context,
                                                 'get_alarms',
-                                                arg=vitrage_id)
+                                                arg=vitrage_id,
+                                                **options)
         LOG.info(alarms_json)
 
         try:
-            alarms_list = json.loads(alarms_json)['alarms']
-            return alarms_list
+            alarms = json.loads(alarms_json)
+            if options.get('count_only'):
+                return alarms
+            return alarms['alarms']
 
         except Exception as e:
             LOG.exception('failed to open file %s ', e)
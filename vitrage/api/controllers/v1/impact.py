@@ -0,0 +1,59 @@
+# Copyright 2016 - Nokia Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+
+import pecan
+
+from oslo_log import log
+from pecan.core import abort
+from vitrage.api.controllers.rest import RootRestController
+from vitrage.api.policy import enforce
+
+# noinspection PyProtectedMember
+from vitrage.i18n import _LI
+
+
+LOG = log.getLogger(__name__)
+
+
+class ImpactController(RootRestController):
+    @pecan.expose('json')
+    def get(self, resource_id):
+        """The resources impacted if a resource goes down
+
+        :param resource_id: the vitrage id of the resource
+        :return: {'impacted': list of resources}
+        """
+        enforce('get impact', pecan.request.headers,
+                pecan.request.enforcer, {})
+
+        LOG.info(_LI('received show impact with resource id %s') %
+                 resource_id)
+        if pecan.request.cfg.api.use_mock_file:
+            return {'impacted': []}
+        else:
+            return self.get_impact(resource_id)
+
+    @staticmethod
+    def get_impact(resource_id):
+        try:
+            impact_data = pecan.request.client.call(pecan.request.context,
+                                                    'get_impact',
+                                                    root=resource_id)
+            return json.loads(impact_data)
+
+        except Exception as e:
+            LOG.exception('failed to get impact %s ', e)
+            abort(404, str(e))
@@ -40,6 +40,38 @@ class RCAController(RootRestController):
         else:
             return self.get_rca(alarm_id)
 
+    @pecan.expose('json')
+    def post(self, alarm_ids):
+        """The RCA of several alarms, e.g. of the alarms of a page
+
+        :param alarm_ids: list, or comma separated string, of alarm ids
+        :return: {alarm id: the RCA graph of the alarm}
+        """
+        enforce('get rca', pecan.request.headers,
+                pecan.request.enforcer, {})
+
+        if not isinstance(alarm_ids, list):
+            alarm_ids = [alarm_id.strip() for alarm_id in alarm_ids.split(',')
+                         if alarm_id.strip()]
+        LOG.info(_LI('received show rca with alarm ids %s') % alarm_ids)
+        if pecan.request.cfg.api.use_mock_file:
+            graph = self.get_mock_data('rca.sample.json')
+            return {alarm_id: graph for alarm_id in alarm_ids}
+        else:
+            return self.get_rcas(alarm_ids)
+
+    @staticmethod
+    def get_rcas(alarm_ids):
+        try:
+            graphs_data = pecan.request.client.call(pecan.request.context,
+                                                    'get_rcas',
+                                                    roots=alarm_ids)
+            return json.loads(graphs_data)
+
+        except Exception as e:
+            LOG.exception('failed to get rcas %s ', e)
+            abort(404, str(e))
+
     @staticmethod
     def get_rca(alarm_id):
         try:
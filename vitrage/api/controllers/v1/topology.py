@@ -23,6 +23,7 @@ from vitrage.api.controllers.rest import RootRestController
 from vitrage.api.policy import enforce
 from vitrage.common.constants import VertexProperties as VProps
 from vitrage.datasources import OPENSTACK_CLUSTER
+from vitrage.graph.driver.networkx_graph import merge_output_graph_parts
 
 # noinspection PyProtectedMember
 from vitrage.i18n import _LI
@@ -56,13 +57,10 @@ class TopologyController(RootRestController):
     def get_graph(graph_type, depth, query, root):
 
         try:
-            graph_data = pecan.request.client.call(pecan.request.context,
-                                                   'get_topology',
-                                                   graph_type=graph_type,
-                                                   depth=depth,
-                                                   query=query, root=root)
-            LOG.info(graph_data)
-            graph = json.loads(graph_data)
+            graph = TopologyController._get_topology_parts(graph_type,
+                                                           depth,
+                                                           query,
+                                                           root)
             if graph_type == 'graph':
                 return graph
             if graph_type == 'tree':
@@ -77,3 +75,34 @@ class TopologyController(RootRestController):
         except Exception as e:
             LOG.exception('failed to get topology %s ', e)
             abort(404, str(e))
+
+    @staticmethod
+    def _get_topology_parts(graph_type, depth, query, root):
+        """Get the topology part by part, and merge the parts
+
+        The topology is never encoded as a whole, neither by vitrage-graph
+        nor here.
+        """
+        client = pecan.request.client
+        reply = client.call(pecan.request.context,
+                            'get_topology',
+                            graph_type=graph_type,
+                            depth=depth,
+                            query=query,
+                            root=root,
+                            chunked=True)
+        if not reply or reply.get('part') is None:
+            raise ValueError('No topology was returned')
+
+        def parts(reply):
+            yield reply['part']
+            while not reply['last']:
+                reply = client.call(pecan.request.context,
+                                    'get_topology_part',
+                                    stream_id=reply['stream_id'])
+                if reply.get('part') is None:
+                    raise ValueError('Topology stream %s expired' %
+                                     reply['stream_id'])
+                yield reply['part']
+
+        return merge_output_graph_parts(parts(reply))
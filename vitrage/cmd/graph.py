@@ -23,7 +23,9 @@ from vitrage.common.constants import EntityCategory
 from vitrage.datasources import launcher as datasource_launcher
 from vitrage.datasources import OPENSTACK_CLUSTER
 from vitrage.entity_graph.api_handler import service as api_handler_svc
+from vitrage.entity_graph.checkpoint import GraphCheckpoint
 from vitrage.entity_graph.consistency import service as consistency_svc
+from vitrage.entity_graph.impact_index import ImpactIndex
 from vitrage.entity_graph.initialization_status import InitializationStatus
 from vitrage.entity_graph.processor import entity_graph
 from vitrage.entity_graph import service as entity_graph_svc
@@ -43,7 +45,8 @@ def main():
 
     conf = service.prepare_service()
     init_status = InitializationStatus()
-    mp_queue, evaluator_queue, evaluator, e_graph = init(conf)
+    mp_queue, evaluator_queue, evaluator, e_graph, impact_index = \
+        init(conf, init_status)
     launcher = os_service.ServiceLauncher(conf)
     datasources = datasource_launcher.Launcher(
         conf,
@@ -53,7 +56,7 @@ def main():
         conf, mp_queue, evaluator_queue, evaluator, e_graph, init_status))
 
     launcher.launch_service(api_handler_svc.VitrageApiHandlerService(
-        conf, e_graph))
+        conf, e_graph, impact_index))
 
     datasources.launch()
 
@@ -63,17 +66,30 @@ def main():
     launcher.wait()
 
 
-def init(conf):
+def init(conf, init_status):
     mp_queue = multiprocessing.Queue()
     evaluator_q = queue.Queue()
     e_graph = entity_graph.EntityGraph(
         'Entity Graph',
-        '%s:%s' % (EntityCategory.RESOURCE, OPENSTACK_CLUSTER))
+        '%s:%s' % (EntityCategory.RESOURCE, OPENSTACK_CLUSTER),
+        conf.entity_graph.indexed_properties,
+        conf.entity_graph.compact_storage,
+        conf.entity_graph.range_indexed_properties,
+        conf.entity_graph.columnar_scan)
+
+    # Load the checkpoint before the evaluator subscribes to the graph
+    init_status.checkpoint_timestamp = \
+        GraphCheckpoint(conf, e_graph).load()
+
+    # Built before any event is processed, and then kept up to date by the
+    # graph notifications on the processing thread
+    impact_index = ImpactIndex(e_graph)
+
     scenario_repo = ScenarioRepository(conf)
 
     evaluator = ScenarioEvaluator(conf, e_graph, scenario_repo, evaluator_q)
 
-    return mp_queue, evaluator_q, evaluator, e_graph
+    return mp_queue, evaluator_q, evaluator, e_graph, impact_index
 
 
 if __name__ == "__main__":
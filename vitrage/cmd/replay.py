@@ -0,0 +1,139 @@
+# Copyright 2016 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from __future__ import print_function
+
+import sys
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+
+from vitrage.common.constants import EntityCategory
+from vitrage.datasources import OPENSTACK_CLUSTER
+from vitrage.entity_graph.checkpoint import GraphCheckpoint
+from vitrage.entity_graph.initialization_status import InitializationStatus
+from vitrage.entity_graph.journal import read_events
+from vitrage.entity_graph.processor import entity_graph
+from vitrage.entity_graph.processor import processor as proc
+from vitrage.evaluator.scenario_evaluator import ScenarioEvaluator
+from vitrage.evaluator.scenario_repository import ScenarioRepository
+from vitrage import service
+
+LOG = log.getLogger(__name__)
+
+REPLAY_OPTS = [
+    cfg.StrOpt('journal-dir',
+               help='The journal to replay. Defaults to [entity_graph] '
+                    'journal_dir.'),
+    cfg.BoolOpt('from-checkpoint',
+                default=False,
+                help='Load [entity_graph] checkpoint_file first, and replay '
+                     'only the events journaled after it was written.'),
+]
+
+
+class _DiscardingQueue(object):
+    """The evaluator queue of the replay
+
+    The events the evaluator generated in production are in the journal, so
+    the events it generates during the replay are not processed again.
+    """
+
+    def put(self, item, block=True, timeout=None):
+        pass
+
+
+def main():
+    """Replays an event journal into a new entity graph
+
+    The events are fed, at full speed, to a fresh Processor with a
+    ScenarioEvaluator subscribed to its graph; no notification is sent.
+    Used to rebuild the graph after a crash, together with a checkpoint,
+    and to reproduce production traffic as a load test.
+    """
+
+    conf = cfg.ConfigOpts()
+    conf.register_cli_opts(REPLAY_OPTS)
+    service.prepare_service(conf=conf)
+    conf.set_override('notifier_topic', None, 'entity_graph')
+
+    journal_dir = conf.journal_dir or conf.entity_graph.journal_dir
+    if not journal_dir:
+        print('No journal directory was given', file=sys.stderr)
+        return 1
+
+    init_status = InitializationStatus()
+    e_graph = entity_graph.EntityGraph(
+        'Entity Graph',
+        '%s:%s' % (EntityCategory.RESOURCE, OPENSTACK_CLUSTER),
+        conf.entity_graph.indexed_properties,
+        conf.entity_graph.compact_storage,
+        conf.entity_graph.range_indexed_properties,
+        conf.entity_graph.columnar_scan)
+
+    since = None
+    if conf.from_checkpoint:
+        checkpoint = GraphCheckpoint(conf, e_graph)
+        if not checkpoint.load():
+            print('Failed to load the graph checkpoint', file=sys.stderr)
+            return 1
+        since = checkpoint.checkpoint_time
+        # The graph was checkpointed once initialized, and the journal has
+        # no end message for it: the events are evaluated from the start
+        init_status.status = InitializationStatus.FINISHED
+
+    evaluator = ScenarioEvaluator(conf,
+                                  e_graph,
+                                  ScenarioRepository(conf),
+                                  _DiscardingQueue())
+    processor = proc.Processor(conf, init_status, e_graph=e_graph)
+
+    num_events, duration = replay(read_events(journal_dir, since),
+                                  processor,
+                                  evaluator)
+
+    print('Replayed %d events in %.3f seconds (%.1f events per second), '
+          'the graph has %d vertices and %d edges' %
+          (num_events, duration, num_events / duration if duration else 0,
+           e_graph.num_vertices(), e_graph.num_edges()))
+    return 0
+
+
+def replay(events, processor, evaluator):
+    """Process journal events
+
+    As in vitrage-graph, the evaluator is enabled once all the datasources
+    sent their end message, or from the first event if the processor's
+    initialization status is already past that, e.g. after a checkpoint.
+
+    :param events: (time, event) tuples, as returned by read_events()
+    :return: the number of events and the processing time in seconds
+    """
+    num_events = 0
+    start_time = time.time()
+    for event_time, event in events:
+        if not evaluator.enabled and processor.initialization_status.status \
+                != InitializationStatus.STARTED:
+            evaluator.enabled = True
+        try:
+            processor.process_event(event)
+        except Exception as e:
+            LOG.exception("Exception: %s", e)
+        num_events += 1
+    return num_events, time.time() - start_time
+
+
+if __name__ == "__main__":
+    sys.exit(main())
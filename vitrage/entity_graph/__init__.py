@@ -15,6 +15,12 @@
 
 from oslo_config import cfg
 
+from vitrage.graph.driver.networkx_graph import DEFAULT_INDEXED_PROPERTIES
+from vitrage.graph.driver.networkx_graph import \
+    DEFAULT_RANGE_INDEXED_PROPERTIES
+from vitrage.graph.driver.notifier import Notifier
+from vitrage.graph.driver.notifier import OverflowPolicy
+
 
 OPTS = [
     cfg.StrOpt('datasources_values_dir',
@@ -26,4 +32,79 @@ OPTS = [
                default='vitrage.graph',
                help='The topic that vitrage-graph uses for alarm '
                     'notification messages.'),
+    cfg.IntOpt('notifier_queue_size',
+               default=Notifier.MAX_QUEUE_SIZE,
+               min=1,
+               help='The number of alarm notifications that can wait for '
+                    'the message bus. The notifications are sent by a '
+                    'worker, so a slow message bus does not delay the '
+                    'processing of the events until the queue is full.'),
+    cfg.StrOpt('notifier_overflow_policy',
+               default=OverflowPolicy.BLOCK,
+               choices=OverflowPolicy.policies,
+               help='What to do with an alarm notification when the '
+                    'notifier queue is full: block until there is room, or '
+                    'drop the oldest or the new notification.'),
+    cfg.IntOpt('notifier_stats_interval',
+               default=300,
+               min=0,
+               help='Interval in seconds between the logs of the delivery '
+                    'metrics of the alarm notifications: queued, delivered '
+                    'and dropped notifications, and their lag. 0 to never '
+                    'log them.'),
+    cfg.ListOpt('indexed_properties',
+                default=list(DEFAULT_INDEXED_PROPERTIES),
+                help='Vertex properties that the entity graph keeps a hash '
+                     'index for. Equality filters on these properties are '
+                     'served from the index instead of a full graph scan.'),
+    cfg.ListOpt('range_indexed_properties',
+                default=list(DEFAULT_RANGE_INDEXED_PROPERTIES),
+                help='Vertex properties that the entity graph keeps a sorted '
+                     'index for. Range queries (<, <=, >, >=) on these '
+                     'properties, such as the consistency queries on the '
+                     'sample timestamp, only look at the matching range.'),
+    cfg.BoolOpt('columnar_scan',
+                default=False,
+                help='Evaluate the topology and alarm queries that no index '
+                     'can serve as vectorized scans over a columnar mirror of '
+                     'the vertex properties. Requires NumPy.'),
+    cfg.BoolOpt('compact_storage',
+                default=False,
+                help='Keep the well known vertex properties of the entity '
+                     'graph in dictionary encoded, column based storage '
+                     'instead of a dict per vertex. Reduces the memory '
+                     'footprint of large graphs at the cost of slightly '
+                     'slower property access.'),
+    cfg.StrOpt('checkpoint_file',
+               help='A local file for periodic checkpoints of the entity '
+                    'graph. If set, vitrage-graph loads the checkpoint on '
+                    'startup, so the graph can be queried before all the '
+                    'datasources sent their first snapshot.'),
+    cfg.IntOpt('checkpoint_interval',
+               default=300,
+               min=1,
+               help='Interval in seconds between entity graph checkpoints.'),
+    cfg.StrOpt('journal_dir',
+               help='A local directory for the journal of the events '
+                    'processed by the entity graph. If set, every event is '
+                    'appended to the journal before it is processed, and '
+                    'the journal can be replayed with vitrage-replay.'),
+    cfg.IntOpt('journal_segment_size',
+               default=64,
+               min=1,
+               help='Size in MB from which a new journal segment file is '
+                    'started.'),
+    cfg.IntOpt('journal_max_segments',
+               default=16,
+               min=0,
+               help='Number of journal segment files to keep, 0 keeps all '
+                    'of them.'),
+    cfg.IntOpt('journal_fsync_interval',
+               default=1,
+               min=0,
+               help='Interval in seconds between the fsyncs of the journal, '
+                    'which bound the events lost on a host crash. 0 fsyncs '
+                    'every appended event. The journal is also fsynced '
+                    'before every checkpoint and when a segment is '
+                    'closed.'),
 ]
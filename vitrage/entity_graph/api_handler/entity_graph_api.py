@@ -12,8 +12,12 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import itertools
 import json
+import time
+
 from oslo_log import log
+from oslo_utils import uuidutils
 
 from vitrage.common.constants import EdgeLabel
 from vitrage.common.constants import EdgeProperties as EProps
@@ -23,8 +27,12 @@ from vitrage.datasources.nova.host import NOVA_HOST_DATASOURCE
 from vitrage.datasources.nova.instance import NOVA_INSTANCE_DATASOURCE
 from vitrage.datasources.nova.zone import NOVA_ZONE_DATASOURCE
 from vitrage.datasources import OPENSTACK_CLUSTER
+from vitrage.entity_graph.impact_index import ImpactIndex
 from vitrage.graph import create_algorithm
 from vitrage.graph import Direction
+from vitrage.graph.driver.networkx_graph import merge_output_graph_parts
+from vitrage.graph.driver.networkx_graph import select_vertices
+from vitrage.graph import Vertex
 
 LOG = log.getLogger(__name__)
 
@@ -34,14 +42,10 @@ TREE_TOPOLOGY_QUERY = {
         {'==': {VProps.CATEGORY: EntityCategory.RESOURCE}},
         {'==': {VProps.IS_DELETED: False}},
         {'==': {VProps.IS_PLACEHOLDER: False}},
-        {
-            'or': [
-                {'==': {VProps.TYPE: OPENSTACK_CLUSTER}},
-                {'==': {VProps.TYPE: NOVA_INSTANCE_DATASOURCE}},
-                {'==': {VProps.TYPE: NOVA_HOST_DATASOURCE}},
-                {'==': {VProps.TYPE: NOVA_ZONE_DATASOURCE}}
-            ]
-        }
+        {'in': {VProps.TYPE: [OPENSTACK_CLUSTER,
+                              NOVA_INSTANCE_DATASOURCE,
+                              NOVA_HOST_DATASOURCE,
+                              NOVA_ZONE_DATASOURCE]}}
     ]
 }
 
@@ -74,30 +78,100 @@ ALARMS_ALL_QUERY = {
 
 
 class EntityGraphApis(object):
-    def __init__(self, entity_graph):
+
+    # Seconds after which a chunked topology that was not read to the end
+    # is dropped
+    STREAM_TIMEOUT = 300
+    # Maximal number of chunked topologies being read, the oldest one is
+    # dropped in favor of a new one
+    MAX_STREAMS = 16
+
+    # Properties that get_alarms adds to the alarms
+    RESOURCE_ID = 'resource_id'
+    RESOURCE_TYPE = 'resource_type'
+
+    def __init__(self, entity_graph, impact_index=None):
+        """Create the EntityGraphApis
+
+        :param impact_index: the ImpactIndex of entity_graph, built and
+        subscribed to its notifications before the graph is changed by the
+        processor; built here if None
+        """
         self.entity_graph = entity_graph
+        # stream id -> (start time, iterator of output_graph_parts())
+        self._streams = {}
+        self._impact_index = impact_index if impact_index is not None \
+            else ImpactIndex(entity_graph)
+
+    def get_alarms(self, ctx, arg, limit=None, offset=0, count_only=False,
+                   fields=None):
+        """The alarms, of all the graph or of the resource arg, as JSON
 
-    def get_alarms(self, ctx, arg):
+        The alarms are ordered by vitrage id, so that the pages of
+        consecutive calls follow each other.
+
+        :param limit: return at most limit alarms
+        :param offset: skip the first offset alarms
+        :param count_only: return {'count': number of alarms} instead
+        :param fields: if given, the alarms have only these properties
+        (resource_id and resource_type included)
+        """
         LOG.debug("EntityGraphApis get_alarms arg:%s", str(arg))
-        vitrage_id = arg
-        if not vitrage_id or vitrage_id == 'all':
-            items_list = self.entity_graph.get_vertices(
-                query_dict=ALARMS_ALL_QUERY)
-        else:
-            items_list = self.entity_graph.neighbors(
-                vitrage_id,
-                vertex_attr_filter={VProps.CATEGORY: EntityCategory.ALARM,
-                                    VProps.IS_DELETED: False})
+        alarm_filter = {VProps.CATEGORY: EntityCategory.ALARM,
+                        VProps.IS_DELETED: False}
+        resource_fields = (self.RESOURCE_ID, self.RESOURCE_TYPE)
+        graph_fields = None
+        if fields is not None:
+            graph_fields = [field for field in fields
+                            if field not in resource_fields]
+
+        with self.entity_graph.snapshot() as graph:
+            vitrage_id = arg
+            if not vitrage_id or vitrage_id == 'all':
+                # Same as ALARMS_ALL_QUERY, as an attribute filter so it is
+                # served by the graph property indexes
+                items_list = graph.get_vertices(
+                    vertex_attr_filter=alarm_filter,
+                    limit=limit,
+                    offset=offset,
+                    count_only=count_only,
+                    fields=graph_fields)
+            else:
+                neighbors = graph.neighbors(vitrage_id,
+                                            vertex_attr_filter=alarm_filter)
+                items_list = select_vertices(
+                    ((v.vertex_id, v.properties) for v in neighbors),
+                    Vertex, limit, offset, count_only, graph_fields)
+
+            if count_only:
+                return json.dumps({'count': items_list})
+            # A page is already in order; the unpaged alarms are in the
+            # order of the index and adjacency sets
+            items_list.sort(key=lambda alarm: str(alarm.vertex_id))
+
+            if fields is None or any(field in resource_fields
+                                     for field in fields):
+                # TODO(alexey) this should not be here, but in the transformer
+                alarms = self._add_resource_details_to_alarms(graph,
+                                                              items_list)
+            else:
+                alarms = [dict(alarm.properties) for alarm in items_list]
 
-        # TODO(alexey) this should not be here, but in the transformer
-        modified_alarms = self._add_resource_details_to_alarms(items_list)
+        if fields is not None:
+            alarms = [{field: alarm[field] for field in fields
+                       if field in alarm}
+                      for alarm in alarms]
+        return json.dumps({'alarms': alarms})
 
-        return json.dumps({'alarms': [v.properties for v in modified_alarms]})
+    def get_topology(self, ctx, graph_type, depth, query, root,
+                     chunked=False):
+        """The topology, as output_graph() JSON
 
-    def get_topology(self, ctx, graph_type, depth, query, root):
+        :param chunked: return instead the first output_graph_parts() part,
+        see get_topology_part()
+        """
         LOG.debug("EntityGraphApis get_topology root:%s", str(root))
 
-        ga = create_algorithm(self.entity_graph)
         if graph_type == 'tree':
             if query:
                 final_query = query
@@ -107,31 +181,122 @@ class EntityGraphApis(object):
         else:
             final_query = query if query else TOPOLOGY_AND_ALARMS_QUERY
 
-        found_graph = ga.graph_query_vertices(
-            query_dict=final_query,
-            root_id=root,
-            depth=depth)
+        # A snapshot, so the query does not see half applied updates
+        with self.entity_graph.snapshot() as graph:
+            ga = create_algorithm(graph)
+            found_graph = ga.graph_query_vertices(
+                query_dict=final_query,
+                root_id=root,
+                depth=depth)
 
+        if chunked:
+            return self._start_stream(found_graph.output_graph_parts())
         return found_graph.output_graph()
 
+    def get_topology_part(self, ctx, stream_id):
+        """The next part of a chunked get_topology()
+
+        :return: {'stream_id': ..., 'part': ..., 'last': ...}, part is
+        None if the stream is unknown or expired
+        """
+        self._purge_streams(time.time())
+        parts = self._streams.get(stream_id)
+        if parts is None:
+            LOG.warning('Unknown topology stream %s', stream_id)
+            return {'stream_id': stream_id, 'part': None, 'last': True}
+        return self._next_part(stream_id, parts[1])
+
+    def _start_stream(self, parts):
+        now = time.time()
+        self._purge_streams(now)
+        while len(self._streams) >= self.MAX_STREAMS:
+            oldest_id = min(self._streams,
+                            key=lambda s_id: self._streams[s_id][0])
+            LOG.warning('Too many topology streams, dropping stream %s',
+                        oldest_id)
+            del self._streams[oldest_id]
+
+        stream_id = uuidutils.generate_uuid()
+        self._streams[stream_id] = (now, parts)
+        return self._next_part(stream_id, parts)
+
+    def _purge_streams(self, now):
+        # Streams that were not read to the end expire
+        for stream_id, (start_time, _) in list(self._streams.items()):
+            if now - start_time > self.STREAM_TIMEOUT:
+                LOG.info('Topology stream %s expired', stream_id)
+                del self._streams[stream_id]
+
+    def _next_part(self, stream_id, parts):
+        part = next(parts, None)
+        # Read one part ahead, to tell the last part
+        following = next(parts, None)
+        if following is None:
+            self._streams.pop(stream_id, None)
+            return {'stream_id': stream_id, 'part': part, 'last': True}
+        self._streams[stream_id] = \
+            (self._streams[stream_id][0], itertools.chain([following], parts))
+        return {'stream_id': stream_id, 'part': part, 'last': False}
+
     def get_rca(self, ctx, root):
         LOG.debug("EntityGraphApis get_rca root:%s", str(root))
 
-        ga = create_algorithm(self.entity_graph)
-        found_graph_in = ga.graph_query_vertices(
-            query_dict=RCA_QUERY,
-            root_id=root,
-            direction=Direction.IN)
-        found_graph_out = ga.graph_query_vertices(
-            query_dict=RCA_QUERY,
-            root_id=root,
-            direction=Direction.OUT)
-        unified_graph = found_graph_in
-        unified_graph.union(found_graph_out)
+        with self.entity_graph.snapshot() as graph:
+            ga = create_algorithm(graph)
+            unified_graph = ga.graph_query_vertices_union(
+                query_dict=RCA_QUERY,
+                root_id=root,
+                directions=(Direction.IN, Direction.OUT))
         json_graph = unified_graph.output_graph(
             inspected_index=self._find_rca_index(unified_graph, root))
         return json_graph
 
+    def get_rcas(self, ctx, roots):
+        """The get_rca() graphs of several alarms, as JSON
+
+        The causal alarms connected to the roots are traversed once for all
+        the roots, e.g. for the alarms of a console page.
+
+        :param roots: alarm vitrage ids
+        :return: {root: the get_rca() graph of root}, whose graph is empty
+        if root is not a known alarm
+        """
+        LOG.debug("EntityGraphApis get_rcas roots:%s", str(roots))
+
+        with self.entity_graph.snapshot() as graph:
+            ga = create_algorithm(graph)
+            found_graphs = ga.graph_query_vertices_unions(
+                query_dict=RCA_QUERY,
+                root_ids=roots,
+                directions=(Direction.IN, Direction.OUT))
+        return json.dumps({
+            root: merge_output_graph_parts(found_graph.output_graph_parts(
+                inspected_index=self._find_rca_index(found_graph, root)))
+            for root, found_graph in found_graphs.items()})
+
+    def get_impact(self, ctx, root):
+        """The resources impacted by a resource, as JSON
+
+        The resources impacted by a resource are the resources that depend
+        on it, transitively, by contains or attached relationships, e.g. the
+        hosts and instances of a zone. They are found in an ImpactIndex, so
+        only the impacted resources are read.
+
+        :param root: the vitrage id of the resource
+        :return: {'impacted': properties of the impacted resources}, that
+        are empty if root is not a known resource
+        """
+        LOG.debug("EntityGraphApis get_impact root:%s", str(root))
+
+        impacted = []
+        with self.entity_graph.snapshot() as graph:
+            for vertex_id in self._impact_index.impacted_ids(root):
+                vertex = graph.get_vertex(vertex_id)
+                if vertex is not None and \
+                        not vertex.get(VProps.IS_DELETED, False):
+                    impacted.append(dict(vertex.properties))
+        return json.dumps({'impacted': impacted})
+
     @staticmethod
     def _get_first(lst):
         if len(lst) == 1:
@@ -139,28 +304,37 @@ class EntityGraphApis(object):
         else:
             return None
 
-    def _add_resource_details_to_alarms(self, alarms):
-        incorrect_alarms = []
+    @classmethod
+    def _add_resource_details_to_alarms(cls, graph, alarms):
+        """Properties of the alarms, with the details of their resource
+
+        :param graph: the graph the (possibly read only) alarms came from
+        :return: a new properties dict for each alarm
+        :rtype: list of dict
+        """
+        alarms_properties = []
         for alarm in alarms:
             try:
-                resources = self.entity_graph.neighbors(
+                resources = graph.neighbors(
                     v_id=alarm.vertex_id,
                     edge_attr_filter={EProps.RELATIONSHIP_TYPE: EdgeLabel.ON},
                     direction=Direction.OUT)
 
-                resource = self._get_first(resources)
+                properties = dict(alarm.properties)
+                resource = cls._get_first(resources)
                 if resource:
-                    alarm["resource_id"] = resource.get(VProps.ID, '')
-                    alarm["resource_type"] = resource.get(VProps.TYPE, '')
+                    properties[cls.RESOURCE_ID] = resource.get(VProps.ID, '')
+                    properties[cls.RESOURCE_TYPE] = \
+                        resource.get(VProps.TYPE, '')
                 else:
-                    alarm["resource_id"] = ''
-                    alarm["resource_type"] = ''
+                    properties[cls.RESOURCE_ID] = ''
+                    properties[cls.RESOURCE_TYPE] = ''
+                alarms_properties.append(properties)
 
             except ValueError as ve:
-                incorrect_alarms.append(alarm)
                 LOG.error('Alarm %s\nException %s', alarm, ve)
 
-        return [item for item in alarms if item not in incorrect_alarms]
+        return alarms_properties
 
     @staticmethod
     def _find_rca_index(found_graph, root):
@@ -28,10 +28,11 @@ eventlet.monkey_patch()
 
 class VitrageApiHandlerService(os_service.Service):
 
-    def __init__(self, conf, e_graph):
+    def __init__(self, conf, e_graph, impact_index=None):
         super(VitrageApiHandlerService, self).__init__()
         self.conf = conf
         self.entity_graph = e_graph
+        self.impact_index = impact_index
 
     def start(self):
         LOG.info("Vitrage Api Handler Service - Starting...")
@@ -43,7 +44,7 @@ class VitrageApiHandlerService(os_service.Service):
         target = oslo_messaging.Target(topic=self.conf.rpc_topic,
                                        server=rabbit_hosts)
 
-        endpoints = [EntityGraphApis(self.entity_graph), ]
+        endpoints = [EntityGraphApis(self.entity_graph, self.impact_index)]
 
         server = vitrage_rpc.get_server(target, endpoints, transport)
 
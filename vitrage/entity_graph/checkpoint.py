@@ -0,0 +1,151 @@
+# Copyright 2016 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Checkpoints of the entity graph on local disk
+
+A checkpoint holds the vertices and edges of the entity graph, including the
+deduced alarms, as zlib compressed JSON. vitrage-graph loads it on
+startup, so the graph can be queried before the datasources sent their
+first snapshot. The entities that are not refreshed by the first snapshot
+are then marked as deleted by the consistency initializing process.
+
+JSON is data only, so a crafted checkpoint file can not run code when it is
+loaded. Property values that JSON can not represent are written as their
+str(), and tuples are loaded as lists.
+"""
+
+import json
+import os
+import time
+import zlib
+
+from oslo_log import log
+
+from vitrage.common.datetime_utils import utcnow
+from vitrage.graph import Direction
+from vitrage.graph import Edge
+from vitrage.graph import Vertex
+
+LOG = log.getLogger(__name__)
+
+MAGIC = b'VITRAGE-GRAPH-CHECKPOINT'
+# Versions 1 and 2 were pickles, which are not loaded as they could run code
+FORMAT_VERSION = 3
+
+
+class GraphCheckpoint(object):
+
+    def __init__(self, conf, entity_graph):
+        self.path = conf.entity_graph.checkpoint_file
+        self.entity_graph = entity_graph
+        # The time the loaded checkpoint was written, as time.time()
+        self.checkpoint_time = None
+
+    def is_enabled(self):
+        return bool(self.path)
+
+    def save(self):
+        """Write a checkpoint of the current state of the graph
+
+        The file is replaced atomically, so a crash while writing leaves the
+        previous checkpoint in place.
+        """
+        if not self.is_enabled():
+            return
+        try:
+            start_time = time.time()
+            with self.entity_graph.snapshot() as graph:
+                data = self._dumps(graph)
+
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(MAGIC)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.rename(tmp_path, self.path)
+
+            LOG.info('Graph checkpoint %s written, %s bytes - took %s',
+                     self.path, len(MAGIC) + len(data),
+                     str(time.time() - start_time))
+        except Exception as e:
+            LOG.exception('Failed to write graph checkpoint %s: %s',
+                          self.path, e)
+
+    def load(self):
+        """Add the vertices and edges of the checkpoint to the graph
+
+        :return: the time the checkpoint was loaded, or None if there is no
+        usable checkpoint
+        """
+        self.checkpoint_time = None
+        if not self.is_enabled() or not os.path.isfile(self.path):
+            return None
+        try:
+            start_time = time.time()
+            with open(self.path, 'rb') as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    LOG.error('%s is not a graph checkpoint', self.path)
+                    return None
+                try:
+                    content = json.loads(
+                        zlib.decompress(f.read()).decode('utf-8'))
+                except ValueError:
+                    LOG.error('Graph checkpoint %s is not in the format of '
+                              'version %s', self.path, FORMAT_VERSION)
+                    return None
+
+            if content.get('version') != FORMAT_VERSION:
+                LOG.error('Unsupported graph checkpoint version %s',
+                          content.get('version'))
+                return None
+
+            self.checkpoint_time = content['time']
+            load_timestamp = str(utcnow())
+            self.entity_graph.add_vertices(
+                [Vertex(v_id, properties)
+                 for v_id, properties in content['vertices']])
+            self.entity_graph.add_edges(
+                [Edge(source_id, target_id, label, properties)
+                 for source_id, target_id, label, properties
+                 in content['edges']])
+
+            LOG.info('Graph checkpoint %s of %s loaded, %s vertices - took '
+                     '%s', self.path, content['timestamp'],
+                     len(content['vertices']), str(time.time() - start_time))
+            return load_timestamp
+        except Exception as e:
+            LOG.exception('Failed to load graph checkpoint %s: %s',
+                          self.path, e)
+            return None
+
+    @staticmethod
+    def _dumps(graph):
+        vertices = []
+        edges = []
+        for vertex in graph.get_vertices():
+            vertices.append((vertex.vertex_id, dict(vertex.properties)))
+            for edge in graph.get_edges(vertex.vertex_id,
+                                        direction=Direction.OUT):
+                edges.append((edge.source_id, edge.target_id, edge.label,
+                              dict(edge.properties)))
+        content = {
+            'version': FORMAT_VERSION,
+            'timestamp': str(utcnow()),
+            'time': time.time(),
+            'vertices': vertices,
+            'edges': edges,
+        }
+        return zlib.compress(json.dumps(content, default=str,
+                                        separators=(',', ':')).encode('utf-8'))
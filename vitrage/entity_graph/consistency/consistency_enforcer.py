@@ -26,6 +26,7 @@ from vitrage.common.datetime_utils import utcnow
 from vitrage.datasources.consistency import CONSISTENCY_DATASOURCE
 from vitrage.datasources import OPENSTACK_CLUSTER
 from vitrage.evaluator.actions.evaluator_event_transformer import VITRAGE_TYPE
+from vitrage.graph.driver.notifier import ElementChange
 
 LOG = log.getLogger(__name__)
 
@@ -57,7 +58,7 @@ class ConsistencyEnforcer(object):
 
             self.evaluator.enabled = True
             timestamp = str(utcnow())
-            all_vertices = self.graph.get_vertices()
+            all_vertices = self.graph.read_only_view().get_vertices()
 
             self._run_evaluator(all_vertices)
 
@@ -65,6 +66,12 @@ class ConsistencyEnforcer(object):
 
             self._mark_old_deduced_alarms_as_deleted(timestamp)
 
+            checkpoint_timestamp = \
+                self.initialization_status.checkpoint_timestamp
+            if checkpoint_timestamp:
+                self._mark_checkpoint_leftovers_as_deleted(
+                    checkpoint_timestamp)
+
             self.initialization_status.status = \
                 self.initialization_status.FINISHED
 
@@ -104,7 +111,8 @@ class ConsistencyEnforcer(object):
             ]
         }
 
-        vertices = self.graph.get_vertices(query_dict=query)
+        vertices = self.graph.read_only_view().get_vertices(
+            query_dict=query)
 
         return set(self._filter_vertices_to_be_deleted(vertices))
 
@@ -117,7 +125,8 @@ class ConsistencyEnforcer(object):
             ]
         }
 
-        vertices = self.graph.get_vertices(query_dict=query)
+        vertices = self.graph.read_only_view().get_vertices(
+            query_dict=query)
 
         return self._filter_vertices_to_be_deleted(vertices)
 
@@ -129,12 +138,33 @@ class ConsistencyEnforcer(object):
                 {'<': {VProps.SAMPLE_TIMESTAMP: timestamp}}
             ]
         }
-        return self.graph.get_vertices(query_dict=query)
+        return self.graph.read_only_view().get_vertices(query_dict=query)
+
+    def _find_checkpoint_leftovers(self, checkpoint_timestamp):
+        """Entities loaded from a checkpoint and not sent again since"""
+        query = {
+            'and': [
+                {'!=': {VProps.TYPE: VITRAGE_TYPE}},
+                {'==': {VProps.IS_DELETED: False}},
+                {'<': {VProps.SAMPLE_TIMESTAMP: checkpoint_timestamp}}
+            ]
+        }
+
+        vertices = self.graph.read_only_view().get_vertices(
+            query_dict=query)
+
+        return self._filter_vertices_to_be_deleted(vertices)
+
+    def _mark_checkpoint_leftovers_as_deleted(self, checkpoint_timestamp):
+        leftovers = self._find_checkpoint_leftovers(checkpoint_timestamp)
+        LOG.info('Found %s vertices of the graph checkpoint that were not '
+                 'in the first snapshot', len(leftovers))
+        self._push_events_to_queue(leftovers, EventAction.DELETE_ENTITY)
 
     def _run_evaluator(self, vertices):
         start_time = time.time()
-        for vertex in vertices:
-            self.evaluator.process_event(None, vertex, True)
+        self.evaluator.process_events(
+            [ElementChange(None, vertex, True) for vertex in vertices])
         LOG.info('Run Evaluator on %s items - took %s', str(len(vertices)),
                  str(time.time() - start_time))
 
@@ -0,0 +1,144 @@
+# Copyright 2016 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Downstream impact of the resources of the entity graph
+
+The resources that depend on a resource are the targets of its contains and
+attached edges: a zone contains hosts, a host contains instances, a volume
+or a port is attached to an instance, and so on. ImpactIndex keeps these
+dependencies, and only them, apart from the graph, and updates them on
+every change of the graph. The resources impacted by a resource, i.e. its
+transitive dependents, are found by a traversal of the index that visits
+the impacted resources only, without reading the graph or filtering the
+edges of the other relationships (e.g. the alarms on the resources).
+
+The index follows the changed edges as a batch subscriber of the graph, and
+the removed vertices and edges as a removal subscriber. A changed edge is
+read back from the graph when its change is delivered, so that the changes
+held by a coalesce() block, and delivered after the removals in it, do not
+restore a removed edge.
+"""
+
+from collections import defaultdict
+from collections import deque
+
+from oslo_log import log
+
+from vitrage.common.constants import EdgeLabel
+from vitrage.common.constants import EdgeProperties as EProps
+from vitrage.graph import Direction
+from vitrage.graph import Vertex
+
+LOG = log.getLogger(__name__)
+
+DEPENDENCY_LABELS = frozenset([EdgeLabel.CONTAINS,
+                               EdgeLabel.ATTACHED,
+                               EdgeLabel.ATTACHED_PUBLIC,
+                               EdgeLabel.ATTACHED_PRIVATE])
+
+
+class ImpactIndex(object):
+
+    def __init__(self, graph):
+        self._graph = graph
+        # vertex id -> (id, label) of the vertices that directly depend on
+        # it, and back. The label tells parallel edges apart
+        self._dependents = defaultdict(set)
+        self._dependencies = defaultdict(set)
+
+        for vertex in graph.get_vertices():
+            for edge in graph.get_edges(vertex.vertex_id,
+                                        direction=Direction.OUT):
+                self._update_edge(edge)
+        graph.subscribe(self.process_changes, batch=True)
+        graph.subscribe_removals(self.process_removal)
+
+    def impacted_ids(self, vertex_id):
+        """The ids of the vertices that depend, transitively, on a vertex
+
+        :return: the ids in breadth first order, without vertex_id
+        :rtype: list
+        """
+        visited = {vertex_id}
+        impacted = []
+        queue = deque([vertex_id])
+        while queue:
+            for dependent_id, _ in self._dependents.get(queue.popleft(), ()):
+                if dependent_id not in visited:
+                    visited.add(dependent_id)
+                    impacted.append(dependent_id)
+                    queue.append(dependent_id)
+        return impacted
+
+    def process_changes(self, changes):
+        """Update the index, as a batch subscriber of the graph
+
+        :type changes: list of ElementChange
+        """
+        view = self._graph.read_only_view()
+        for change in changes:
+            if change.is_vertex:
+                continue
+            source_id, target_id, label = change.key
+            if label not in DEPENDENCY_LABELS:
+                continue
+            edge = view.get_edge(source_id, target_id, label)
+            if edge is None:
+                self._remove_edge(change.current or change.before)
+            else:
+                self._update_edge(edge)
+
+    def process_removal(self, item):
+        """Update the index, as a removal subscriber of the graph
+
+        :type item: Vertex or Edge
+        """
+        if isinstance(item, Vertex):
+            self._remove_vertex(item.vertex_id)
+        else:
+            self._remove_edge(item)
+
+    def _update_edge(self, edge):
+        if edge.label not in DEPENDENCY_LABELS:
+            return
+        if edge.get(EProps.IS_DELETED, False):
+            self._remove_edge(edge)
+        else:
+            self._dependents[edge.source_id].add((edge.target_id, edge.label))
+            self._dependencies[edge.target_id].add((edge.source_id,
+                                                    edge.label))
+
+    def _remove_edge(self, edge):
+        if edge.label not in DEPENDENCY_LABELS:
+            return
+        self._discard(self._dependents,
+                      edge.source_id,
+                      (edge.target_id, edge.label))
+        self._discard(self._dependencies,
+                      edge.target_id,
+                      (edge.source_id, edge.label))
+
+    def _remove_vertex(self, vertex_id):
+        for dependent_id, label in self._dependents.pop(vertex_id, ()):
+            self._discard(self._dependencies, dependent_id, (vertex_id, label))
+        for dependency_id, label in self._dependencies.pop(vertex_id, ()):
+            self._discard(self._dependents, dependency_id, (vertex_id, label))
+
+    @staticmethod
+    def _discard(adjacency, vertex_id, link):
+        links = adjacency.get(vertex_id)
+        if links is not None:
+            links.discard(link)
+            if not links:
+                del adjacency[vertex_id]
@@ -21,6 +21,8 @@ class InitializationStatus(object):
     def __init__(self):
         self.status = self.STARTED
         self.end_messages = {}
+        # The time a graph checkpoint was loaded, if any
+        self.checkpoint_timestamp = None
 
     def is_initialization_finished(self):
         return self.status == self.FINISHED
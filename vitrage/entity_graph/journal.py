@@ -0,0 +1,172 @@
+# Copyright 2016 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Write-ahead journal of the events processed by the entity graph
+
+Every event is appended to the journal before it is handed to the
+Processor. The journal is a directory of segment files; a segment is a
+sequence of records, each a 4 bytes big endian length followed by the UTF-8
+JSON of [time, event]. A new segment is started when the current one is larger
+than journal_segment_size, and on every start of the service, and only the
+last journal_max_segments segments are kept.
+
+Appended records are flushed to the operating system at once, and fsynced
+every journal_fsync_interval seconds (or on every append if it is 0),
+before every checkpoint and when their segment is closed.
+
+JSON is data only, so a crafted segment file can not run code when it is
+read. Event values that JSON can not represent are journaled as their str(),
+and tuples are read back as lists.
+
+read_events() reads the journal back, e.g. for vitrage-replay.
+"""
+
+import json
+import os
+import re
+import struct
+import time
+
+from oslo_log import log
+from oslo_utils import units
+
+LOG = log.getLogger(__name__)
+
+SEGMENT_FORMAT = 'events.%010d.journal'
+SEGMENT_PATTERN = re.compile(r'^events\.(\d{10})\.journal$')
+RECORD_HEADER = struct.Struct('>I')
+
+
+def segment_paths(journal_dir):
+    """The segment files of a journal, oldest first"""
+    if not journal_dir or not os.path.isdir(journal_dir):
+        return []
+    segments = []
+    for file_name in os.listdir(journal_dir):
+        match = SEGMENT_PATTERN.match(file_name)
+        if match:
+            segments.append((int(match.group(1)),
+                             os.path.join(journal_dir, file_name)))
+    return [path for index, path in sorted(segments)]
+
+
+def read_events(journal_dir, since=None):
+    """Read the events of a journal, in the order they were appended
+
+    A truncated record, as left by a crash while appending, or an
+    unreadable one, e.g. of the pickle journals of previous versions, ends
+    the segment it is in.
+
+    :param since: if given, skip the events appended before this time
+    :type since: float
+    :return: generator of (time, event)
+    """
+    for path in segment_paths(journal_dir):
+        with open(path, 'rb') as f:
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break
+                length, = RECORD_HEADER.unpack(header)
+                data = f.read(length)
+                if len(data) < length:
+                    LOG.warning('Truncated journal record in %s', path)
+                    break
+                try:
+                    event_time, event = json.loads(data.decode('utf-8'))
+                except ValueError:
+                    LOG.warning('Unreadable journal record in %s', path)
+                    break
+                if since is None or event_time >= since:
+                    yield event_time, event
+
+
+class EventJournal(object):
+
+    def __init__(self, conf):
+        self.journal_dir = conf.entity_graph.journal_dir
+        self.segment_size = conf.entity_graph.journal_segment_size * units.Mi
+        self.max_segments = conf.entity_graph.journal_max_segments
+        self.fsync_interval = conf.entity_graph.journal_fsync_interval
+        self._segment = None
+        self._segment_index = None
+
+    def is_enabled(self):
+        return bool(self.journal_dir)
+
+    def append(self, event):
+        """Append an event to the journal
+
+        Errors are logged, so that a failing journal does not stop the
+        processing of events.
+        """
+        try:
+            if self._segment is None or \
+                    self._segment.tell() >= self.segment_size:
+                self._rotate()
+            data = json.dumps([time.time(), event], default=str,
+                              separators=(',', ':')).encode('utf-8')
+            self._segment.write(RECORD_HEADER.pack(len(data)))
+            self._segment.write(data)
+            self._segment.flush()
+            if self.fsync_interval == 0:
+                os.fsync(self._segment.fileno())
+        except Exception as e:
+            LOG.exception('Failed to append an event to the journal %s: %s',
+                          self.journal_dir, e)
+
+    def sync(self):
+        """Fsync the events appended to the current segment"""
+        if self._segment is None:
+            return
+        try:
+            os.fsync(self._segment.fileno())
+        except Exception as e:
+            LOG.exception('Failed to fsync the journal %s: %s',
+                          self.journal_dir, e)
+
+    def close(self):
+        if self._segment is not None:
+            self.sync()
+            self._segment.close()
+            self._segment = None
+
+    def _rotate(self):
+        self.close()
+        if self._segment_index is None:
+            if not os.path.isdir(self.journal_dir):
+                os.makedirs(self.journal_dir)
+            # Never append to a segment of a previous run, its last record
+            # may be truncated
+            paths = segment_paths(self.journal_dir)
+            self._segment_index = self._index_of(paths[-1]) if paths else 0
+        self._segment_index += 1
+
+        path = os.path.join(self.journal_dir,
+                            SEGMENT_FORMAT % self._segment_index)
+        LOG.info('Starting journal segment %s', path)
+        self._segment = open(path, 'ab')
+        self._remove_old_segments()
+
+    def _remove_old_segments(self):
+        if self.max_segments <= 0:
+            return
+        paths = segment_paths(self.journal_dir)
+        for path in paths[:-self.max_segments]:
+            LOG.info('Removing journal segment %s', path)
+            os.remove(path)
+
+    @staticmethod
+    def _index_of(path):
+        return int(SEGMENT_PATTERN.match(os.path.basename(path)).group(1))
@@ -17,6 +17,9 @@ from oslo_log import log
 from vitrage.common.constants import EdgeProperties as EProps
 from vitrage.common.constants import VertexProperties as VProps
 from vitrage.common.datetime_utils import utcnow
+from vitrage.graph.driver.networkx_graph import DEFAULT_INDEXED_PROPERTIES
+from vitrage.graph.driver.networkx_graph import \
+    DEFAULT_RANGE_INDEXED_PROPERTIES
 from vitrage.graph import NXGraph
 
 
@@ -25,8 +28,19 @@ LOG = log.getLogger(__name__)
 
 class EntityGraph(NXGraph):
 
-    def __init__(self, name, root_id=None):
-        super(EntityGraph, self).__init__(name, root_id)
+    def __init__(self,
+                 name,
+                 root_id=None,
+                 indexed_properties=DEFAULT_INDEXED_PROPERTIES,
+                 compact_storage=False,
+                 range_indexed_properties=DEFAULT_RANGE_INDEXED_PROPERTIES,
+                 columnar_scan=False):
+        super(EntityGraph, self).__init__(name,
+                                          root_id,
+                                          indexed_properties,
+                                          compact_storage,
+                                          range_indexed_properties,
+                                          columnar_scan)
 
     def can_vertex_be_deleted(self, vertex):
         """Check if the vertex can be deleted
@@ -90,10 +104,25 @@ class EntityGraph(NXGraph):
         return (not graph_vertex) or (not new_vertex[VProps.IS_PLACEHOLDER])
 
     def update_entity_graph_vertex(self, graph_vertex, updated_vertex):
+        self._keep_non_placeholder_state(graph_vertex, updated_vertex)
+        self.update_vertex(updated_vertex)
+
+    def update_entity_graph_vertices(self, graph_and_updated_vertices):
+        """Update several vertices, notifying the subscribers once
+
+        :param graph_and_updated_vertices: (graph_vertex, updated_vertex)
+        pairs, as passed to update_entity_graph_vertex
+        """
+        updated_vertices = []
+        for graph_vertex, updated_vertex in graph_and_updated_vertices:
+            self._keep_non_placeholder_state(graph_vertex, updated_vertex)
+            updated_vertices.append(updated_vertex)
+        self.update_vertices(updated_vertices)
+
+    @staticmethod
+    def _keep_non_placeholder_state(graph_vertex, updated_vertex):
         if updated_vertex[VProps.IS_PLACEHOLDER] and \
                 graph_vertex and not graph_vertex[VProps.IS_PLACEHOLDER]:
 
             updated_vertex[VProps.IS_PLACEHOLDER] = False
             updated_vertex[VProps.IS_DELETED] = graph_vertex[VProps.IS_DELETED]
-
-        self.update_vertex(updated_vertex)
@@ -59,7 +59,9 @@ class Processor(processor.ProcessorBase):
         self._enrich_event(event)
         entity = self.transformer_manager.transform(event)
         self._calculate_aggregated_state(entity.vertex, entity.action)
-        self.actions[entity.action](entity.vertex, entity.neighbors)
+        # The subscribers get the changes of the event as one change-set
+        with self.entity_graph.notifier.coalesce():
+            self.actions[entity.action](entity.vertex, entity.neighbors)
 
     def create_entity(self, new_vertex, neighbors):
         """Adds new vertex to the entity graph
@@ -187,7 +189,14 @@ class Processor(processor.ProcessorBase):
 
     def do_on_initialization_end(self):
         if self._notifier.enabled:
-            self.entity_graph.subscribe(self._notifier.notify_when_applicable)
+            # Published from a worker, so a slow message bus does not delay
+            # the graph changes
+            graph_conf = self.conf.entity_graph
+            self.entity_graph.subscribe(
+                self._notifier.notify_when_applicable,
+                asynchronous=True,
+                max_queue_size=graph_conf.notifier_queue_size,
+                overflow_policy=graph_conf.notifier_overflow_policy)
             LOG.info('Graph notifications subscription added')
 
     def _update_neighbors(self, vertex, neighbors):
@@ -212,21 +221,28 @@ class Processor(processor.ProcessorBase):
 
         LOG.debug("Connect neighbors. Neighbors: %s, valid_edges: %s",
                   neighbors, valid_edges)
+        vertices_to_update = []
+        edges_to_update = []
         for (vertex, edge) in neighbors:
             graph_vertex = self.entity_graph.get_vertex(vertex.vertex_id)
             if not graph_vertex or not PUtils.is_deleted(graph_vertex):
                 if self.entity_graph.can_update_vertex(graph_vertex, vertex):
                     LOG.debug("Updates vertex: %s", vertex)
                     self._calculate_aggregated_state(vertex, action)
-                    self.entity_graph.update_entity_graph_vertex(graph_vertex,
-                                                                 vertex)
+                    vertices_to_update.append((graph_vertex, vertex))
 
                 if edge not in valid_edges:
                     LOG.debug("Updates edge: %s", edge)
-                    self.entity_graph.update_edge(edge)
+                    edges_to_update.append(edge)
             else:
                 LOG.debug("neighbor vertex wasn't updated: %s", vertex)
 
+        # Bulk updates, so that the subscribers are notified once per batch
+        if vertices_to_update:
+            self.entity_graph.update_entity_graph_vertices(vertices_to_update)
+        if edges_to_update:
+            self.entity_graph.update_edges(edges_to_update)
+
     def _delete_old_connections(self, vertex, obsolete_edges):
         """Deletes the "vertex" old connections
 
@@ -17,6 +17,8 @@ import datetime
 from oslo_log import log
 from oslo_service import service as os_service
 
+from vitrage.entity_graph.checkpoint import GraphCheckpoint
+from vitrage.entity_graph.journal import EventJournal
 from vitrage.entity_graph.processor import processor as proc
 
 LOG = log.getLogger(__name__)
@@ -39,12 +41,30 @@ class VitrageGraphService(os_service.Service):
                                         initialization_status,
                                         e_graph=entity_graph)
         self.evaluator_queue = evaluator_queue
+        self.checkpoint = GraphCheckpoint(conf, entity_graph)
+        self.journal = EventJournal(conf)
 
     def start(self):
         LOG.info("Vitrage Graph Service - Starting...")
 
         super(VitrageGraphService, self).start()
         self.tg.add_timer(1.0, self._process_event_non_blocking)
+        if self.checkpoint.is_enabled():
+            interval = self.conf.entity_graph.checkpoint_interval
+            self.tg.add_timer(interval,
+                              self._save_checkpoint,
+                              initial_delay=interval)
+        stats_interval = self.conf.entity_graph.notifier_stats_interval
+        if stats_interval > 0:
+            notifier = self.processor.entity_graph.notifier
+            self.tg.add_timer(stats_interval,
+                              notifier.log_async_stats,
+                              initial_delay=stats_interval)
+        fsync_interval = self.conf.entity_graph.journal_fsync_interval
+        if self.journal.is_enabled() and fsync_interval > 0:
+            self.tg.add_timer(fsync_interval,
+                              self.journal.sync,
+                              initial_delay=fsync_interval)
 
         LOG.info("Vitrage Graph Service - Started!")
 
@@ -52,9 +72,18 @@ class VitrageGraphService(os_service.Service):
         LOG.info("Vitrage Graph Service - Stopping...")
 
         super(VitrageGraphService, self).stop(graceful)
+        if graceful:
+            self._save_checkpoint()
+        self.journal.close()
 
         LOG.info("Vitrage Graph Service - Stopped!")
 
+    def _save_checkpoint(self):
+        # The events journaled after the checkpoint are replayed on top of
+        # it, they must reach the disk before it
+        self.journal.sync()
+        self.checkpoint.save()
+
     def _process_events(self):
         while True:
             self._process_event_non_blocking()
@@ -80,6 +109,8 @@ class VitrageGraphService(os_service.Service):
     def do_process(self, queue):
         try:
             event = queue.get()
+            if self.journal.is_enabled():
+                self.journal.append(event)
             self.processor.process_event(event)
         except Exception as e:
             LOG.exception("Exception: %s", e)
@@ -21,4 +21,13 @@ OPTS = [
                default='/etc/vitrage/templates',
                help='A path for the templates used by the evaluator'
                ),
+    cfg.BoolOpt('incremental_matching',
+                default=False,
+                help='Keep the scenario matches that currently hold, and on '
+                     'every change of the entity graph match only the '
+                     'scenarios that the changed element newly triggers. '
+                     'The actions are done and undone by the change of the '
+                     'kept matches, so an action is done once even when '
+                     'several matches do it.'
+                ),
 ]
@@ -0,0 +1,115 @@
+# Copyright 2016 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from collections import defaultdict
+
+
+class ActiveMatches(object):
+    """The scenario matches that currently hold in the entity graph
+
+    Used by the incremental matching of the evaluator. A match is kept with
+    the actions it does, and is indexed by the graph elements it binds: the
+    ids of its vertices and the (source id, target id, label) keys of its
+    edges. An action is done once, by the first match that does it, and is
+    undone when no match does it anymore.
+
+    A graph element is bound to template elements: template vertex ids, or
+    (source id, target id, label) keys of template edges.
+    """
+
+    def __init__(self):
+        # match key -> (scenario id, {element key: template keys},
+        #               action ids)
+        self._matches = {}
+        # element key -> match keys
+        self._element_matches = defaultdict(set)
+        # action id -> [action spec, number of matches]
+        self._actions = {}
+
+    def __len__(self):
+        return len(self._matches)
+
+    @staticmethod
+    def match_key(scenario_id, clause_index, match):
+        """The key of a match of a clause of a scenario condition
+
+        :param match: {template vertex id: graph vertex}
+        """
+        return (scenario_id, clause_index,
+                tuple(sorted((template_id, vertex.vertex_id)
+                             for template_id, vertex in match.items())))
+
+    def add(self, match_key, elements, actions):
+        """Keep a new match
+
+        :param elements: {element key: template keys} of the graph vertices
+        and edges of the match, see MatchPlan.match_elements()
+        :param actions: {action id: action spec} of the match
+        :return: {action id: action spec} of the actions to do, i.e. that
+        no other match does
+        :rtype: dict
+        """
+        if match_key in self._matches:
+            return {}
+        self._matches[match_key] = (match_key[0], elements, list(actions))
+        for element_key in elements:
+            self._element_matches[element_key].add(match_key)
+
+        to_do = {}
+        for action_id, action_spec in actions.items():
+            action = self._actions.get(action_id)
+            if action is None:
+                self._actions[action_id] = [action_spec, 1]
+                to_do[action_id] = action_spec
+            else:
+                action[1] += 1
+        return to_do
+
+    def remove_element(self, element_key, triggers=()):
+        """Drop the matches of a vertex or an edge that do not hold anymore
+
+        :param triggers: the (scenario id, template key) the element
+        currently triggers. A match still holds if the element triggers all
+        the template elements it is bound to in the match.
+        :return: {action id: action spec} of the actions to undo, i.e. that
+        no remaining match does
+        :rtype: dict
+        """
+        match_keys = self._element_matches.get(element_key)
+        if not match_keys:
+            return {}
+        to_undo = {}
+        for match_key in list(match_keys):
+            scenario_id, elements, action_ids = self._matches[match_key]
+            if all((scenario_id, template_key) in triggers
+                   for template_key in elements[element_key]):
+                continue
+            del self._matches[match_key]
+            for key in elements:
+                keys = self._element_matches[key]
+                keys.discard(match_key)
+                if not keys:
+                    del self._element_matches[key]
+            for action_id in action_ids:
+                action = self._actions[action_id]
+                action[1] -= 1
+                if not action[1]:
+                    del self._actions[action_id]
+                    to_undo[action_id] = action[0]
+        return to_undo
+
+    def clear(self):
+        self._matches.clear()
+        self._element_matches.clear()
+        self._actions.clear()
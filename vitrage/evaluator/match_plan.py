@@ -0,0 +1,106 @@
+# Copyright 2016 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from collections import defaultdict
+
+from vitrage.common.constants import EdgeProperties as EProps
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.evaluator.template import ENTITY
+from vitrage.graph.algo_driver.sub_graph_matching import SubGraphMatcher
+from vitrage.graph import create_graph
+from vitrage.graph import Direction
+from vitrage.graph import Edge
+from vitrage.graph import Vertex
+
+
+class MatchPlan(object):
+    """The sub-graph matching of an AND clause of a scenario condition
+
+    Compiled once, when the template is loaded, and only read afterwards, so
+    a plan can be shared by concurrent evaluations:
+
+    - graph: the pattern graph of the clause. Its vertices and edges are
+      copies of the template ones, with is_deleted False, and the template
+      itself is left unchanged.
+    - matcher: the SubGraphMatcher of the pattern graph, with the property
+      filters and the matching order for every element of the clause that
+      can trigger the scenario.
+    - edges: the (source id, target id, label) keys of the pattern edges.
+    """
+
+    def __init__(self, clause):
+        graph = create_graph('scenario condition')
+        for term in clause:
+            if term.type == ENTITY:
+                graph.add_vertex(self._not_deleted_vertex(term.variable))
+            else:  # type = relationship
+                edge_desc = term.variable
+                graph.add_vertex(self._not_deleted_vertex(edge_desc.source))
+                graph.add_vertex(self._not_deleted_vertex(edge_desc.target))
+                edge = edge_desc.edge
+                graph.add_edge(Edge(edge.source_id,
+                                    edge.target_id,
+                                    edge.label,
+                                    self._not_deleted(edge.properties,
+                                                      EProps.IS_DELETED)))
+        self.graph = graph
+        self.matcher = SubGraphMatcher(graph)
+        self.edges = tuple(
+            (edge.source_id, edge.target_id, edge.label)
+            for vertex in graph.get_vertices()
+            for edge in graph.get_edges(vertex.vertex_id,
+                                        direction=Direction.OUT))
+
+        for term in clause:
+            if term.type == ENTITY:
+                self.matcher.prepare([term.variable.vertex_id])
+            else:
+                edge = term.variable.edge
+                self.matcher.prepare([edge.source_id, edge.target_id])
+
+    def match_elements(self, match):
+        """The graph elements of a match, and the template elements of each
+
+        :param match: {template vertex id: graph vertex}
+        :return: {vertex id or (source id, target id, label): set of
+        template vertex ids or template edge keys}
+        :rtype: dict
+        """
+        elements = defaultdict(set)
+        for template_id, vertex in match.items():
+            elements[vertex.vertex_id].add(template_id)
+        for source_id, target_id, label in self.edges:
+            elements[(match[source_id].vertex_id,
+                      match[target_id].vertex_id,
+                      label)].add((source_id, target_id, label))
+        return elements
+
+    @classmethod
+    def create(cls, clause):
+        """The plan of a clause, or None if the clause is not supported"""
+        if not all(term.positive for term in clause):
+            # todo(erosensw): add support for NOT clauses
+            return None
+        return cls(clause)
+
+    @classmethod
+    def _not_deleted_vertex(cls, vertex):
+        return Vertex(vertex.vertex_id,
+                      cls._not_deleted(vertex.properties, VProps.IS_DELETED))
+
+    @staticmethod
+    def _not_deleted(properties, is_deleted_key):
+        properties = dict(properties or {})
+        properties[is_deleted_key] = False
+        return properties
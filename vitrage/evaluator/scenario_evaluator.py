@@ -12,23 +12,28 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from collections import namedtuple
 from oslo_log import log
 
 from vitrage.common.constants import EdgeProperties as EProps
 from vitrage.common.constants import VertexProperties as VProps
 from vitrage.evaluator.actions.action_executor import ActionExecutor
 from vitrage.evaluator.actions.base import ActionMode
+from vitrage.evaluator.active_matches import ActiveMatches
 from vitrage.evaluator.template import ActionSpecs
 from vitrage.evaluator.template import EdgeDescription
-from vitrage.evaluator.template import ENTITY
 from vitrage.graph.algo_driver.algorithm import Mapping
 from vitrage.graph import create_algorithm
-from vitrage.graph import create_graph
 from vitrage.graph.driver import Vertex
+from vitrage.graph.driver.notifier import ElementChange
 
 
 LOG = log.getLogger(__name__)
 
+# The matching of a triggered scenario around a changed element
+MatchingTask = namedtuple('MatchingTask',
+                          ['mode', 'element', 'scenario', 'scenario_element'])
+
 
 class ScenarioEvaluator(object):
 
@@ -43,7 +48,10 @@ class ScenarioEvaluator(object):
         self._graph_algs = create_algorithm(entity_graph)
         self._scenario_repo = scenario_repo
         self._action_executor = ActionExecutor(event_queue)
-        self._entity_graph.subscribe(self.process_event)
+        # The matches that currently hold, in incremental matching mode
+        self._active_matches = ActiveMatches() \
+            if conf.evaluator.incremental_matching else None
+        self._entity_graph.subscribe(self.process_events, batch=True)
         self.enabled = enabled
 
     def process_event(self, before, current, is_vertex):
@@ -56,33 +64,38 @@ class ScenarioEvaluator(object):
         change that happened. Deleted elements should arrive with the
         is_deleted property set to True
         """
+        self.process_events([ElementChange(before, current, is_vertex)])
+
+    def process_events(self, changes):
+        """Notification of a change-set of the entity graph.
+
+        The scenarios triggered by all the changes are matched first, and
+        the actions of all the matches are then merged by action id, so
+        that an action is executed once per change-set.
+
+        :type changes: list of ElementChange
+        """
 
         if not self.enabled:
             LOG.debug("Process event disabled")
             return
 
-        LOG.debug('Process event - starting')
-        LOG.debug("Element before event: %s, Current element: %s",
-                  str(before),
-                  str(current))
+        LOG.debug('Process event - starting, %s changes', len(changes))
 
         # todo (erosensw): support for NOT conditions - reverse logic
-        before_scenarios = self._get_element_scenarios(before, is_vertex)
-        current_scenarios = self._get_element_scenarios(current, is_vertex)
-        before_scenarios, current_scenarios = \
-            self._remove_overlap_scenarios(before_scenarios, current_scenarios)
+        evaluations = [self._get_evaluation(change) for change in changes]
+        tasks = [task for _, _, change_tasks in evaluations
+                 for task in change_tasks]
+        tasks_matches = iter(self._match_tasks(tasks))
 
-        if len(before_scenarios) + len(current_scenarios):
-            LOG.debug("Number of relevant scenarios found: undo = %s, do = %s",
-                      str(len(before_scenarios)),
-                      str(len(current_scenarios)))
-
-        actions = self._process_and_get_actions(before,
-                                                before_scenarios,
-                                                ActionMode.UNDO)
-        actions.update(self._process_and_get_actions(current,
-                                                     current_scenarios,
-                                                     ActionMode.DO))
+        actions = {}
+        for change, current_scenarios, change_tasks in evaluations:
+            matches = [(task, next(tasks_matches)) for task in change_tasks]
+            if self._active_matches is not None:
+                actions.update(self._get_incremental_actions(
+                    change, current_scenarios, matches))
+            else:
+                actions.update(self._get_actions(matches))
 
         if actions:
             LOG.debug("Actions to perform: %s", actions.values())
@@ -93,6 +106,133 @@ class ScenarioEvaluator(object):
 
         LOG.debug('Process event - completed')
 
+    def _get_evaluation(self, change):
+        """The matching tasks of a change
+
+        :return: (change, current scenarios, list of MatchingTask)
+        """
+        LOG.debug("Element before event: %s, Current element: %s",
+                  str(change.before),
+                  str(change.current))
+
+        before_scenarios = self._get_element_scenarios(change.before,
+                                                       change.is_vertex)
+        current_scenarios = self._get_element_scenarios(change.current,
+                                                        change.is_vertex)
+        if self._active_matches is not None:
+            # The matches of the scenarios triggered before were kept
+            tasks = self._get_tasks(change.current,
+                                    [triggered_scenario
+                                     for triggered_scenario
+                                     in current_scenarios
+                                     if triggered_scenario
+                                     not in before_scenarios],
+                                    ActionMode.DO)
+            return change, current_scenarios, tasks
+
+        undo_scenarios, do_scenarios = \
+            self._remove_overlap_scenarios(before_scenarios, current_scenarios)
+
+        if len(undo_scenarios) + len(do_scenarios):
+            LOG.debug("Number of relevant scenarios found: undo = %s, do = %s",
+                      str(len(undo_scenarios)),
+                      str(len(do_scenarios)))
+
+        tasks = self._get_tasks(change.before, undo_scenarios, ActionMode.UNDO)
+        tasks.extend(self._get_tasks(change.current,
+                                     do_scenarios,
+                                     ActionMode.DO))
+        return change, current_scenarios, tasks
+
+    @staticmethod
+    def _get_tasks(element, triggered_scenarios, mode):
+        tasks = []
+        for scenario_elements, scenario in triggered_scenarios:
+            LOG.debug("Processing: %s", str((scenario_elements, scenario)))
+            if not isinstance(scenario_elements, list):
+                scenario_elements = [scenario_elements]
+            tasks.extend(MatchingTask(mode,
+                                      element,
+                                      scenario,
+                                      scenario_element)
+                         for scenario_element in scenario_elements)
+        return tasks
+
+    def _match_tasks(self, tasks):
+        """The matches of every task
+
+        :return: list of lists of (clause index, MatchPlan, match), one per
+        task
+        """
+        return [list(self._evaluate_clauses(task.scenario,
+                                            task.element,
+                                            task.scenario_element))
+                for task in tasks]
+
+    def _get_actions(self, tasks_matches):
+        actions = {}
+        for task, matches in tasks_matches:
+            for _, _, match in matches:
+                for action in task.scenario.actions:
+                    spec, action_id = self._get_action_spec(action, match)
+                    actions[action_id] = (spec, task.mode)
+        return actions
+
+    def _get_incremental_actions(self, change, current_scenarios,
+                                 tasks_matches):
+        """The actions of the change of the matches around the element
+
+        The kept matches of the element that it does not trigger anymore
+        are dropped. The scenarios the element newly triggers are matched
+        around it, and the new matches are kept. The actions are then done
+        or undone by the delta of the kept matches.
+        """
+        element = change.current if change.current is not None \
+            else change.before
+        if change.is_vertex:
+            element_key = element.vertex_id
+        else:
+            element_key = (element.source_id, element.target_id, element.label)
+        triggers = set()
+        for scenario_elements, scenario in current_scenarios:
+            for template_key in self._template_keys(scenario_elements):
+                triggers.add((scenario.id, template_key))
+
+        to_undo = self._active_matches.remove_element(element_key, triggers)
+        to_do = {}
+        for task, matches in tasks_matches:
+            scenario = task.scenario
+            for clause_index, match_plan, match in matches:
+                match_actions = {}
+                for action in scenario.actions:
+                    spec, action_id = self._get_action_spec(action, match)
+                    match_actions[action_id] = spec
+                to_do.update(self._active_matches.add(
+                    ActiveMatches.match_key(scenario.id, clause_index, match),
+                    match_plan.match_elements(match),
+                    match_actions))
+
+        # An action undone and done again by the same change is left as is
+        actions = {action_id: (action_spec, ActionMode.UNDO)
+                   for action_id, action_spec in to_undo.items()
+                   if action_id not in to_do}
+        actions.update((action_id, (action_spec, ActionMode.DO))
+                       for action_id, action_spec in to_do.items()
+                       if action_id not in to_undo)
+        return actions
+
+    @staticmethod
+    def _template_keys(scenario_elements):
+        """The template vertex ids, or template edge keys, of the elements"""
+        if not isinstance(scenario_elements, list):
+            scenario_elements = [scenario_elements]
+        for scenario_element in scenario_elements:
+            if isinstance(scenario_element, Vertex):
+                yield scenario_element.vertex_id
+            else:
+                edge = scenario_element.edge
+                yield edge.source_id, edge.target_id, edge.label
+
     def _get_element_scenarios(self, element, is_vertex):
         if not element \
                 or element.get(VProps.IS_DELETED) \
@@ -117,33 +257,6 @@ class ScenarioEvaluator(object):
         current = list(filter(lambda x: x not in intersection, current))
         return before, current
 
-    def _process_and_get_actions(self, element, triggered_scenarios, mode):
-        actions = {}
-        for triggered_scenario in triggered_scenarios:
-            LOG.debug("Processing: %s", str(triggered_scenario))
-            scenario_element = triggered_scenario[0]
-            scenario = triggered_scenario[1]
-            actions.update(self._process_scenario(element,
-                                                  scenario,
-                                                  scenario_element,
-                                                  mode))
-        return actions
-
-    def _process_scenario(self, element, scenario, scenario_elements, mode):
-        if not isinstance(scenario_elements, list):
-            scenario_elements = [scenario_elements]
-        actions = {}
-        for action in scenario.actions:
-            for scenario_element in scenario_elements:
-                matches = self._evaluate_full_condition(scenario.condition,
-                                                        element,
-                                                        scenario_element)
-                if matches:
-                    for match in matches:
-                        spec, action_id = self._get_action_spec(action, match)
-                        actions[action_id] = (spec, mode)
-        return actions
-
     @staticmethod
     def _get_action_spec(action_spec, match):
         targets = action_spec.targets
@@ -165,48 +278,26 @@ class ScenarioEvaluator(object):
              tuple(sorted(action_spec.properties.items())))
         )
 
-    def _evaluate_full_condition(self, condition, element, scenario_element):
-        condition_matches = []
-        for clause in condition:
-            # OR condition means aggregation of matches, without duplicates
-            and_condition_matches = \
-                self._evaluate_and_condition(clause, element, scenario_element)
-            condition_matches += and_condition_matches
-
-        return condition_matches
-
-    def _evaluate_and_condition(self, condition, element, scenario_element):
-
-        condition_g = create_graph("scenario condition")
-        for term in condition:
-            if not term.positive:
-                # todo(erosensw): add support for NOT clauses
-                LOG.error('Unsupported template with NOT operator')
-                return []
-
-            if term.type == ENTITY:
-                term.variable[VProps.IS_DELETED] = False
-                condition_g.add_vertex(term.variable)
+    def _evaluate_clauses(self, scenario, element, scenario_element):
+        """The matches of each clause of the scenario condition
 
-            else:  # type = relationship
-                edge_desc = term.variable
-                self._set_relationship_not_deleted(edge_desc)
-                self._add_relationship(condition_g, edge_desc)
+        :return: generator of (clause index, MatchPlan, match)
+        """
+        match_plans = self._scenario_repo.get_match_plans(scenario)
+        for clause_index, match_plan in enumerate(match_plans):
+            for match in self._evaluate_and_condition(
+                    match_plan, element, scenario_element):
+                yield clause_index, match_plan, match
+
+    def _evaluate_and_condition(self, match_plan, element, scenario_element):
+        if match_plan is None:
+            # todo(erosensw): add support for NOT clauses
+            LOG.error('Unsupported template with NOT operator')
+            return []
 
         if isinstance(element, Vertex):
             initial_map = Mapping(scenario_element, element, True)
         else:
             initial_map = Mapping(scenario_element.edge, element, False)
-        return self._graph_algs.sub_graph_matching(condition_g, [initial_map])
-
-    @staticmethod
-    def _set_relationship_not_deleted(edge_description):
-        edge_description.source[VProps.IS_DELETED] = False
-        edge_description.target[VProps.IS_DELETED] = False
-        edge_description.edge[EProps.IS_DELETED] = False
-
-    @staticmethod
-    def _add_relationship(condition_graph, edge_description):
-        condition_graph.add_vertex(edge_description.source)
-        condition_graph.add_vertex(edge_description.target)
-        condition_graph.add_edge(edge_description.edge)
+        return self._graph_algs.sub_graph_matching(match_plan.matcher,
+                                                   [initial_map])
@@ -17,6 +17,7 @@ from collections import namedtuple
 from oslo_log import log
 
 from vitrage.common import file_utils
+from vitrage.evaluator.match_plan import MatchPlan
 from vitrage.evaluator.template import RELATIONSHIP
 from vitrage.evaluator.template import Template
 from vitrage.evaluator.template_fields import TemplateFields
@@ -37,6 +38,8 @@ class ScenarioRepository(object):
         self.templates = defaultdict(list)
         self.relationship_scenarios = defaultdict(list)
         self.entity_scenarios = defaultdict(list)
+        # scenario id -> the MatchPlan of each clause of its condition
+        self.match_plans = {}
         self._load_templates_files(conf)
 
     def get_scenarios_by_vertex(self, vertex):
@@ -65,6 +68,13 @@ class ScenarioRepository(object):
 
         return scenarios
 
+    def get_match_plans(self, scenario):
+        """The MatchPlan of each clause of the scenario condition
+
+        None stands for a clause that is not supported.
+        """
+        return self.match_plans[scenario.id]
+
     def add_template(self, template_def):
 
         syntax_validation_result = syntax_validation(template_def)
@@ -93,6 +103,8 @@ class ScenarioRepository(object):
     def _add_template_scenarios(self, template):
         for scenario in template.scenarios:
             self._handle_condition(scenario)
+            self.match_plans[scenario.id] = \
+                [MatchPlan.create(clause) for clause in scenario.condition]
 
     def _handle_condition(self, scenario):
         for clause in scenario.condition:
@@ -43,6 +43,29 @@ class GraphAlgorithm(object):
         """
         pass
 
+    @abc.abstractmethod
+    def graph_query_vertices_union(self, query_dict=None, root_id=None,
+                                   depth=None, directions=None):
+        """Create a sub graph of the matching vertices found in directions
+
+        Same as the union of the graph_query_vertices sub graphs for each of
+        the directions, without creating them.
+        :rtype: driver.Graph
+        """
+        pass
+
+    @abc.abstractmethod
+    def graph_query_vertices_unions(self, query_dict=None, root_ids=(),
+                                    directions=None):
+        """graph_query_vertices_union, with no depth, for several roots
+
+        The matching vertices connected to the roots are traversed once for
+        all the roots.
+        :return: root id -> sub graph, empty if the root does not match
+        :rtype: dict
+        """
+        pass
+
     @abc.abstractmethod
     def sub_graph_matching(self, sub_graph, known_mappings, validate=False):
         """Search for occurrences of of a template graph in the graph
@@ -51,6 +74,8 @@ class GraphAlgorithm(object):
         Here it is considerably mitigated  as we have an anchor in the graph.
         TODO(ihefetz)  document this
 
+        :param sub_graph: the template graph, or a matcher compiled from it
+        once, e.g. a SubGraphMatcher for NXAlgorithm
         :type known_mappings: list
         :type sub_graph: driver.Graph
         :type validate: bool
@@ -12,9 +12,14 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from collections import deque
+import itertools
+
+import networkx as nx
 from oslo_log import log as logging
 
 from vitrage.graph.algo_driver.algorithm import GraphAlgorithm
+from vitrage.graph.algo_driver.sub_graph_matching import SubGraphMatcher
 from vitrage.graph.algo_driver.sub_graph_matching import subgraph_matching
 from vitrage.graph.driver import Direction
 from vitrage.graph.driver import NXGraph
@@ -23,6 +28,27 @@ from vitrage.graph.query import create_predicate
 LOG = logging.getLogger(__name__)
 
 
+def _match_all(item):
+    return True
+
+
+def _match_func(query_dict):
+    """The predicate of query_dict, matching every item if it is empty"""
+    return create_predicate(query_dict) if query_dict else _match_all
+
+
+def _mask_ids(mask, ids):
+    """The ids whose indexes are the bits set in mask"""
+    # The bits, least significant first
+    bits = bin(mask)[:1:-1]
+    found = set()
+    i = bits.find('1')
+    while i >= 0:
+        found.add(ids[i])
+        i = bits.find('1', i + 1)
+    return found
+
+
 class NXAlgorithm(GraphAlgorithm):
 
     def __init__(self, graph):
@@ -35,44 +61,231 @@ class NXAlgorithm(GraphAlgorithm):
 
     def graph_query_vertices(self, query_dict=None, root_id=None, depth=None,
                              direction=Direction.BOTH):
+        return self.graph_query_vertices_union(query_dict=query_dict,
+                                               root_id=root_id,
+                                               depth=depth,
+                                               directions=(direction,))
 
-        graph = NXGraph('graph')
+    def graph_query_vertices_union(self, query_dict=None, root_id=None,
+                                   depth=None,
+                                   directions=(Direction.IN, Direction.OUT)):
+        graph = NXGraph.query_result()
 
         if not root_id:
             root_id = self.graph.root_id
-        root_data = self.graph._g.node[root_id]
+        root_data = self.graph.read_only_view().get_vertex(root_id).properties
 
-        if not query_dict:
-            match_func = lambda item: True
-        else:
-            match_func = create_predicate(query_dict)
+        match_func = _match_func(query_dict)
 
         if not match_func(root_data):
             LOG.info('graph_query_vertices: root %s does not match filter %s',
                      str(root_id), str(query_dict))
             return graph
 
-        n_result = []
-        visited_nodes = set()
-        n_result.append(root_id)
-        nodes_q = [(root_id, 0)]
-        while nodes_q:
-            node_id, curr_depth = nodes_q.pop(0)
-            if (node_id in visited_nodes) or (depth and curr_depth >= depth):
-                continue
-            visited_nodes.add(node_id)
-            (n_list, e_list) = self.graph._neighboring_nodes_edges_query(
-                node_id,
-                direction=direction,
-                vertex_predicate=match_func)
-            n_result.extend([v_id for v_id, data in n_list])
-            nodes_q.extend([(v_id, curr_depth + 1) for v_id, data in n_list])
-
-        graph._g = self.graph._g.subgraph(n_result)
+        # The vertices found in all the directions make a single sub graph
+        return self._union_subgraph(
+            [self._query_vertex_ids(match_func, root_id, depth, direction)
+             for direction in directions])
+
+    def graph_query_vertices_unions(self, query_dict=None, root_ids=(),
+                                    directions=(Direction.IN,
+                                                Direction.OUT)):
+        match_func = _match_func(query_dict)
+
+        # Every connected component of matching vertices is traversed, read
+        # into a sub graph, and its reachability computed, once whatever
+        # the number of roots in it. The sub graph of a root is then sliced
+        # from that of its component
+        graphs = {}
+        for members, successors, component_roots in \
+                self._matching_components(match_func, root_ids):
+            reachable_ids = self._reachability(members, successors)
+            component_graph = self.graph.subgraph(members)
+            for root_id in component_roots:
+                if root_id not in graphs:
+                    graphs[root_id] = self._union_subgraph(
+                        [reachable_ids(root_id, direction)
+                         for direction in directions],
+                        component_graph)
+        for root_id in root_ids:
+            if root_id not in graphs:
+                LOG.info('graph_query_vertices: root %s does not match '
+                         'filter %s', str(root_id), str(query_dict))
+                graphs[root_id] = NXGraph.query_result()
+        return graphs
+
+    def _union_subgraph(self, found_ids, graph=None):
+        """The sub graph of the union of sets of vertex ids
+
+        As in a union of the sub graph of each set, an edge is kept only if
+        both its vertices are in the same set. The vertices are added in
+        the order of their ids, so that the output of the sub graph does
+        not depend on the order of the sets.
+
+        :param graph: the graph to take the sub graph from, if not
+        self.graph
+        """
+        if graph is None:
+            graph = self.graph
+        n_result = set().union(*found_ids)
+        graph = graph.subgraph(sorted(n_result, key=str))
+        if len(found_ids) > 1:
+            for v_id in n_result:
+                for edge in graph.read_only_view().get_edges(
+                        v_id, direction=Direction.OUT):
+                    if not any(edge.target_id in ids and v_id in ids
+                               for ids in found_ids):
+                        graph.remove_edge(edge)
         return graph
 
+    def _matching_components(self, match_func, root_ids):
+        """The connected components of matching vertices of the roots
+
+        :return: a (vertex ids, successors, root ids) tuple for each
+        component, where successors is a {vertex id: ids of its matching
+        successors} dict
+        :rtype: list
+        """
+        graph = self.graph
+        matching = {}
+
+        def matches(v_id):
+            result = matching.get(v_id)
+            if result is None:
+                data = graph._vertex_data(v_id)
+                result = matching[v_id] = \
+                    data is not None and bool(match_func(data))
+            return result
+
+        components = []
+        component_of = {}
+        for root_id in root_ids:
+            component = component_of.get(root_id)
+            if component is not None:
+                component[2].append(root_id)
+                continue
+            if not matches(root_id):
+                continue
+            component = ([root_id], {}, [root_id])
+            members, successors, _ = component
+            component_of[root_id] = component
+            nodes_q = deque([root_id])
+            while nodes_q:
+                node_id = nodes_q.popleft()
+                successors[node_id] = [
+                    v_id for v_id in set(graph._neighbor_ids(node_id,
+                                                             Direction.OUT))
+                    if matches(v_id)]
+                for v_id in itertools.chain(
+                        successors[node_id],
+                        graph._neighbor_ids(node_id, Direction.IN)):
+                    if v_id not in component_of and matches(v_id):
+                        component_of[v_id] = component
+                        members.append(v_id)
+                        nodes_q.append(v_id)
+            components.append(component)
+        return components
+
+    @staticmethod
+    def _reachability(members, successors):
+        """The vertices reachable from each vertex of a component
+
+        The strongly connected components of the component are condensed
+        into a DAG. The vertices reachable from a condensed vertex, in each
+        direction, are computed once from those of its neighbors, as a bit
+        mask of the indexes of the members, and are shared by all the
+        vertices it condenses and by all the roots that reach it.
+
+        :param members: the vertex ids of the component
+        :param successors: {vertex id: ids of its successors}
+        :return: function of (vertex id, direction) to the set of the ids
+        of the vertices reachable from it in that direction, itself
+        included
+        """
+        index = {v_id: i for i, v_id in enumerate(members)}
+        digraph = nx.DiGraph()
+        digraph.add_nodes_from(range(len(members)))
+        digraph.add_edges_from((index[v_id], index[successor_id])
+                               for v_id, ids in successors.items()
+                               for successor_id in ids)
+        condensed = nx.condensation(digraph)
+        condensed_of = condensed.graph['mapping']
+        masks = {Direction.OUT: {}, Direction.IN: {}}
+        neighbors = {Direction.OUT: condensed.successors,
+                     Direction.IN: condensed.predecessors}
+
+        def mask_of(node, direction):
+            # An iterative post order traversal of the DAG, from node
+            memo = masks[direction]
+            stack = [node]
+            while stack:
+                top = stack[-1]
+                if top in memo:
+                    stack.pop()
+                    continue
+                pending = [n for n in neighbors[direction](top)
+                           if n not in memo]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                mask = 0
+                for i in condensed.node[top]['members']:
+                    mask |= 1 << i
+                for n in neighbors[direction](top):
+                    mask |= memo[n]
+                memo[top] = mask
+                stack.pop()
+            return memo[node]
+
+        def reachable_ids(v_id, direction):
+            if direction == Direction.BOTH:
+                # In both directions, the whole connected component
+                return set(members)
+            return _mask_ids(mask_of(condensed_of[index[v_id]], direction),
+                             members)
+        return reachable_ids
+
+    def _query_vertex_ids(self, match_func, root_id, depth, direction):
+        """Ids of the vertices reachable from root_id by matching vertices
+
+        A breadth first search, at most depth hops away from root_id (any
+        distance if depth is not given). A vertex is tested by match_func
+        once, when it is first reached, and is queued only if it matches and
+        its neighbors are within depth.
+
+        :return: the found vertex ids, root_id included
+        :rtype: set
+        """
+        graph = self.graph
+        found_ids = {root_id}
+        rejected_ids = set()
+        nodes_q = deque([(root_id, 0)])
+        while nodes_q:
+            node_id, curr_depth = nodes_q.popleft()
+            next_depth = curr_depth + 1
+            expand = not depth or next_depth < depth
+            for v_id in graph._neighbor_ids(node_id, direction):
+                if v_id in found_ids or v_id in rejected_ids:
+                    continue
+                data = graph._vertex_data(v_id)
+                if data is None or not match_func(data):
+                    rejected_ids.add(v_id)
+                    continue
+                found_ids.add(v_id)
+                if expand:
+                    nodes_q.append((v_id, next_depth))
+        return found_ids
+
     def sub_graph_matching(self, subgraph, known_matches, validate=False):
-        return subgraph_matching(self.graph, subgraph, known_matches, validate)
+        # The matched graph vertices are only read, no need to copy them
+        if isinstance(subgraph, SubGraphMatcher):
+            return subgraph.match(self.graph.read_only_view(),
+                                  known_matches,
+                                  validate)
+        return subgraph_matching(self.graph.read_only_view(),
+                                 subgraph,
+                                 known_matches,
+                                 validate)
 
     def create_graph_from_matching_vertices(self,
                                             vertex_attr_filter=None,
@@ -87,6 +300,4 @@ class NXAlgorithm(GraphAlgorithm):
 
         vertices_ids = [vertex.vertex_id for vertex in vertices]
 
-        graph = NXGraph('graph')
-        graph._g = self.graph._g.subgraph(vertices_ids)
-        return graph
+        return self.graph.subgraph(vertices_ids)
@@ -11,230 +11,230 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
-from oslo_log import log as logging
-
-from vitrage.common.exception import VitrageAlgorithmError
-from vitrage.graph.filter import check_filter
-
-LOG = logging.getLogger(__name__)
 
-MAPPED_V_ID = 'mapped_v_id'
-NEIGHBORS_MAPPED = 'neighbors_mapped'
-GRAPH_VERTEX = 'graph_vertex'
+"""Matching of a template sub-graph in a graph, around known matches
 
+A SubGraphMatcher is compiled once from the template sub-graph. Every
+template vertex is given a slot, and a partial mapping is a tuple with the
+id of the mapped graph vertex, or None, in each slot. The template vertex
+and edge properties are compiled to (key, values) filters.
 
-def subgraph_matching(base_graph, subgraph, matches, validate=False):
-    """Find all occurrences of subgraph in the graph
+The matching starts from the slots of the known matches and maps, one step
+at a time, a slot that has a template edge to an already mapped slot. The
+slots are ordered by selectivity: first the slots with the most template
+edges to the mapped slots, then those with the most property filters. At
+every step, the candidates are the neighbors of the graph vertex mapped to
+an adjacent slot; a candidate is kept if its properties match and if the
+graph has all the template edges between the slot and the mapped slots.
 
-    In the following, a partial mapping is a copy of the sub-graph.
-    As we go, vertices of curr_mapping graph will be updated with new
-    fields used only for the traversal:
+The graph is read through its adjacency and property dicts, so no Vertex
+or Edge is created but for the vertices of the final mappings.
+"""
 
-     - MAPPED_V_ID:
-       The vertex_id of the corresponding vertex in the graph.
-       If it is not empty, than this vertex is already mapped
-
-     - NEIGHBORS_MAPPED:
-       True or None. When set True it means all the
-       neighbors of this vertex have already been mapped
-
-    Implementation Details:
-    ----------------------
-
-    - Init Step:
-      copy the sub-graph to create the first candidate mapping graph. In which
-      known vertices mappings are added to vertices MAPPED_V_ID. So, we now
-      have a sub-graph copy where some of the vertices already have a mapping
+from oslo_log import log as logging
 
-    Main loop steps:
+from vitrage.graph.driver import Direction
 
-    - Steps 1:
-      Pop a partially mapped sub-graph from the queue.
-      If all its vertices have a MAPPED_V_ID, add it to final mappings
+LOG = logging.getLogger(__name__)
 
-    - Steps 2 & 3:
-      Find one template vertex that is not mapped but has a mapped neighbor
 
-    - Step 4: CHECK PROPERTIES
-      In the graph find candidate vertices that are linked to that neighbor
-      and match the template vertex properties
+def subgraph_matching(base_graph, subgraph, matches, validate=False):
+    """Find all occurrences of subgraph in the graph
 
-    - Step 5: CHECK STRUCTURE
-      Filter candidate vertices according to edges
-    """
-    final_subgraphs = []
-    initial_sg = _create_initial_subgraph(matches,
-                                          base_graph,
-                                          subgraph,
-                                          validate)
-    if not initial_sg:
-        LOG.warning('subgraph_matching: Initial sub-graph creation failed')
-        LOG.warning('subgraph_matching: Known matches: %s',
-                    str(matches))
-        return final_subgraphs
-    queue = [initial_sg]
-
-    while queue:
-        curr_subgraph = queue.pop(0)
-
-        # STEP 1: STOPPING CONDITION
-        mapped_vertices = list(filter(
-            lambda v: v.get(MAPPED_V_ID),
-            curr_subgraph.get_vertices()))
-        if len(mapped_vertices) == subgraph.num_vertices():
-            final_subgraphs.append(curr_subgraph)
-            continue
-
-        # STEP 2: CAN WE THROW THIS SUB-GRAPH?
-        vertices_with_unmapped_neighbors = list(filter(
-            lambda v: not v.get(NEIGHBORS_MAPPED),
-            mapped_vertices))
-        if not vertices_with_unmapped_neighbors:
-            continue
-
-        # STEP 3: FIND A SUB-GRAPH VERTEX TO MAP
-        v_with_unmapped_neighbors = vertices_with_unmapped_neighbors.pop(0)
-        unmapped_neighbors = list(filter(
-            lambda v: not v.get(MAPPED_V_ID),
-            curr_subgraph.neighbors(v_with_unmapped_neighbors.vertex_id)))
-        if not unmapped_neighbors:
-            # Mark vertex as NEIGHBORS_MAPPED=True
-            v_with_unmapped_neighbors[NEIGHBORS_MAPPED] = True
-            curr_subgraph.update_vertex(v_with_unmapped_neighbors)
-            queue.append(curr_subgraph)
-            continue
-        subgraph_vertex_to_map = unmapped_neighbors.pop(0)
-
-        # STEP 4: PROPERTIES CHECK
-        graph_candidate_vertices = base_graph.neighbors(
-            v_id=v_with_unmapped_neighbors[MAPPED_V_ID],
-            vertex_attr_filter=subgraph_vertex_to_map)
-
-        # STEP 5: STRUCTURE CHECK
-        edges = _get_edges_to_mapped_vertices(curr_subgraph,
-                                              subgraph_vertex_to_map.vertex_id)
-        for graph_vertex in graph_candidate_vertices:
-            subgraph_vertex_to_map[MAPPED_V_ID] = graph_vertex.vertex_id
-            subgraph_vertex_to_map[GRAPH_VERTEX] = graph_vertex
-            curr_subgraph.update_vertex(subgraph_vertex_to_map)
-            if _graph_contains_subgraph_edges(base_graph,
-                                              curr_subgraph,
-                                              edges):
-                queue.append(curr_subgraph.copy())
-
-    # Last thing: Convert results to the expected format!
-    result = []
-    for mapping in final_subgraphs:
-        # TODO(ihefetz) If needed, Here we can easily extract the edge
-        # matches from the mapping graph
-        a = {v.vertex_id: v[GRAPH_VERTEX] for v in mapping.get_vertices()}
-        result.append(a)
-    return result
-
-
-def _get_edges_to_mapped_vertices(graph, vertex_id):
-    """Get all edges (to/from) vertex where neighbor has a MAPPED_V_ID
-
-    :type graph: driver.Graph
-    :type vertex_id: str
-    :rtype: set of driver.Edge
+    :param matches: known matches, list of Mapping
+    :param validate: check the properties of the known matches, and the
+    template edge of a known edge match
+    :return: a {template vertex id: graph vertex} dict per occurrence
+    :rtype: list of dict
     """
-    subgraph_edges_to_mapped_vertices = []
-    for e in graph.get_edges(vertex_id):
-        t_neighbor = graph.get_vertex(e.other_vertex(vertex_id))
-        if not t_neighbor:
-            raise VitrageAlgorithmError('Cant get vertex for edge' + str(e))
-        if t_neighbor and t_neighbor.get(MAPPED_V_ID):
-            subgraph_edges_to_mapped_vertices.append(e)
-    return set(subgraph_edges_to_mapped_vertices)
-
-
-def _graph_contains_subgraph_edges(graph, subgraph, subgraph_edges):
-    """Check if graph contains all the expected edges
-
-    For each (sub-graph) expected edge, check if a corresponding edge exists
-    in the graph with relevant properties check
-
-    :type graph: driver.Graph
-    :type subgraph: driver.Graph
-    :type subgraph_edges: set of driver.Edge
-    :rtype: bool
-    """
-    for e in subgraph_edges:
-        graph_v_id_source = subgraph.get_vertex(e.source_id).get(MAPPED_V_ID)
-        graph_v_id_target = subgraph.get_vertex(e.target_id).get(MAPPED_V_ID)
-        if not graph_v_id_source or not graph_v_id_target:
-            raise VitrageAlgorithmError('Cant get vertex for edge' + str(e))
-        found_graph_edge = graph.get_edge(graph_v_id_source,
-                                          graph_v_id_target,
-                                          e.label)
-        if not found_graph_edge or not check_filter(found_graph_edge, e):
-            return False
-    return True
+    return SubGraphMatcher(subgraph).match(base_graph, matches, validate)
 
 
-def _create_initial_subgraph(known_matches, graph, subgraph, validate=False):
-    """Create initial mapping graph from sub graph and known matches
+def _compile_filter(properties):
+    """The (key, values) pairs of a check_filter() attribute filter"""
+    return tuple((key, content if isinstance(content, list) else [content])
+                 for key, content in (properties or {}).items())
 
-    copy the sub-graph to create the first candidate mapping graph.
-    In which known vertices mappings are added to vertices MAPPED_V_ID
-    """
-    mapping = subgraph.copy()
-    for match in known_matches:
-        if match.is_vertex:
-            if not _update_mapping_for_vertex(match, mapping, graph, validate):
-                return None
-            subgraph_id = match.subgraph_element.vertex_id
-            edges = _get_edges_to_mapped_vertices(mapping, subgraph_id)
-
-        else:  # is edge
-            if not _update_mapping_for_edge(match, mapping, graph, validate):
-                return None
-            edges = _get_related_edges(mapping, match, subgraph, validate)
-        if not _graph_contains_subgraph_edges(graph, mapping, edges):
-            return None
-    return mapping
-
-
-def _get_related_edges(mapping, match, subgraph, validate):
-    sub_target_id = match.subgraph_element.target_id
-    sub_source_id = match.subgraph_element.source_id
-    edges = _get_edges_to_mapped_vertices(mapping, sub_source_id)
-    edges.union(_get_edges_to_mapped_vertices(mapping, sub_target_id))
-    if not validate:  # no need to check the mapped edge
-        known_edge = subgraph.get_edge(
-            sub_source_id,
-            sub_target_id,
-            match.subgraph_element.label
-        )
-        edges.remove(known_edge)
-    return edges
-
-
-def _update_mapping(subgraph, graph, subgraph_id, graph_id, validate):
-    subgraph_vertex = subgraph.get_vertex(subgraph_id)
-    graph_vertex = graph.get_vertex(graph_id)
-    if validate:
-        if not check_filter(graph_vertex, subgraph_vertex, MAPPED_V_ID):
+
+def _check_filter(data, compiled_filter):
+    for key, content in compiled_filter:
+        if data.get(key) not in content:
             return False
-    subgraph_vertex[MAPPED_V_ID] = graph_id
-    subgraph_vertex[GRAPH_VERTEX] = graph_vertex
-    subgraph.update_vertex(subgraph_vertex)
     return True
 
 
-def _update_mapping_for_vertex(known_match, mapping, graph, validate):
-    subgraph_id = known_match.subgraph_element.vertex_id
-    graph_id = known_match.graph_element.vertex_id
-    return _update_mapping(mapping, graph, subgraph_id, graph_id, validate)
-
-
-def _update_mapping_for_edge(known_match, mapping, graph, validate):
-    s_id = known_match.graph_element.source_id
-    sub_s_id = known_match.subgraph_element.source_id
-    if not _update_mapping(mapping, graph, sub_s_id, s_id, validate):
-        return False
-
-    t_id = known_match.graph_element.target_id
-    sub_t_id = known_match.subgraph_element.target_id
-    return _update_mapping(mapping, graph, sub_t_id, t_id, validate)
+class SubGraphMatcher(object):
+
+    def __init__(self, subgraph):
+        vertices = subgraph.get_vertices()
+        self.slots = tuple(vertex.vertex_id for vertex in vertices)
+        self._slot_of = {v_id: slot for slot, v_id in enumerate(self.slots)}
+        self._vertex_filters = tuple(_compile_filter(vertex.properties)
+                                     for vertex in vertices)
+        # slot -> [(other slot, (source slot, target slot, label), filter)]
+        self._edges = [[] for _ in self.slots]
+        for vertex in vertices:
+            for edge in subgraph.get_edges(vertex.vertex_id,
+                                           direction=Direction.OUT):
+                source = self._slot_of[edge.source_id]
+                target = self._slot_of[edge.target_id]
+                entry = ((source, target, edge.label),
+                         _compile_filter(edge.properties))
+                self._edges[source].append((target,) + entry)
+                if target != source:
+                    self._edges[target].append((source,) + entry)
+        # frozenset of known slots -> steps
+        self._steps_cache = {}
+
+    def prepare(self, known_ids):
+        """Compute ahead the matching order from these known vertices
+
+        :param known_ids: template vertex ids, e.g. of a scenario trigger
+        :return: the matching steps, None if some template vertices can not
+        be reached from the known ones
+        """
+        return self._steps(frozenset(self._slot_of[v_id]
+                                     for v_id in known_ids))
+
+    def match(self, graph, known_matches, validate=False):
+        """Find all occurrences of the template around the known matches
+
+        :param graph: the graph to match in; it is only read
+        :type known_matches: list of Mapping
+        :rtype: list of dict
+        """
+        mapping = self._initial_mapping(graph, known_matches, validate)
+        if mapping is None:
+            LOG.warning('subgraph_matching: Initial sub-graph creation failed')
+            LOG.warning('subgraph_matching: Known matches: %s',
+                        str(known_matches))
+            return []
+        steps = self._steps(frozenset(slot for slot, graph_id
+                                      in enumerate(mapping)
+                                      if graph_id is not None))
+        if steps is None:
+            # Some template vertices can not be reached from the known ones
+            return []
+
+        found = []
+        stack = [(0, tuple(mapping))]
+        while stack:
+            step, mapping = stack.pop()
+            if step == len(steps):
+                found.append(mapping)
+                continue
+            slot, anchor, direction = steps[step]
+            vertex_filter = self._vertex_filters[slot]
+            tested = set()
+            for graph_id in graph._neighbor_ids(mapping[anchor], direction):
+                if graph_id in tested:
+                    continue
+                tested.add(graph_id)
+                data = graph._vertex_data(graph_id)
+                if data is None or not _check_filter(data, vertex_filter):
+                    continue
+                if self._edges_match(graph, mapping, slot, graph_id):
+                    stack.append((step + 1,
+                                  mapping[:slot] + (graph_id,) +
+                                  mapping[slot + 1:]))
+        return self._results(graph, found)
+
+    def _initial_mapping(self, graph, known_matches, validate):
+        mapping = [None] * len(self.slots)
+        for match in known_matches:
+            sub_element = match.subgraph_element
+            graph_element = match.graph_element
+            skipped_edge = None
+            if match.is_vertex:
+                pairs = ((sub_element.vertex_id, graph_element.vertex_id),)
+            else:
+                pairs = ((sub_element.source_id, graph_element.source_id),
+                         (sub_element.target_id, graph_element.target_id))
+                if not validate:
+                    # The known edge is not checked
+                    skipped_edge = (self._slot_of[sub_element.source_id],
+                                    self._slot_of[sub_element.target_id],
+                                    sub_element.label)
+
+            for sub_id, graph_id in pairs:
+                slot = self._slot_of[sub_id]
+                if validate:
+                    data = graph._vertex_data(graph_id)
+                    if data is None or \
+                            not _check_filter(data,
+                                              self._vertex_filters[slot]):
+                        return None
+                mapping[slot] = graph_id
+            for sub_id, graph_id in pairs:
+                slot = self._slot_of[sub_id]
+                if not self._edges_match(graph, mapping, slot, graph_id,
+                                         skipped_edge):
+                    return None
+        return mapping
+
+    def _edges_match(self, graph, mapping, slot, graph_id, skipped_edge=None):
+        """Whether the graph has the template edges of slot to mapped slots
+
+        :param graph_id: the graph vertex id to check for slot
+        """
+        for other, edge_key, edge_filter in self._edges[slot]:
+            other_id = graph_id if other == slot else mapping[other]
+            if other_id is None or edge_key == skipped_edge:
+                continue
+            source, target, label = edge_key
+            if source == slot:
+                data = graph._edge_data(graph_id, other_id, label)
+            else:
+                data = graph._edge_data(other_id, graph_id, label)
+            if data is None or not _check_filter(data, edge_filter):
+                return False
+        return True
+
+    def _steps(self, known_slots):
+        """The order in which the slots are mapped
+
+        :return: (slot, mapped adjacent slot, direction of slot from it)
+        for each slot that is not known, or None if a slot is not connected
+        to the known slots
+        """
+        if known_slots in self._steps_cache:
+            return self._steps_cache[known_slots]
+
+        steps = []
+        mapped = set(known_slots)
+        while steps is not None and len(mapped) < len(self.slots):
+            best = None
+            for slot in range(len(self.slots)):
+                if slot in mapped:
+                    continue
+                links = [(other, edge_key) for other, edge_key, _
+                         in self._edges[slot] if other in mapped]
+                if not links:
+                    continue
+                rank = (len(links), len(self._vertex_filters[slot]))
+                if best is None or rank > best[0]:
+                    best = (rank, slot, links[0])
+            if best is None:
+                steps = None
+                continue
+            _, slot, (anchor, edge_key) = best
+            direction = Direction.OUT if edge_key[1] == slot else \
+                Direction.IN
+            steps.append((slot, anchor, direction))
+            mapped.add(slot)
+
+        self._steps_cache[known_slots] = steps
+        return steps
+
+    def _results(self, graph, found):
+        vertices = {}
+        results = []
+        for mapping in found:
+            result = {}
+            for slot, graph_id in enumerate(mapping):
+                vertex = vertices.get(graph_id)
+                if vertex is None:
+                    vertex = vertices[graph_id] = graph.get_vertex(graph_id)
+                result[self.slots[slot]] = vertex
+            results.append(result)
+        return results
@@ -0,0 +1,259 @@
+# Copyright 2016 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Vectorized evaluation of queries over a columnar mirror of the vertices
+
+For the queries that no index of the graph can serve, ColumnarScanEngine
+evaluates the query_dict as NumPy boolean masks instead of calling the
+predicate once per vertex:
+
+- Every vertex has a row. The columns are created for the queried
+  properties only, on their first query, and are then updated on every
+  change of a vertex.
+- A column holds the dictionary code of the value of every row. A term is
+  evaluated once per distinct value of the column, with the same predicate
+  as create_predicate() uses, and the result is spread to the rows by
+  their codes.
+- A column also holds the numeric values, so that range terms with a
+  numeric bound compare them directly, whatever the number of distinct
+  values. Only the numbers that a float64 holds exactly, bools included,
+  are compared that way; the other values of the column, e.g. None or
+  strings, are still evaluated by the predicate.
+
+The engine only selects candidates; the graph still applies the predicate
+to them. Values that can not be compared with the term, which would raise
+in the predicate, never match.
+
+NumPy is optional: without it, is_available() is False and the graph scans
+the vertices.
+"""
+
+import numbers
+import operator
+
+from oslo_log import log as logging
+
+from vitrage.graph.query import compile_term
+from vitrage.graph.query import logical_operations
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+LOG = logging.getLogger(__name__)
+
+_numeric_comparisons = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>=': operator.ge,
+    '>': operator.gt,
+}
+
+# Code of None, i.e. of a missing property
+_NONE = 0
+
+# Integers beyond that are not exact as float64
+_MAX_EXACT_INT = 2 ** 53
+
+
+def is_available():
+    return np is not None
+
+
+def _is_number(value):
+    """Whether value compares as a float64 as it does in Python"""
+    if isinstance(value, numbers.Integral):
+        return -_MAX_EXACT_INT <= value <= _MAX_EXACT_INT
+    return isinstance(value, float)
+
+
+class _Column(object):
+    """Dictionary codes, and numeric values, of a property of all the rows"""
+
+    def __init__(self, capacity):
+        self.codes = np.zeros(capacity, dtype=np.int32)
+        self.numbers = np.full(capacity, np.nan)
+        # code -> value, and back
+        self.values = [None]
+        self._codes = {None: _NONE}
+        # row -> value, for the values that can not be dictionary encoded
+        self.unhashable = {}
+        # codes of the values that are not numbers
+        self.non_numeric_codes = [_NONE]
+
+    def grow(self, capacity):
+        size = len(self.codes)
+        self.codes = np.concatenate(
+            (self.codes, np.zeros(capacity - size, dtype=np.int32)))
+        self.numbers = np.concatenate(
+            (self.numbers, np.full(capacity - size, np.nan)))
+
+    def set(self, row, value):
+        self.unhashable.pop(row, None)
+        try:
+            code = self._codes.get(value)
+            if code is None:
+                code = self._codes[value] = len(self.values)
+                self.values.append(value)
+                if not _is_number(value):
+                    self.non_numeric_codes.append(code)
+        except TypeError:
+            self.unhashable[row] = value
+            code = _NONE
+        self.codes[row] = code
+        self.numbers[row] = value if _is_number(value) else np.nan
+
+
+class ColumnarScanEngine(object):
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, nx_graph):
+        self._nx_graph = nx_graph
+        self._built = False
+        # vertex id -> row, and back (None for a free row)
+        self._rows = {}
+        self._ids = []
+        self._free_rows = []
+        self._alive = None
+        self._columns = {}
+
+    def update(self, v_id, data):
+        """Mirror the change of a vertex
+
+        :param data: the new properties of the vertex, None if it was removed
+        """
+        if not self._built:
+            return
+        row = self._rows.get(v_id)
+        if data is None:
+            if row is not None:
+                del self._rows[v_id]
+                self._ids[row] = None
+                self._alive[row] = False
+                self._free_rows.append(row)
+                for column in self._columns.values():
+                    column.set(row, None)
+            return
+        if row is None:
+            row = self._new_row(v_id)
+        for key, column in self._columns.items():
+            column.set(row, data.get(key))
+        self._compact_columns()
+
+    def match(self, query):
+        """Vertex ids that match a parsed query, see QueryPlan.query
+
+        :rtype: set
+        """
+        if not self._built:
+            self._build()
+        mask = self._mask(query)
+        ids = self._ids
+        return {ids[row] for row in np.flatnonzero(mask & self._alive)}
+
+    def _build(self):
+        self._built = True
+        self._alive = np.zeros(self.INITIAL_CAPACITY, dtype=bool)
+        for v_id in self._nx_graph.nodes_iter():
+            self._new_row(v_id)
+
+    def _new_row(self, v_id):
+        if self._free_rows:
+            row = self._free_rows.pop()
+            self._ids[row] = v_id
+        else:
+            row = len(self._ids)
+            self._ids.append(v_id)
+            if row == len(self._alive):
+                self._grow(2 * row)
+        self._rows[v_id] = row
+        self._alive[row] = True
+        return row
+
+    def _grow(self, capacity):
+        self._alive = np.concatenate(
+            (self._alive,
+             np.zeros(capacity - len(self._alive), dtype=bool)))
+        for column in self._columns.values():
+            column.grow(capacity)
+
+    def _column(self, key):
+        column = self._columns.get(key)
+        if column is None:
+            column = self._columns[key] = self._new_column(key)
+        return column
+
+    def _new_column(self, key):
+        column = _Column(len(self._alive))
+        nodes = self._nx_graph.node
+        for v_id, row in self._rows.items():
+            column.set(row, nodes[v_id].get(key))
+        return column
+
+    def _compact_columns(self):
+        """Drop the values no vertex has anymore, e.g. old timestamps"""
+        limit = max(self.INITIAL_CAPACITY, 2 * len(self._rows))
+        for key, column in list(self._columns.items()):
+            if len(column.values) > limit:
+                self._columns[key] = self._new_column(key)
+
+    def _mask(self, query):
+        op, operands = query
+        if op in logical_operations:
+            masks = [self._mask(operand) for operand in operands]
+        else:
+            masks = [self._term_mask(op, key, value)
+                     for key, value in operands]
+            op = 'and'
+
+        size = len(self._alive)
+        if not masks:
+            # As an empty expression, never matches
+            return np.zeros(size, dtype=bool)
+        result = masks[0]
+        for mask in masks[1:]:
+            result = result & mask if op == 'and' else result | mask
+        return result
+
+    def _term_mask(self, op, key, value):
+        column = self._column(key)
+        match = compile_term(op, key, value)
+        values = column.values
+        if op in _numeric_comparisons and _is_number(value):
+            # The rows of the other values are NaN, which never matches,
+            # and are matched by their codes
+            with np.errstate(invalid='ignore'):
+                numeric_mask = _numeric_comparisons[op](column.numbers, value)
+            lookup = np.zeros(len(values), dtype=bool)
+            for code in column.non_numeric_codes:
+                lookup[code] = self._safe_match(match, key, values[code])
+            mask = numeric_mask | lookup[column.codes]
+        else:
+            lookup = np.fromiter(
+                (self._safe_match(match, key, column_value)
+                 for column_value in values),
+                dtype=bool, count=len(values))
+            mask = lookup[column.codes]
+        for row, row_value in column.unhashable.items():
+            mask[row] = self._safe_match(match, key, row_value)
+        return mask
+
+    @staticmethod
+    def _safe_match(match, key, value):
+        try:
+            return bool(match({key: value}))
+        except TypeError:
+            return False
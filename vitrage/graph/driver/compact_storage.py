@@ -0,0 +1,356 @@
+# Copyright 2016 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compact, column based storage of vertex properties
+
+Every vertex of an NXGraph normally owns a dict of its properties, although
+the keys, and most of the values, of these dicts repeat across the whole
+graph. CompactVertexStore keeps the well known VertexProperties in columns
+instead:
+
+- Low cardinality properties (category, type, states, is_deleted...) are
+  dictionary encoded: each column holds an array of small integer codes and
+  a table of the distinct values.
+- High cardinality properties (ids, names, timestamps) are kept in a list
+  per property. Timestamp strings are interned so that equal strings, e.g.
+  the sample timestamp of a whole snapshot, are stored once; ids and names
+  are unique, and interning them would only grow the interned strings table.
+- The other properties of a row are kept as a tuple of values, whose keys
+  are given by a layout: a tuple of keys shared by all the rows that have
+  the same other properties. Rows without other properties have no tuple.
+
+The properties of a vertex are exposed as a VertexRow, a MutableMapping
+that reads and writes the columns, so the graph code and networkx see a
+regular mapping. A row is released when its VertexRow is garbage collected.
+"""
+
+from array import array
+import copy
+
+from six.moves import intern
+
+from vitrage.common.constants import VertexProperties as VProps
+
+try:
+    from collections import abc as collections_abc
+except ImportError:  # py27
+    import collections as collections_abc
+
+
+ENCODED_PROPERTIES = (VProps.CATEGORY,
+                      VProps.TYPE,
+                      VProps.STATE,
+                      VProps.VITRAGE_STATE,
+                      VProps.AGGREGATED_STATE,
+                      VProps.OPERATIONAL_STATE,
+                      VProps.SEVERITY,
+                      VProps.AGGREGATED_SEVERITY,
+                      VProps.OPERATIONAL_SEVERITY,
+                      VProps.IS_DELETED,
+                      VProps.IS_PLACEHOLDER,
+                      VProps.PROJECT_ID)
+
+PLAIN_PROPERTIES = (VProps.ID,
+                    VProps.VITRAGE_ID,
+                    VProps.NAME)
+
+INTERNED_PROPERTIES = (VProps.UPDATE_TIMESTAMP,
+                       VProps.SAMPLE_TIMESTAMP)
+
+
+class _Missing(object):
+    def __repr__(self):
+        return '<missing>'
+
+
+_MISSING = _Missing()
+
+
+def _intern_value(value):
+    if type(value) is str:
+        return intern(value)
+    return value
+
+
+class _EncodedColumn(object):
+    """Dictionary encoded column, code 0 stands for a missing value"""
+
+    def __init__(self):
+        self.codes = array('I')
+        self.values = [_MISSING]
+        # keyed by type as well, so that True and 1 get different codes
+        self._value_codes = {}
+
+    def encode(self, value):
+        try:
+            key = (type(value), value)
+            code = self._value_codes.get(key)
+        except TypeError:
+            return None
+        if code is None:
+            code = len(self.values)
+            self.values.append(_intern_value(value))
+            self._value_codes[key] = code
+        return code
+
+    def get(self, row):
+        return self.values[self.codes[row]]
+
+    def set(self, row, value):
+        code = self.encode(value)
+        if code is None:
+            return False
+        self.codes[row] = code
+        return True
+
+    def clear(self, row):
+        self.codes[row] = 0
+
+    def append_row(self):
+        self.codes.append(0)
+
+
+class _PlainColumn(object):
+    """A plain column of values"""
+
+    def __init__(self):
+        self.values = []
+
+    def get(self, row):
+        return self.values[row]
+
+    def set(self, row, value):
+        self.values[row] = value
+        return True
+
+    def clear(self, row):
+        self.values[row] = _MISSING
+
+    def append_row(self):
+        self.values.append(_MISSING)
+
+
+class _InternedColumn(_PlainColumn):
+    """A plain column of interned values"""
+
+    def set(self, row, value):
+        self.values[row] = _intern_value(value)
+        return True
+
+
+class CompactVertexStore(object):
+    """Columns of vertex properties, shared by the rows of a graph
+
+    A store may be shared by several graphs (e.g. a graph and its copies),
+    since each row is owned by a single VertexRow.
+    """
+
+    def __init__(self,
+                 encoded_properties=ENCODED_PROPERTIES,
+                 plain_properties=PLAIN_PROPERTIES,
+                 interned_properties=INTERNED_PROPERTIES):
+        self._columns = {}
+        for key in encoded_properties:
+            self._columns[key] = _EncodedColumn()
+        for key in plain_properties:
+            self._columns[key] = _PlainColumn()
+        for key in interned_properties:
+            self._columns[key] = _InternedColumn()
+        self._column_items = list(self._columns.items())
+        # The other properties: layout code and values tuple of each row,
+        # and the keys, and the value position of each key, of each layout
+        self._layout_codes = array('I')
+        self._extra_values = []
+        self._layouts = [()]
+        self._layout_positions = [{}]
+        self._codes_of_layouts = {(): 0}
+        self._free_rows = []
+        self._num_rows = 0
+
+    def __len__(self):
+        """Number of rows in use"""
+        return self._num_rows - len(self._free_rows)
+
+    def new_row(self, properties=None):
+        """Allocate a row and fill it with properties
+
+        :type properties: dict
+        :rtype: VertexRow
+        """
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            row = self._num_rows
+            self._num_rows += 1
+            for column in self._columns.values():
+                column.append_row()
+            self._layout_codes.append(0)
+            self._extra_values.append(None)
+        vertex_row = VertexRow(self, row)
+        if properties:
+            for key, value in properties.items():
+                self.set(row, key, value)
+        return vertex_row
+
+    def release(self, row):
+        for column in self._columns.values():
+            column.clear(row)
+        self._set_extras(row, 0, None)
+        self._free_rows.append(row)
+
+    def get(self, row, key, default=None):
+        column = self._columns.get(key)
+        if column is not None:
+            value = column.get(row)
+            if value is not _MISSING:
+                return value
+        position = self._layout_positions[self._layout_codes[row]].get(key)
+        if position is None:
+            return default
+        return self._extra_values[row][position]
+
+    def set(self, row, key, value):
+        column = self._columns.get(key)
+        if column is not None and column.set(row, value):
+            self._delete_extra(row, key)
+            return
+        if column is not None:
+            column.clear(row)
+        code = self._layout_codes[row]
+        position = self._layout_positions[code].get(key)
+        values = self._extra_values[row]
+        if position is not None:
+            values = values[:position] + (value,) + values[position + 1:]
+        else:
+            key = intern(key) if type(key) is str else key
+            code = self._layout_code(self._layouts[code] + (key,))
+            values = (values or ()) + (value,)
+        self._set_extras(row, code, values)
+
+    def delete(self, row, key):
+        """Delete key from the row
+
+        :return: True if the row had the key
+        """
+        column = self._columns.get(key)
+        if column is not None and column.get(row) is not _MISSING:
+            column.clear(row)
+            return True
+        return self._delete_extra(row, key)
+
+    def _delete_extra(self, row, key):
+        code = self._layout_codes[row]
+        position = self._layout_positions[code].get(key)
+        if position is None:
+            return False
+        layout = self._layouts[code]
+        values = self._extra_values[row]
+        self._set_extras(
+            row,
+            self._layout_code(layout[:position] + layout[position + 1:]),
+            values[:position] + values[position + 1:] or None)
+        return True
+
+    def _set_extras(self, row, code, values):
+        self._layout_codes[row] = code
+        self._extra_values[row] = values
+
+    def _layout_code(self, layout):
+        code = self._codes_of_layouts.get(layout)
+        if code is None:
+            code = self._codes_of_layouts[layout] = len(self._layouts)
+            self._layouts.append(layout)
+            self._layout_positions.append(
+                {key: position for position, key in enumerate(layout)})
+        return code
+
+    def keys(self, row):
+        keys = [key for key, column in self._column_items
+                if column.get(row) is not _MISSING]
+        keys.extend(self._layouts[self._layout_codes[row]])
+        return keys
+
+
+class VertexRow(collections_abc.MutableMapping):
+    """The properties of one vertex, stored in a CompactVertexStore
+
+    Copying a row (copy.copy) returns a regular dict, while deepcopy
+    allocates a new row in the same store.
+    """
+
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def __del__(self):
+        try:
+            self._store.release(self._row)
+        except Exception:  # interpreter shutdown
+            pass
+
+    def __getitem__(self, key):
+        value = self._store.get(self._row, key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        return self._store.get(self._row, key, default)
+
+    def __contains__(self, key):
+        return self._store.get(self._row, key, _MISSING) is not _MISSING
+
+    def __setitem__(self, key, value):
+        self._store.set(self._row, key, value)
+
+    def __delitem__(self, key):
+        if not self._store.delete(self._row, key):
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._store.keys(self._row))
+
+    def __len__(self):
+        return len(self._store.keys(self._row))
+
+    def update(self, *args, **kwargs):
+        # Not MutableMapping.update, whose isinstance checks are slow
+        set_value = self._store.set
+        row = self._row
+        for other in args:
+            items = other.items() if hasattr(other, 'keys') else other
+            for key, value in items:
+                set_value(row, key, value)
+        for key, value in kwargs.items():
+            set_value(row, key, value)
+
+    def items(self):
+        get = self._store.get
+        row = self._row
+        return [(key, get(row, key)) for key in self._store.keys(row)]
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __copy__(self):
+        return dict(self.items())
+
+    def __deepcopy__(self, memo):
+        return self._store.new_row(
+            copy.deepcopy(dict(self.items()), memo))
+
+    def copy(self):
+        return self.__copy__()
@@ -11,8 +11,75 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import copy
+
 import six
 
+try:
+    from collections import abc as collections_abc
+except ImportError:  # py27
+    import collections as collections_abc
+
+
+class ReadOnlyProperties(collections_abc.Mapping):
+    """Immutable mapping over the properties dict of a graph element
+
+    The underlying dict is shared, not copied, so changes made to the graph
+    element after the view was created are visible through it. Copying the
+    view (copy.copy or copy.deepcopy) returns a regular, mutable dict.
+
+    Not being a dict, the view is not serializable by json.dumps, which
+    raises TypeError; serialize a copy of it, or use jsonutils.
+    """
+
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __eq__(self, other):
+        if isinstance(other, ReadOnlyProperties):
+            other = other._data
+        return self._data == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self._data)
+
+    def __copy__(self):
+        return dict(self._data)
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self._data, memo)
+
+    def get(self, k, d=None):
+        return self._data.get(k, d)
+
+    def items(self):
+        return self._data.items()
+
+    def keys(self):
+        return self._data.keys()
+
+    def values(self):
+        return self._data.values()
+
 
 class PropertiesElement(object):
     def __init__(self, properties=None):
@@ -24,7 +91,7 @@ class PropertiesElement(object):
 
     def __setitem__(self, key, value):
         """Set a property with 'element[key] = value'"""
-        if not self.properties:
+        if self.properties is None:
             self.properties = {}
         self.properties[key] = value
 
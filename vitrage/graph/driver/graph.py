@@ -47,8 +47,13 @@ class Graph(object):
         self.root_id = None
         self.notifier = Notifier()
 
-    def subscribe(self, function):
-        self.notifier.subscribe(function)
+    def subscribe(self, function, batch=False, **kwargs):
+        """Subscribe to the changes of the graph, see Notifier.subscribe"""
+        self.notifier.subscribe(function, batch, **kwargs)
+
+    def subscribe_removals(self, function):
+        """Subscribe to element removals, see Notifier.subscribe_removals"""
+        self.notifier.subscribe_removals(function)
 
     def is_subscribed(self):
         return self.notifier.is_subscribed()
@@ -59,6 +64,17 @@ class Graph(object):
         if isinstance(item, Vertex):
             return self.get_vertex(item.vertex_id)
 
+    def read_only_view(self):
+        """A view of the graph for callers that do not change its elements
+
+        Implementations may return elements that share their data with the
+        graph instead of copies of it. By default the graph itself is
+        returned.
+
+        :rtype: Graph
+        """
+        return self
+
     @abc.abstractmethod
     def copy(self):
         """Create a copy of the graph
@@ -130,6 +146,30 @@ class Graph(object):
         """
         pass
 
+    @abc.abstractmethod
+    def add_vertices(self, vertices):
+        """Add several vertices to the graph
+
+        Equivalent to calling add_vertex for every vertex, except that the
+        subscribers are notified once, after all the vertices were added.
+
+        :param vertices: the vertices to add
+        :type vertices: list of Vertex
+        """
+        pass
+
+    @abc.abstractmethod
+    def add_edges(self, edges):
+        """Add several edges to the graph
+
+        Equivalent to calling add_edge for every edge, except that the
+        subscribers are notified once, after all the edges were added.
+
+        :param edges: the edges to add
+        :type edges: list of Edge
+        """
+        pass
+
     @abc.abstractmethod
     def get_vertex(self, v_id):
         """Fetch a vertex from the graph
@@ -207,6 +247,18 @@ class Graph(object):
         """
         pass
 
+    @abc.abstractmethod
+    def update_vertices(self, vertices, hard_update=False):
+        """Update the properties of several vertices
+
+        Equivalent to calling update_vertex for every vertex, except that the
+        subscribers are notified once, after all the vertices were updated.
+
+        :type vertices: list of Vertex
+        :type hard_update: bool
+        """
+        pass
+
     @abc.abstractmethod
     def update_edge(self, e, hard_update=False):
         """Update the edge properties
@@ -221,6 +273,18 @@ class Graph(object):
         """
         pass
 
+    @abc.abstractmethod
+    def update_edges(self, edges, hard_update=False):
+        """Update the properties of several edges
+
+        Equivalent to calling update_edge for every edge, except that the
+        subscribers are notified once, after all the edges were updated.
+
+        :type edges: list of Edge
+        :type hard_update: bool
+        """
+        pass
+
     @abc.abstractmethod
     def remove_vertex(self, v):
         """Remove Vertex v and its edges from the graph
@@ -238,7 +302,8 @@ class Graph(object):
         pass
 
     @abc.abstractmethod
-    def get_vertices(self, vertex_attr_filter=None, query_dict=None):
+    def get_vertices(self, vertex_attr_filter=None, query_dict=None,
+                     limit=None, offset=0, count_only=False, fields=None):
         """Get vertices list with an optional match filter
 
         To filter the vertices, specify property values for
@@ -268,8 +333,20 @@ class Graph(object):
         :type vertex_attr_filter dict
         :param query_dict: expected query
         :type query_dict dict
-        :return: A list of vertices that match the requested query
-        :rtype: list of Vertex
+        :param limit: return at most limit vertices
+        :type limit: int
+        :param offset: skip the first offset vertices. When limit or offset
+        are given, the vertices are ordered by vertex id, so that successive
+        pages do not overlap
+        :type offset: int
+        :param count_only: return only the number of matching vertices
+        :type count_only: bool
+        :param fields: if given, the returned vertices have only these
+        properties
+        :type fields: list
+        :return: A list of vertices that match the requested query, or their
+        number if count_only
+        :rtype: list of Vertex or int
         """
         pass
 
@@ -12,22 +12,34 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import bisect
+from collections import defaultdict
 import copy
+import heapq
+import itertools
 import json
 import networkx as nx
-from networkx.algorithms.operators.binary import compose
-from networkx.readwrite import json_graph
+import re
+import six
+import sys
 
 from oslo_log import log as logging
 
+from vitrage.common.constants import EdgeProperties as EProps
 from vitrage.common.constants import VertexProperties as VProps
+from vitrage.graph.driver import columnar
+from vitrage.graph.driver.compact_storage import CompactVertexStore
 from vitrage.graph.driver.elements import Edge
+from vitrage.graph.driver.elements import ReadOnlyProperties
 from vitrage.graph.driver.elements import Vertex
 from vitrage.graph.driver.graph import Direction
 from vitrage.graph.driver.graph import Graph
 from vitrage.graph.driver.notifier import Notifier
+from vitrage.graph.driver.version_log import VersionLog
 from vitrage.graph.filter import check_filter
 from vitrage.graph.query import create_predicate
+from vitrage.graph.query import plan_query
+from vitrage.graph.query import range_key
 
 LOG = logging.getLogger(__name__)
 
@@ -41,23 +53,667 @@ def vertex_copy(v_id, data):
     return Vertex(vertex_id=v_id, properties=copy.copy(data))
 
 
+def edge_view(source_id, target_id, label, data):
+    return Edge(source_id=source_id, target_id=target_id,
+                label=label, properties=ReadOnlyProperties(data))
+
+
+def vertex_view(v_id, data):
+    return Vertex(vertex_id=v_id, properties=ReadOnlyProperties(data))
+
+
+def _empty_dict():
+    # CPython 3.6 allocates a keys table for a new dict, but not for a
+    # cleared one, which shares the empty keys table until it is filled
+    adjacency = {}
+    adjacency.clear()
+    return adjacency
+
+
+class CompactMultiDiGraph(nx.MultiDiGraph):
+    """MultiDiGraph whose vertices without edges take less memory
+
+    Every vertex has a successors and a predecessors dict, that are empty
+    for most of the vertices in one of the directions (e.g. alarms have no
+    predecessors but their causes).
+    """
+    adjlist_dict_factory = staticmethod(_empty_dict)
+
+
+# Number of nodes or links per part of output_graph_parts()
+OUTPUT_CHUNK_SIZE = 1000
+
+DEFAULT_INDEXED_PROPERTIES = (VProps.CATEGORY,
+                              VProps.TYPE,
+                              VProps.IS_DELETED,
+                              VProps.IS_PLACEHOLDER)
+
+DEFAULT_RANGE_INDEXED_PROPERTIES = (VProps.SAMPLE_TIMESTAMP,)
+
+
+class PropertyIndex(object):
+    """Hash index from a vertex property value to the matching vertex ids
+
+    Vertices that do not have the property are indexed under None, so a
+    lookup returns exactly the vertices for which check_filter() would
+    compare data.get(key) against the looked up value. Values that can not
+    be hashed are kept aside and returned by every lookup.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self._buckets = defaultdict(set)
+        self._unhashable = set()
+
+    def add(self, v_id, value):
+        try:
+            self._buckets[value].add(v_id)
+        except TypeError:
+            self._unhashable.add(v_id)
+
+    def remove(self, v_id, value):
+        try:
+            bucket = self._buckets.get(value)
+        except TypeError:
+            self._unhashable.discard(v_id)
+            return
+        if bucket is not None:
+            bucket.discard(v_id)
+            if not bucket:
+                del self._buckets[value]
+
+    def lookup(self, values):
+        """Vertex ids whose property value is one of values
+
+        :type values: list
+        :rtype: set
+        """
+        result = set(self._unhashable)
+        for value in values:
+            try:
+                result.update(self._buckets.get(value, ()))
+            except TypeError:
+                continue
+        return result
+
+    def values_with_prefix(self, prefix):
+        """The indexed string values that start with prefix"""
+        if not isinstance(prefix, six.string_types):
+            return []
+        return [value for value in self._buckets
+                if isinstance(value, six.string_types) and
+                value.startswith(prefix)]
+
+    def count(self, values):
+        """Upper bound of lookup(values) size, without building the set"""
+        total = len(self._unhashable)
+        for value in values:
+            try:
+                total += len(self._buckets.get(value, ()))
+            except TypeError:
+                continue
+        return total
+
+
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+
+class SortedIndex(object):
+    """Ordered index from a vertex property value to the vertex ids
+
+    Serves the range (<, <=, >, >=) and startswith terms of a query, as
+    well as equality lookups. Only string values, such as the timestamps
+    the datasources send, are ordered; they are ordered by their
+    range_key(), exactly as the query predicates compare them, so that
+    timestamps of different formats are in time order. Vertices with any
+    other value, including the vertices that do not have the property, are
+    kept aside and returned by every lookup.
+
+    The (range key, vertex id) pairs are kept in sorted buckets of at most
+    2 * BUCKET_SIZE pairs, and the last pair of every bucket in a sorted
+    list, so that a vertex is added or removed in O(log n) comparisons, by
+    its exact pair, and moves at most 2 * BUCKET_SIZE pairs.
+    """
+
+    BUCKET_SIZE = 512
+
+    def __init__(self, key, items=()):
+        """Create a SortedIndex
+
+        :param items: (vertex id, value) to index
+        """
+        self.key = key
+        self._aside = set()
+        ordered = []
+        for v_id, value in items:
+            if isinstance(value, six.string_types):
+                ordered.append((range_key(value), v_id))
+            else:
+                self._aside.add(v_id)
+        ordered.sort()
+        self._buckets = [ordered[i:i + self.BUCKET_SIZE]
+                         for i in range(0, len(ordered), self.BUCKET_SIZE)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+
+    def add(self, v_id, value):
+        if not isinstance(value, six.string_types):
+            self._aside.add(v_id)
+            return
+        pair = (range_key(value), v_id)
+        buckets = self._buckets
+        maxes = self._maxes
+        if not buckets:
+            buckets.append([pair])
+            maxes.append(pair)
+            return
+        i = bisect.bisect_left(maxes, pair)
+        if i == len(buckets):
+            i -= 1
+            buckets[i].append(pair)
+            maxes[i] = pair
+        else:
+            bisect.insort(buckets[i], pair)
+        if len(buckets[i]) > 2 * self.BUCKET_SIZE:
+            bucket = buckets[i]
+            buckets[i:i + 1] = [bucket[:self.BUCKET_SIZE],
+                                bucket[self.BUCKET_SIZE:]]
+            maxes[i:i + 1] = [buckets[i][-1], buckets[i + 1][-1]]
+
+    def remove(self, v_id, value):
+        if not isinstance(value, six.string_types):
+            self._aside.discard(v_id)
+            return
+        pair = (range_key(value), v_id)
+        i = bisect.bisect_left(self._maxes, pair)
+        if i == len(self._maxes):
+            return
+        bucket = self._buckets[i]
+        j = bisect.bisect_left(bucket, pair)
+        if bucket[j] != pair:
+            return
+        del bucket[j]
+        if not bucket:
+            del self._buckets[i]
+            del self._maxes[i]
+        elif j == len(bucket):
+            self._maxes[i] = bucket[-1]
+
+    def __len__(self):
+        return len(self._aside) + sum(len(b) for b in self._buckets)
+
+    def lookup(self, values):
+        """Vertex ids whose property value may be one of values
+
+        :type values: list
+        :rtype: set
+        """
+        result = set(self._aside)
+        for value in values:
+            if isinstance(value, six.string_types):
+                self._update_ids(result, '==', value)
+        return result
+
+    def count(self, values):
+        """Upper bound of lookup(values) size, without building the set"""
+        total = len(self._aside)
+        for value in values:
+            if isinstance(value, six.string_types):
+                total += self._count('==', value)
+        return total
+
+    def lookup_range(self, op, bound):
+        """Vertex ids whose property value may be op bound
+
+        :param op: <, <=, >, >= or startswith
+
+        :return: the vertex ids, or None if bound can not be looked up
+        :rtype: set
+        """
+        if not isinstance(bound, six.string_types):
+            return None
+        result = set(self._aside)
+        self._update_ids(result, op, bound)
+        return result
+
+    def count_range(self, op, bound):
+        """Upper bound of lookup_range(op, bound) size, None if unsupported"""
+        if not isinstance(bound, six.string_types):
+            return None
+        return len(self._aside) + self._count(op, bound)
+
+    def _update_ids(self, result, op, bound):
+        for low, high in self._ranges(op, bound):
+            for bucket, start, end in self._spans(low, high):
+                result.update(v_id for _, v_id in bucket[start:end])
+
+    def _count(self, op, bound):
+        return sum(end - start
+                   for low, high in self._ranges(op, bound)
+                   for _, start, end in self._spans(low, high))
+
+    def _spans(self, low, high):
+        """(bucket, start, end) of the pairs from low to high, excluded
+
+        :param low: None to start from the first pair
+        :param high: None to end after the last pair
+        """
+        buckets = self._buckets
+        i = 0 if low is None else bisect.bisect_left(self._maxes, low)
+        while i < len(buckets):
+            bucket = buckets[i]
+            start = 0 if low is None else bisect.bisect_left(bucket, low)
+            if high is None or bucket[-1] < high:
+                yield bucket, start, len(bucket)
+            else:
+                yield bucket, start, bisect.bisect_left(bucket, high)
+                return
+            i += 1
+
+    @classmethod
+    def _ranges(cls, op, bound):
+        """The (low, high) pairs between which the values may be op bound
+
+        Every pair of a key k is after (k,) and before (k + '\\0',), the
+        first key after k.
+        """
+        if op == 'startswith':
+            if len(bound) <= len('YYYY-MM-DD') or not _DATE_RE.match(bound):
+                return [cls._prefix_range(bound)]
+            # The range key of a timestamp that starts with bound has a
+            # space after the date, and may differ from it after the time
+            # of day; another string is its own range key
+            if bound[10] not in ' T':
+                return [cls._prefix_range(bound)]
+            prefix = bound[:10] + ' ' + bound[11:len('YYYY-MM-DD HH:MM:SS')]
+            if bound.startswith(prefix):
+                return [cls._prefix_range(prefix)]
+            return [cls._prefix_range(prefix), cls._prefix_range(bound)]
+        key = range_key(bound)
+        if op == '<':
+            return [(None, (key,))]
+        if op == '<=':
+            return [(None, (key + '\0',))]
+        if op == '>':
+            return [((key + '\0',), None)]
+        if op == '>=':
+            return [((key,), None)]
+        # ==
+        return [((key,), (key + '\0',))]
+
+    @staticmethod
+    def _prefix_range(prefix):
+        if not prefix:
+            return None, None
+        if ord(prefix[-1]) == sys.maxunicode:
+            return (prefix,), None
+        return (prefix,), (prefix[:-1] + six.unichr(ord(prefix[-1]) + 1),)
+
+
+class LabelAdjacencyIndex(object):
+    """Adjacency of the vertices, partitioned by edge label
+
+    Edges are created with their relationship type as label (see
+    vitrage.graph.utils.create_edge), so the edges of a vertex that match a
+    relationship_type filter are found in the partitions of the filtered
+    labels, without looking at the other edges of the vertex. Edges whose
+    relationship_type property ever differed from their label are kept
+    aside and returned by every lookup, as the unhashable values of
+    PropertyIndex; they stay aside until removed, so that snapshots reading
+    an older version of their properties find them as well.
+
+    The index is built on the first lookup; until then, changes to the
+    graph are not tracked.
+    """
+
+    def __init__(self, nx_graph):
+        self._nx_graph = nx_graph
+        self._built = False
+        # vertex id -> label -> keys of the in and out edges with that label
+        self._partitions = {}
+        # vertex id -> keys of the edges kept aside
+        self._aside = {}
+
+    def add(self, edge_key, data):
+        if not self._built:
+            return
+        label = edge_key[2]
+        for v_id in edge_key[:2]:
+            self._partitions.setdefault(v_id, {}).setdefault(
+                label, set()).add(edge_key)
+        self.update(edge_key, data)
+
+    def update(self, edge_key, data):
+        if self._built and data.get(EProps.RELATIONSHIP_TYPE) != edge_key[2]:
+            for v_id in edge_key[:2]:
+                self._aside.setdefault(v_id, set()).add(edge_key)
+
+    def remove(self, edge_key):
+        if not self._built:
+            return
+        label = edge_key[2]
+        for v_id in edge_key[:2]:
+            labels = self._partitions.get(v_id)
+            if labels is not None and label in labels:
+                labels[label].discard(edge_key)
+                if not labels[label]:
+                    del labels[label]
+                if not labels:
+                    del self._partitions[v_id]
+            aside = self._aside.get(v_id)
+            if aside is not None:
+                aside.discard(edge_key)
+                if not aside:
+                    del self._aside[v_id]
+
+    def lookup(self, v_id, labels, direction):
+        """Keys of the edges of v_id that may have one of the labels
+
+        As in NXGraph._get_edges_by_direction(), the in edges come before
+        the out edges, and a self loop is returned twice in both directions.
+
+        :type labels: list
+        :return: list of (source_id, target_id, label), or None if a label
+        can not be looked up
+        """
+        if not self._built:
+            self._build()
+        partitions = self._partitions.get(v_id, {})
+        keys = set(self._aside.get(v_id, ()))
+        try:
+            for label in labels:
+                keys.update(partitions.get(label, ()))
+        except TypeError:
+            return None
+        in_keys = [key for key in keys if key[1] == v_id]
+        out_keys = [key for key in keys if key[0] == v_id]
+        if direction == Direction.OUT:
+            return out_keys
+        if direction == Direction.IN:
+            return in_keys
+        return in_keys + out_keys
+
+    def _build(self):
+        self._built = True
+        for source_id, target_id, label, data in \
+                self._nx_graph.edges_iter(keys=True, data=True):
+            self.add((source_id, target_id, label), data)
+
+
+def select_vertices(items, vertex_factory, limit=None, offset=0,
+                    count_only=False, fields=None):
+    """The result of get_vertices() for the matching (id, properties) items
+
+    See Graph.get_vertices() for the parameters.
+    """
+    if count_only:
+        return sum(1 for _ in items)
+    if limit is not None:
+        items = heapq.nsmallest(offset + limit, items,
+                                key=lambda item: str(item[0]))[offset:]
+    elif offset:
+        items = sorted(items, key=lambda item: str(item[0]))[offset:]
+    if fields is not None:
+        return [Vertex(v_id, {key: data[key] for key in fields if key in data})
+                for v_id, data in items]
+    return [vertex_factory(v_id, data) for v_id, data in items]
+
+
+def merge_output_graph_parts(parts):
+    """The node-link data of output_graph_parts()
+
+    :type parts: iterable of dict
+    :rtype: dict
+    """
+    parts = iter(parts)
+    graph = dict(next(parts))
+    graph['nodes'] = []
+    graph['links'] = []
+    for part in parts:
+        for key, elements in part.items():
+            graph[key].extend(elements)
+    return graph
+
+
 class NXGraph(Graph):
 
     GRAPH_TYPE = "networkx"
 
-    def __init__(self, name='networkx_graph', root_id=None):
+    def __init__(self,
+                 name='networkx_graph',
+                 root_id=None,
+                 indexed_properties=DEFAULT_INDEXED_PROPERTIES,
+                 compact_storage=False,
+                 range_indexed_properties=DEFAULT_RANGE_INDEXED_PROPERTIES,
+                 columnar_scan=False):
+        """Create an NXGraph instance
+
+        :param indexed_properties: vertex properties to keep a hash index for
+        :type indexed_properties: tuple
+        :param compact_storage: keep the vertex properties in a
+        CompactVertexStore instead of a dict per vertex, or the
+        CompactVertexStore to use
+        :type compact_storage: bool or CompactVertexStore
+        :param range_indexed_properties: vertex properties to keep a sorted
+        index for, used by the range terms of query_dict
+        :type range_indexed_properties: tuple
+        :param columnar_scan: evaluate the queries that no index serves with
+        a ColumnarScanEngine, if NumPy is available
+        :type columnar_scan: bool
+        """
         super(NXGraph, self).__init__(name, NXGraph.GRAPH_TYPE)
-        self._g = nx.MultiDiGraph()
+        self.indexed_properties = tuple(indexed_properties or ())
+        self.range_indexed_properties = tuple(range_indexed_properties or ())
+        if columnar_scan and not columnar.is_available():
+            LOG.warning('NumPy is not installed, %s does not use the '
+                        'columnar scan engine', name)
+            columnar_scan = False
+        self.columnar_scan = columnar_scan
+        if isinstance(compact_storage, CompactVertexStore):
+            self._vertex_store = compact_storage
+        else:
+            self._vertex_store = \
+                CompactVertexStore() if compact_storage else None
+        self._vertex_factory = vertex_copy
+        self._edge_factory = edge_copy
+        self._g = CompactMultiDiGraph() \
+            if self._vertex_store is not None else nx.MultiDiGraph()
         self.root_id = root_id
 
+    @classmethod
+    def query_result(cls, name='graph'):
+        """An empty graph for the result of a query, without indexes
+
+        Query results are read, usually serialized, once: indexing their
+        vertices would cost more than it saves.
+
+        :rtype: NXGraph
+        """
+        return cls(name, indexed_properties=(), range_indexed_properties=())
+
+    @property
+    def _g(self):
+        return self._nx_graph
+
+    @_g.setter
+    def _g(self, nx_graph):
+        # The indexes are rebuilt whenever the underlying graph is replaced,
+        # e.g. by copy(), union() or a sub-graph created by the algorithms
+        self._nx_graph = nx_graph
+        self._read_only_view = None
+        # Snapshots of the previous graph keep its version log; that graph
+        # is not changed anymore
+        self._version_log = VersionLog()
+        self._rebuild_indexes()
+
     def __len__(self):
         return len(self._g)
 
     def copy(self):
-        self_copy = NXGraph(self.name, self.root_id)
+        self_copy = NXGraph(self.name,
+                            self.root_id,
+                            self.indexed_properties,
+                            self._vertex_store or False,
+                            self.range_indexed_properties,
+                            self.columnar_scan)
         self_copy._g = self._g.copy()
         return self_copy
 
+    def read_only_view(self):
+        """A view of this graph for callers that only read from it
+
+        The view shares the vertices, edges and indexes of this graph.
+        Vertices and edges returned by its read methods are not copied; their
+        properties are immutable mappings over the graph's own data, so no
+        dict is allocated per returned element. Elements fetched from the view
+        are only valid until the graph element changes: later changes may or
+        may not be visible through them.
+
+        Callers that change the returned elements (e.g. in order to call
+        update_vertex with them) must use the graph itself.
+
+        The properties of the returned elements are Mappings, not dicts:
+        oslo_serialization.jsonutils (and so oslo.messaging) serializes them,
+        but json.dumps must be given a copy of them (copy.copy or dict).
+
+        :rtype: NXGraph
+        """
+        if self._vertex_factory is vertex_view:
+            return self
+        if self._read_only_view is None:
+            view = copy.copy(self)
+            view._vertex_factory = vertex_view
+            view._edge_factory = edge_view
+            self._read_only_view = view
+        return self._read_only_view
+
+    def snapshot(self):
+        """A read only snapshot of the current state of the graph
+
+        Taking a snapshot is O(1): the snapshot reads the live graph, while
+        the graph keeps the previous state of the vertices, edges and
+        adjacencies changed after the snapshot was taken. The snapshot
+        should be released when done, preferably by using it as a context
+        manager:
+
+            with graph.snapshot() as snapshot:
+                ...
+
+        :rtype: NXGraphSnapshot
+        """
+        return NXGraphSnapshot(self, self._g, self._version_log)
+
+    def subgraph(self, vertex_ids):
+        """A graph of the given vertices and of the edges between them
+
+        The vertices and edges of the new graph share their properties with
+        this graph.
+
+        :rtype: NXGraph
+        """
+        graph = NXGraph.query_result()
+        graph._g = self._g.subgraph(vertex_ids)
+        return graph
+
+    def _rebuild_indexes(self):
+        self._label_index = LabelAdjacencyIndex(self._nx_graph)
+        self._columnar = columnar.ColumnarScanEngine(self._nx_graph) \
+            if self.columnar_scan else None
+        self._indexes = {key: PropertyIndex(key)
+                         for key in self.indexed_properties}
+        if not self._indexes and not self.range_indexed_properties:
+            return
+        for v_id, data in self._nx_graph.nodes_iter(data=True):
+            self._index_vertex(v_id, data)
+        # Sorted once, rather than by an insertion per vertex
+        for key in self.range_indexed_properties:
+            self._indexes[key] = SortedIndex(
+                key, ((v_id, data.get(key)) for v_id, data
+                      in self._nx_graph.nodes_iter(data=True)))
+
+    def _vertex_properties_copy(self, properties):
+        if self._vertex_store is not None:
+            return self._vertex_store.new_row(properties)
+        return copy.copy(properties)
+
+    def _stored_properties(self, properties):
+        """properties, as kept by the graph, for a dict owned by the graph"""
+        if self._vertex_store is not None:
+            return self._vertex_store.new_row(properties)
+        return properties
+
+    def _indexed_values(self, v_id):
+        data = self._g.node.get(v_id)
+        if data is None:
+            return None
+        return {key: data.get(key) for key in self._indexes}
+
+    def _index_vertex(self, v_id, data):
+        for key, index in self._indexes.items():
+            index.add(v_id, data.get(key))
+
+    def _reindex_vertex(self, v_id, old_values):
+        """Update the indexes after the properties of v_id were changed
+
+        :param old_values: indexed values before the change, as returned by
+        _indexed_values(), or None if the vertex did not exist
+        """
+        if self._columnar is not None:
+            self._columnar.update(v_id, self._g.node.get(v_id))
+        if not self._indexes:
+            return
+        new_values = self._indexed_values(v_id)
+        for key, index in self._indexes.items():
+            old_value = old_values.get(key) if old_values else None
+            new_value = new_values.get(key) if new_values else None
+            if old_values is not None and new_values is not None and \
+                    old_value == new_value:
+                continue
+            if old_values is not None:
+                index.remove(v_id, old_value)
+            if new_values is not None:
+                index.add(v_id, new_value)
+
+    def query_plan(self, query_dict):
+        """How get_vertices(query_dict=query_dict) finds the vertices
+
+        str() of the plan shows the indexes it uses, for debugging.
+
+        :rtype: vitrage.graph.query.QueryPlan
+        """
+        return plan_query(query_dict, self._indexes)
+
+    def _query_candidates(self, plan):
+        """Candidate vertex ids of a query plan, None for all the vertices
+
+        The queries that no index serves are evaluated by the columnar scan
+        engine, if enabled.
+        """
+        candidates = plan.candidates()
+        if candidates is None and self._columnar is not None:
+            candidates = self._columnar.match(plan.query)
+        return candidates
+
+    def _candidates_by_filter(self, vertex_attr_filter):
+        """Smallest candidate set of vertex ids according to the indexes
+
+        :return: a set of vertex ids that is a superset of the vertices that
+        match vertex_attr_filter, or None if no indexed key is filtered on
+        """
+        best_index = None
+        best_values = None
+        best_count = None
+        for key, content in vertex_attr_filter.items():
+            index = self._indexes.get(key)
+            if index is None:
+                continue
+            values = content if isinstance(content, list) else [content]
+            count = index.count(values)
+            if best_count is None or count < best_count:
+                best_index, best_values, best_count = index, values, count
+        if best_index is None:
+            return None
+        return best_index.lookup(best_values)
+
     @Notifier.update_notify
     def add_vertex(self, v):
         """Add a vertex to the graph
@@ -68,8 +724,19 @@ class NXGraph(Graph):
         self._add_vertex(v)
 
     def _add_vertex(self, v):
-        properties_copy = copy.copy(v.properties)
-        self._g.add_node(n=v.vertex_id, attr_dict=properties_copy)
+        # The properties of an existing element are never changed in place,
+        # but replaced, as views and snapshots may still be reading them
+        orig_prop = self._g.node.get(v.vertex_id)
+        self._version_log.record_vertex(v.vertex_id, orig_prop)
+        old_values = self._indexed_values(v.vertex_id)
+        if orig_prop is None:
+            properties_copy = self._vertex_properties_copy(v.properties)
+            self._g.add_node(n=v.vertex_id, attr_dict=properties_copy)
+        else:
+            new_prop = dict(orig_prop)
+            new_prop.update(v.properties)
+            self._g.node[v.vertex_id] = self._stored_properties(new_prop)
+        self._reindex_vertex(v.vertex_id, old_values)
 
     @Notifier.update_notify
     def add_edge(self, e):
@@ -80,10 +747,57 @@ class NXGraph(Graph):
         # Call a private method, so to separate the notifier from logic
         self._add_edge(e)
 
+    @Notifier.update_notify_batch
+    def add_vertices(self, vertices):
+        """Add several vertices to the graph
+
+        :type vertices: list of Vertex
+        """
+        for v in vertices:
+            self._add_vertex(v)
+
+    @Notifier.update_notify_batch
+    def add_edges(self, edges):
+        """Add several edges to the graph
+
+        :type edges: list of Edge
+        """
+        for e in edges:
+            self._add_edge(e)
+
     def _add_edge(self, e):
+        orig_prop = self._g.adj.get(
+            e.source_id, {}).get(
+            e.target_id, {}).get(
+            e.label, None)
+        if orig_prop is not None:
+            self._version_log.record_edge(
+                (e.source_id, e.target_id, e.label), orig_prop)
+            new_prop = dict(orig_prop)
+            new_prop.update(e.properties)
+            self._g.adj[e.source_id][e.target_id][e.label] = new_prop
+            self._label_index.update((e.source_id, e.target_id, e.label),
+                                     new_prop)
+            return
+
+        # networkx adds the end vertices if they are missing
+        missing_ids = [v_id for v_id in (e.source_id, e.target_id)
+                       if v_id not in self._g.node]
+        log = self._version_log
+        if log.is_recording():
+            for v_id in missing_ids:
+                log.record_vertex(v_id, None)
+            log.record_adjacency(self._g, e.source_id)
+            log.record_adjacency(self._g, e.target_id)
+            log.record_edge((e.source_id, e.target_id, e.label), None)
+
         properties_copy = copy.copy(e.properties)
         self._g.add_edge(u=e.source_id, v=e.target_id,
                          key=e.label, attr_dict=properties_copy)
+        self._label_index.add((e.source_id, e.target_id, e.label),
+                              properties_copy)
+        for v_id in missing_ids:
+            self._reindex_vertex(v_id, None)
 
     def get_vertex(self, v_id):
         """Fetch a vertex from the graph
@@ -92,7 +806,7 @@ class NXGraph(Graph):
         """
         properties = self._g.node.get(v_id, None)
         if properties is not None:
-            return vertex_copy(v_id, properties)
+            return self._vertex_factory(v_id, properties)
         LOG.debug("get_vertex item not found. v_id=%s", str(v_id))
         return None
 
@@ -104,7 +818,8 @@ class NXGraph(Graph):
                       "label=%s", str(source_id), str(target_id), str(label))
             return None
         if properties is not None:
-            return edge_copy(source_id, target_id, label, properties)
+            return self._edge_factory(source_id, target_id, label,
+                                      properties)
         return None
 
     def get_edges(self, v_id, direction=Direction.BOTH,
@@ -117,17 +832,26 @@ class NXGraph(Graph):
             return check_filter(edge_data, attr_filter)
 
         nodes, edges = self._neighboring_nodes_edges_query(
-            v_id, edge_predicate=check_edge, direction=direction)
-        edge_copies = [edge_copy(u, v, label, data)
-                       for u, v, label, data in edges]
-        return edge_copies
+            v_id, edge_predicate=check_edge, direction=direction,
+            edge_attr_filter=attr_filter)
+        edge_factory = self._edge_factory
+        return [edge_factory(u, v, label, data)
+                for u, v, label, data in edges]
 
-    def _get_edges_by_direction(self, v_id, direction):
+    def _get_edges_by_direction(self, v_id, direction, attr_filter=None):
         """Get all the edges from the vertex according to the direction
 
+        :param attr_filter: if given, edges that do not match it may be left
+        out
         :return: all the neighboring edges that match the filter
         :rtype: list of tuples (source_id, target_id, label, data)
         """
+        keys = self._edge_keys_by_filter(v_id, direction, attr_filter)
+        if keys is not None:
+            adj = self._g.adj
+            return [(source_id, target_id, label,
+                     adj[source_id][target_id][label])
+                    for source_id, target_id, label in keys]
         if direction == Direction.BOTH:
             edges = []
             edges.extend(self._get_edges_by_direction(v_id, Direction.IN))
@@ -138,6 +862,37 @@ class NXGraph(Graph):
         else:  # IN
             return self._g.in_edges(nbunch=v_id, data=True, keys=True)
 
+    def _vertex_data(self, v_id):
+        return self._g.node.get(v_id)
+
+    def _edge_data(self, source_id, target_id, label):
+        return self._g.adj.get(source_id, {}).get(target_id, {}).get(label)
+
+    def _neighbor_ids(self, v_id, direction):
+        """Ids of the vertices with an edge from or to v_id
+
+        Neither edges nor vertices are created; an id may be returned more
+        than once for Direction.BOTH.
+        """
+        if direction == Direction.OUT:
+            return self._g.succ[v_id]
+        if direction == Direction.IN:
+            return self._g.pred[v_id]
+        return itertools.chain(self._g.succ[v_id], self._g.pred[v_id])
+
+    def _edge_keys_by_filter(self, v_id, direction, attr_filter):
+        """Keys of the edges of v_id that may match attr_filter
+
+        :return: list of (source_id, target_id, label), or None if
+        attr_filter does not filter on the relationship type
+        """
+        if not attr_filter or EProps.RELATIONSHIP_TYPE not in attr_filter:
+            return None
+        labels = attr_filter[EProps.RELATIONSHIP_TYPE]
+        if not isinstance(labels, list):
+            labels = [labels]
+        return self._label_index.lookup(v_id, labels, direction)
+
     def num_vertices(self):
         return len(self._g)
 
@@ -151,12 +906,28 @@ class NXGraph(Graph):
         :param hard_update:
         :type v: Vertex
         """
+        self._update_vertex(v, hard_update)
+
+    @Notifier.update_notify_batch
+    def update_vertices(self, vertices, hard_update=False):
+        """Update the properties of several vertices
+
+        :param hard_update:
+        :type vertices: list of Vertex
+        """
+        for v in vertices:
+            self._update_vertex(v, hard_update)
+
+    def _update_vertex(self, v, hard_update):
         orig_prop = self._g.node.get(v.vertex_id, None)
         if not orig_prop:
             self._add_vertex(v)
             return
+        self._version_log.record_vertex(v.vertex_id, orig_prop)
+        old_values = self._indexed_values(v.vertex_id)
         new_prop = self._merge_properties(orig_prop, v.properties, hard_update)
-        self._g.node[v.vertex_id] = new_prop
+        self._g.node[v.vertex_id] = self._stored_properties(new_prop)
+        self._reindex_vertex(v.vertex_id, old_values)
 
     @Notifier.update_notify
     def update_edge(self, e, hard_update=False):
@@ -165,6 +936,19 @@ class NXGraph(Graph):
         :param hard_update:
         :type e: Edge
         """
+        self._update_edge(e, hard_update)
+
+    @Notifier.update_notify_batch
+    def update_edges(self, edges, hard_update=False):
+        """Update the properties of several edges
+
+        :param hard_update:
+        :type edges: list of Edge
+        """
+        for e in edges:
+            self._update_edge(e, hard_update)
+
+    def _update_edge(self, e, hard_update):
         orig_prop = self._g.edge.get(
             e.source_id, {}).get(
             e.target_id, {}).get(
@@ -172,48 +956,93 @@ class NXGraph(Graph):
         if not orig_prop:
             self._add_edge(e)
             return
+        self._version_log.record_edge((e.source_id, e.target_id, e.label),
+                                      orig_prop)
         new_prop = self._merge_properties(orig_prop, e.properties, hard_update)
         self._g.edge[e.source_id][e.target_id][e.label] = new_prop
+        self._label_index.update((e.source_id, e.target_id, e.label),
+                                 new_prop)
 
     @staticmethod
     def _merge_properties(base_props, new_props, hard_update):
         if base_props is None or hard_update:
-            base_props = copy.copy(new_props)
+            merged_props = new_props
         else:
-            base_props.update(copy.copy(new_props))
-        return {k: v for k, v in base_props.items() if v is not None}
+            # base_props is not changed, it may still be read by views and
+            # snapshots
+            merged_props = dict(base_props)
+            merged_props.update(new_props)
+        return {k: v for k, v in merged_props.items() if v is not None}
 
+    @Notifier.remove_notify
     def remove_vertex(self, v):
         """Remove Vertex v and its edges from the graph
 
+        Removal subscribers are notified of the vertex only.
+
         :type v: Vertex
         """
+        log = self._version_log
+        if log.is_recording() and v.vertex_id in self._g.node:
+            log.record_vertex(v.vertex_id, self._g.node[v.vertex_id])
+            log.record_adjacency(self._g, v.vertex_id)
+            for source_id, target_id, label, data in \
+                    self._get_edges_by_direction(v.vertex_id, Direction.BOTH):
+                log.record_edge((source_id, target_id, label), data)
+                log.record_adjacency(self._g, source_id)
+                log.record_adjacency(self._g, target_id)
+        for source_id, target_id, label, data in \
+                self._get_edges_by_direction(v.vertex_id, Direction.BOTH):
+            self._label_index.remove((source_id, target_id, label))
+        old_values = self._indexed_values(v.vertex_id)
         self._g.remove_node(n=v.vertex_id)
+        self._reindex_vertex(v.vertex_id, old_values)
 
+    @Notifier.remove_notify
     def remove_edge(self, e):
         """Remove an edge from the graph
 
         :type e: Edge
         """
+        log = self._version_log
+        if log.is_recording():
+            log.record_edge((e.source_id, e.target_id, e.label),
+                            self._g.adj.get(e.source_id, {}).get(
+                                e.target_id, {}).get(e.label))
+            log.record_adjacency(self._g, e.source_id)
+            log.record_adjacency(self._g, e.target_id)
         self._g.remove_edge(u=e.source_id, v=e.target_id, key=e.label)
+        self._label_index.remove((e.source_id, e.target_id, e.label))
 
-    def get_vertices(self, vertex_attr_filter=None, query_dict=None):
+    def get_vertices(self, vertex_attr_filter=None, query_dict=None,
+                     limit=None, offset=0, count_only=False, fields=None):
         def check_vertex(vertex_data):
             return check_filter(vertex_data[1], vertex_attr_filter)
 
         if not query_dict:
-            items = filter(check_vertex, self._g.nodes_iter(data=True))
-            return [vertex_copy(node, node_data) for node, node_data in items]
+            candidates = self._candidates_by_filter(vertex_attr_filter) \
+                if vertex_attr_filter else None
+            if candidates is None:
+                items = self._g.nodes_iter(data=True)
+            else:
+                nodes = self._g.node
+                items = ((v_id, nodes[v_id]) for v_id in candidates)
+            items = filter(check_vertex, items)
         elif not vertex_attr_filter:
-            vertices = []
-            match_func = create_predicate(query_dict)
-            for node, node_data in self._g.nodes_iter(data=True):
-                v = vertex_copy(node, node_data)
-                if match_func(v):
-                    vertices.append(v)
-            return vertices
+            plan = self.query_plan(query_dict)
+            candidates = self._query_candidates(plan)
+            match_func = plan.predicate
+            if candidates is None:
+                items = self._g.nodes_iter(data=True)
+            else:
+                nodes = self._g.node
+                items = ((v_id, nodes[v_id]) for v_id in candidates)
+            items = ((node, node_data) for node, node_data in items
+                     if match_func(node_data))
         else:
-            return []
+            items = ()
+        return select_vertices(items, self._vertex_factory, limit, offset,
+                               count_only, fields)
 
     def neighbors(self, v_id, vertex_attr_filter=None, edge_attr_filter=None,
                   direction=Direction.BOTH):
@@ -226,15 +1055,16 @@ class NXGraph(Graph):
 
         nodes, edges = self._neighboring_nodes_edges_query(
             v_id=v_id, vertex_predicate=check_vertex,
-            edge_predicate=check_edge, direction=direction)
-        vertices = [vertex_copy(n, data) for n, data in nodes]
-        return vertices
+            edge_predicate=check_edge, direction=direction,
+            edge_attr_filter=edge_attr_filter)
+        vertex_factory = self._vertex_factory
+        return [vertex_factory(n, data) for n, data in nodes]
 
     def _neighboring_nodes_edges_query(self, v_id,
                                        vertex_predicate=None,
                                        edge_predicate=None,
                                        direction=Direction.BOTH,
-                                       ):
+                                       edge_attr_filter=None):
         if not direction:
             LOG.error("_neighboring_nodes_edges: direction cannot be None")
             raise AttributeError("neighbors: direction cannot be None")
@@ -243,7 +1073,8 @@ class NXGraph(Graph):
             LOG.error("_neighboring_nodes_edges: v_id cannot be None")
             raise AttributeError("neighbors: v_id cannot be None")
 
-        edges = self._get_edges_by_direction(v_id, direction)
+        edges = self._get_edges_by_direction(v_id, direction,
+                                             edge_attr_filter)
         edges_filtered1 = []
         for edge in edges:
             if not edge_predicate or edge_predicate(edge[3]):
@@ -261,19 +1092,367 @@ class NXGraph(Graph):
         return nodes, edges_filtered2
 
     def output_graph(self, **kwargs):
-        node_link_data = json_graph.node_link_data(self._g)
-        node_link_data.update(kwargs)
+        return ''.join(self.output_graph_chunks(**kwargs))
+
+    def output_graph_chunks(self, chunk_size=OUTPUT_CHUNK_SIZE, **kwargs):
+        """The JSON of output_graph(), as a generator of string chunks
 
-        for index, node in enumerate(node_link_data['nodes']):
-            if VProps.ID in self._g.node[node[VProps.ID]]:
-                node[VProps.ID] = self._g.node[node[VProps.ID]][VProps.ID]
+        Every chunk holds the encoding of at most chunk_size nodes or links,
+        so the whole node-link data is never held in memory.
+        """
+        parts = self.output_graph_parts(chunk_size, **kwargs)
+        header = json.dumps(next(parts))
+        yield header[:-1] + ', "nodes": ['
+        section = 'nodes'
+        first = True
+        for part in parts:
+            key, elements = next(iter(part.items()))
+            if key != section:
+                yield '], "%s": [' % key
+                section = key
+                first = True
+            if not first:
+                yield ', '
+            yield ', '.join(json.dumps(element) for element in elements)
+            first = False
+        if section == 'nodes':
+            yield '], "links": ['
+        yield ']}'
+
+    def output_graph_parts(self, chunk_size=OUTPUT_CHUNK_SIZE, **kwargs):
+        """The node-link data of output_graph(), as a generator of parts
+
+        The first part is a dict of the graph attributes, updated with
+        kwargs. It is followed by {'nodes': [...]} parts and then by
+        {'links': [...]} parts, each with at most chunk_size elements; a
+        list that would be empty has no part. merge_output_graph_parts()
+        builds the node-link data back from the parts.
+
+        As in networkx node_link_data(), every node has the vertex id as
+        'id', replaced by the vertex ID property and a graph_index if the
+        vertex has one, and the links refer to the node indexes.
+        """
+        graph = {'directed': True, 'multigraph': True, 'graph': self._g.graph}
+        graph.update(kwargs)
+        yield graph
+
+        node_index = {}
+        nodes = []
+        for index, (v_id, data) in enumerate(self._g.nodes_iter(data=True)):
+            node_index[v_id] = index
+            node = dict(data)
+            if VProps.ID in data:
                 node[VProps.GRAPH_INDEX] = index
+            else:
+                node[VProps.ID] = v_id
+            nodes.append(node)
+            if len(nodes) >= chunk_size:
+                yield {'nodes': nodes}
+                nodes = []
+        if nodes:
+            yield {'nodes': nodes}
 
-        return json.dumps(node_link_data)
+        links = []
+        for source_id, target_id, label, data in \
+                self._g.edges_iter(keys=True, data=True):
+            link = dict(data)
+            link['source'] = node_index[source_id]
+            link['target'] = node_index[target_id]
+            link['key'] = label
+            links.append(link)
+            if len(links) >= chunk_size:
+                yield {'links': links}
+                links = []
+        if links:
+            yield {'links': links}
 
     def union(self, other_graph):
         """Union two graphs - add all vertices and edges of other graph
 
+        The vertices and edges are added in place. The properties of a
+        vertex or an edge that is in both graphs are merged, the properties
+        of other_graph taking precedence.
+
         :type other_graph: NXGraph
         """
-        self._g = compose(self._g, other_graph._g)
+        nodes = self._g.node
+        for v_id, data in other_graph._g.nodes_iter(data=True):
+            # e.g. sub graphs of the same graph share their properties
+            if nodes.get(v_id) is not data:
+                self._add_vertex(Vertex(v_id, data))
+        adj = self._g.adj
+        for source_id, target_id, label, data in \
+                other_graph._g.edges_iter(keys=True, data=True):
+            if adj.get(source_id, {}).get(target_id, {}).get(label) \
+                    is not data:
+                self._add_edge(Edge(source_id, target_id, label, data))
+
+
+def _read_only(*args, **kwargs):
+    raise TypeError('A graph snapshot is read only')
+
+
+class NXGraphSnapshot(Graph):
+    """A read only snapshot of an NXGraph, see NXGraph.snapshot()
+
+    The vertices and edges returned by the snapshot are read only views
+    (see NXGraph.read_only_view()); unlike the elements of a view, they are
+    not changed by later changes of the graph.
+    """
+
+    def __init__(self, graph, nx_graph, version_log, version=None):
+        super(NXGraphSnapshot, self).__init__(graph.name, graph.graph_type)
+        self.root_id = graph.root_id
+        self._graph = graph
+        self._nx_graph = nx_graph
+        self._version_log = version_log
+        self.version = version_log.pin(version)
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._version_log.unpin(self.version)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def __del__(self):
+        try:
+            self.release()
+        except Exception:  # interpreter shutdown
+            pass
+
+    def __len__(self):
+        return self.num_vertices()
+
+    def snapshot(self):
+        return NXGraphSnapshot(self._graph, self._nx_graph,
+                               self._version_log, self.version)
+
+    def read_only_view(self):
+        return self
+
+    def _vertex_data(self, v_id):
+        changed, data = self._version_log.vertex_at(v_id, self.version)
+        if changed:
+            return data
+        return self._nx_graph.node.get(v_id)
+
+    def _edge_data(self, source_id, target_id, label):
+        changed, data = self._version_log.edge_at(
+            (source_id, target_id, label), self.version)
+        if changed:
+            return data
+        return self._nx_graph.adj.get(
+            source_id, {}).get(
+            target_id, {}).get(
+            label, None)
+
+    def _neighbor_ids(self, v_id, direction):
+        for source_id, target_id, label in self._version_log.edge_keys_at(
+                self._nx_graph, v_id, self.version, direction):
+            if self._edge_data(source_id, target_id, label) is not None:
+                yield source_id if target_id == v_id else target_id
+
+    def _get_edges_by_direction(self, v_id, direction, attr_filter=None):
+        keys = None
+        if attr_filter and self._graph._g is self._nx_graph and \
+                not self._version_log.adjacency_changed_after(v_id,
+                                                              self.version):
+            # The label index of the graph is valid for the live adjacency
+            keys = self._graph._edge_keys_by_filter(v_id, direction,
+                                                    attr_filter)
+        if keys is None:
+            keys = self._version_log.edge_keys_at(
+                self._nx_graph, v_id, self.version, direction)
+        edges = []
+        for source_id, target_id, label in keys:
+            data = self._edge_data(source_id, target_id, label)
+            if data is not None:
+                edges.append((source_id, target_id, label, data))
+        return edges
+
+    def _vertex_items(self, candidates=None):
+        """(vertex id, properties) of the vertices of the snapshot
+
+        :param candidates: if given, only the live vertices in candidates
+        are returned, together with the vertices changed since the snapshot
+        """
+        changed = self._version_log.vertices_changed_after(self.version)
+        nodes = self._nx_graph.node
+        if candidates is None:
+            items = [(v_id, data) for v_id, data in nodes.items()
+                     if v_id not in changed]
+        else:
+            items = [(v_id, nodes[v_id]) for v_id in candidates
+                     if v_id not in changed and v_id in nodes]
+        items.extend((v_id, data) for v_id, data in changed.items()
+                     if data is not None)
+        return items
+
+    def num_vertices(self):
+        changed = self._version_log.vertices_changed_after(self.version)
+        nodes = self._nx_graph.node
+        return len(nodes) + sum(
+            (data is not None) - (v_id in nodes)
+            for v_id, data in changed.items())
+
+    def num_edges(self):
+        changed = self._version_log.edges_changed_after(self.version)
+        adj = self._nx_graph.adj
+        return self._nx_graph.number_of_edges() + sum(
+            (data is not None) -
+            (label in adj.get(source_id, {}).get(target_id, {}))
+            for (source_id, target_id, label), data in changed.items())
+
+    def get_vertex(self, v_id):
+        data = self._vertex_data(v_id)
+        if data is not None:
+            return vertex_view(v_id, data)
+        LOG.debug("get_vertex item not found. v_id=%s", str(v_id))
+        return None
+
+    def get_edge(self, source_id, target_id, label):
+        data = self._edge_data(source_id, target_id, label)
+        if data is not None:
+            return edge_view(source_id, target_id, label, data)
+        LOG.debug("get_edge item not found. source_id=%s, target_id=%s, "
+                  "label=%s", str(source_id), str(target_id), str(label))
+        return None
+
+    def get_edges(self, v_id, direction=Direction.BOTH,
+                  attr_filter=None):
+        def check_edge(edge_data):
+            return check_filter(edge_data, attr_filter)
+
+        nodes, edges = self._neighboring_nodes_edges_query(
+            v_id, edge_predicate=check_edge, direction=direction,
+            edge_attr_filter=attr_filter)
+        return [edge_view(u, v, label, data) for u, v, label, data in edges]
+
+    def get_vertices(self, vertex_attr_filter=None, query_dict=None,
+                     limit=None, offset=0, count_only=False, fields=None):
+        if vertex_attr_filter and query_dict:
+            return select_vertices((), vertex_view, count_only=count_only)
+        candidates = None
+        live = self._graph._g is self._nx_graph
+        if vertex_attr_filter and live:
+            # The indexes of the graph are valid for the live vertices
+            candidates = self._graph._candidates_by_filter(vertex_attr_filter)
+        if query_dict and live:
+            plan = self._graph.query_plan(query_dict)
+            candidates = self._graph._query_candidates(plan)
+            match_func = plan.predicate
+        elif query_dict:
+            match_func = create_predicate(query_dict)
+        else:
+            def match_func(vertex_data):
+                return check_filter(vertex_data, vertex_attr_filter)
+        items = ((v_id, data) for v_id, data in self._vertex_items(candidates)
+                 if match_func(data))
+        return select_vertices(items, vertex_view, limit, offset, count_only,
+                               fields)
+
+    def neighbors(self, v_id, vertex_attr_filter=None, edge_attr_filter=None,
+                  direction=Direction.BOTH):
+
+        def check_edge(edge_data):
+            return check_filter(edge_data, edge_attr_filter)
+
+        def check_vertex(vertex_data):
+            return check_filter(vertex_data, vertex_attr_filter)
+
+        nodes, edges = self._neighboring_nodes_edges_query(
+            v_id=v_id, vertex_predicate=check_vertex,
+            edge_predicate=check_edge, direction=direction,
+            edge_attr_filter=edge_attr_filter)
+        return [vertex_view(n, data) for n, data in nodes]
+
+    def _neighboring_nodes_edges_query(self, v_id,
+                                       vertex_predicate=None,
+                                       edge_predicate=None,
+                                       direction=Direction.BOTH,
+                                       edge_attr_filter=None):
+        if not direction:
+            LOG.error("_neighboring_nodes_edges: direction cannot be None")
+            raise AttributeError("neighbors: direction cannot be None")
+
+        if not v_id:
+            LOG.error("_neighboring_nodes_edges: v_id cannot be None")
+            raise AttributeError("neighbors: v_id cannot be None")
+
+        nodes = []
+        edges = []
+        for source_id, target_id, label, data in \
+                self._get_edges_by_direction(v_id, direction,
+                                             edge_attr_filter):
+            if edge_predicate and not edge_predicate(data):
+                continue
+            node_id = source_id if target_id == v_id else target_id
+            node_data = self._vertex_data(node_id)
+            if not vertex_predicate or vertex_predicate(node_data):
+                edges.append((source_id, target_id, label, data))
+                nodes.append((node_id, node_data))
+        return nodes, edges
+
+    def _to_nx_graph(self, vertex_items, copy_func):
+        nx_graph = nx.MultiDiGraph()
+        for v_id, data in vertex_items:
+            nx_graph.add_node(v_id, attr_dict=copy_func(data))
+        for v_id in nx_graph.nodes():
+            for source_id, target_id, label, data in \
+                    self._get_edges_by_direction(v_id, Direction.OUT):
+                if target_id in nx_graph.node:
+                    nx_graph.add_edge(source_id, target_id, key=label,
+                                      attr_dict=copy_func(data))
+        return nx_graph
+
+    def subgraph(self, vertex_ids):
+        """A graph of the given vertices and of the edges between them
+
+        :rtype: NXGraph
+        """
+        vertex_items = []
+        added_ids = set()
+        for v_id in vertex_ids:
+            if v_id in added_ids:
+                continue
+            added_ids.add(v_id)
+            data = self._vertex_data(v_id)
+            if data is not None:
+                vertex_items.append((v_id, data))
+        graph = NXGraph.query_result()
+        graph._g = self._to_nx_graph(vertex_items, copy.copy)
+        return graph
+
+    def copy(self):
+        """A regular, modifiable NXGraph with the content of the snapshot
+
+        :rtype: NXGraph
+        """
+        graph = NXGraph(self.name, self.root_id,
+                        self._graph.indexed_properties,
+                        range_indexed_properties=self._graph.
+                        range_indexed_properties)
+        graph._g = self._to_nx_graph(self._vertex_items(), copy.deepcopy)
+        return graph
+
+    def output_graph(self, **kwargs):
+        return self._full_graph().output_graph(**kwargs)
+
+    def output_graph_chunks(self, chunk_size=OUTPUT_CHUNK_SIZE, **kwargs):
+        return self._full_graph().output_graph_chunks(chunk_size, **kwargs)
+
+    def output_graph_parts(self, chunk_size=OUTPUT_CHUNK_SIZE, **kwargs):
+        return self._full_graph().output_graph_parts(chunk_size, **kwargs)
+
+    def _full_graph(self):
+        return self.subgraph([v_id for v_id, data in self._vertex_items()])
+
+    add_vertex = add_vertices = add_edge = add_edges = _read_only
+    update_vertex = update_vertices = update_edge = update_edges = _read_only
+    remove_vertex = remove_edge = union = _read_only
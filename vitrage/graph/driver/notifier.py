@@ -12,38 +12,313 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from collections import namedtuple
+from collections import OrderedDict
+import contextlib
 import functools
+import threading
+import time
 
+from oslo_log import log as logging
+from six.moves import queue
+
+from vitrage.graph.driver.elements import Edge
 from vitrage.graph.driver.elements import Vertex
 
+LOG = logging.getLogger(__name__)
+
+
+class ElementChange(namedtuple('ElementChange',
+                               ['before', 'current', 'is_vertex'])):
+    """The change of a graph element
+
+    before is None for a new element, and current is None for a removed one.
+    They are read only views where the graph supports them: the graph
+    replaces, and never changes in place, the properties of its elements, so
+    the views keep the state they were taken at.
+    """
+
+    __slots__ = ()
+
+    @property
+    def key(self):
+        """The vertex id, or (source id, target id, label), of the element"""
+        return _item_key(self.current if self.current is not None
+                         else self.before)
+
+    def changed_properties(self):
+        """The properties that changed, with their old and new values
+
+        :return: {key: (old value, new value)}, with None for a missing
+        property
+        :rtype: dict
+        """
+        before = self.before.properties if self.before is not None else {}
+        current = self.current.properties if self.current is not None else {}
+        changed = {}
+        for key in set(before) | set(current):
+            old_value = before.get(key)
+            new_value = current.get(key)
+            if old_value != new_value:
+                changed[key] = (old_value, new_value)
+        return changed
+
 
 def _before_func(graph, item):
     if not graph.is_subscribed():
         return
-    return graph.get_item(item)
+    return graph.read_only_view().get_item(item)
 
 
 def _after_func(graph, item, data_before=None):
     if not graph.is_subscribed():
         return
-    element = graph.get_item(item)
-    is_vertex = isinstance(element, Vertex)
-    graph.notifier.notify(data_before, graph.get_item(item), is_vertex)
+    # Of the item, as a removed element is None
+    is_vertex = isinstance(item, Vertex)
+    graph.notifier.notify(data_before,
+                          graph.read_only_view().get_item(item),
+                          is_vertex)
+
+
+def _item_key(item):
+    if isinstance(item, Edge):
+        return item.source_id, item.target_id, item.label
+    return item.vertex_id
+
+
+class OverflowPolicy(object):
+    """What an asynchronous subscription does when its queue is full"""
+    # Wait for the subscriber, as a synchronous subscription does
+    BLOCK = 'block'
+    # Drop the oldest queued notification, or the new one
+    DROP_OLDEST = 'drop_oldest'
+    DROP_NEWEST = 'drop_newest'
+
+    policies = (BLOCK, DROP_OLDEST, DROP_NEWEST)
+
+
+class AsyncSubscription(object):
+    """A subscriber called from its own worker thread
+
+    The notifications are put on a bounded queue, so the graph changes do
+    not wait for the subscriber, e.g. for a message bus publish, until the
+    queue is full. The worker is a regular thread, and a greenthread where
+    eventlet monkey patched threading.
+    """
+
+    def __init__(self, function, max_size, overflow_policy):
+        if overflow_policy not in OverflowPolicy.policies:
+            raise ValueError('Unknown overflow policy %s' % overflow_policy)
+        self.function = function
+        self.overflow_policy = overflow_policy
+        self.delivered = 0
+        self.dropped = 0
+        # Seconds from the notification to its delivery
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._queue = queue.Queue(max_size)
+        self._worker = threading.Thread(target=self._run,
+                                        name='notifier-%s' % self.name)
+        self._worker.daemon = True
+        self._worker.start()
+
+    @property
+    def name(self):
+        return getattr(self.function, '__name__', str(self.function))
+
+    def __call__(self, *args):
+        item = (time.time(), args)
+        if self.overflow_policy == OverflowPolicy.BLOCK:
+            self._queue.put(item)
+            return
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                if self.overflow_policy == OverflowPolicy.DROP_NEWEST:
+                    self._drop()
+                    return
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+                self._drop()
+            except queue.Empty:
+                pass
+
+    def stats(self):
+        """Delivery metrics of the subscription
+
+        :rtype: dict
+        """
+        return {'name': self.name,
+                'queued': self._queue.qsize(),
+                'delivered': self.delivered,
+                'dropped': self.dropped,
+                'last_lag': self.last_lag,
+                'max_lag': self.max_lag}
+
+    def join(self):
+        """Wait until all the queued notifications were delivered"""
+        self._queue.join()
+
+    def _drop(self):
+        self.dropped += 1
+        if self.dropped % 1000 == 1:
+            LOG.warning('The notification queue of %s is full, %s '
+                        'notifications were dropped so far', self.name,
+                        self.dropped)
+
+    def _run(self):
+        while True:
+            notify_time, args = self._queue.get()
+            try:
+                self.function(*args)
+            except Exception as e:
+                LOG.exception('Graph subscriber %s failed: %s', self.name, e)
+            finally:
+                lag = time.time() - notify_time
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                self.delivered += 1
+                self._queue.task_done()
 
 
 class Notifier(object):
+    # Default size of the queue of an asynchronous subscription
+    MAX_QUEUE_SIZE = 10000
+
     def __init__(self):
         self._subscriptions = []
+        self._batch_subscriptions = []
+        self._async_subscriptions = []
+        # Called with the removed elements, see subscribe_removals()
+        self._removal_subscriptions = []
+        # key -> ElementChange, of the changes held by coalesce()
+        self._pending = None
+
+    def subscribe(self, function, batch=False, asynchronous=False,
+                  max_queue_size=MAX_QUEUE_SIZE,
+                  overflow_policy=OverflowPolicy.BLOCK):
+        """Subscribe to graph changes
+
+        :param function: called with (before, current, is_vertex) for every
+        changed element, or with a list of ElementChange if batch is True
+        :param batch: deliver the changes of a bulk mutation (e.g.
+        add_vertices), or of a coalesce() block, in a single call
+        :param asynchronous: call function from a worker thread, through a
+        queue of max_queue_size notifications, instead of from the graph
+        change. See AsyncSubscription
+        :param overflow_policy: an OverflowPolicy, for a full queue
+        """
+        if asynchronous:
+            function = AsyncSubscription(function,
+                                         max_queue_size,
+                                         overflow_policy)
+            self._async_subscriptions.append(function)
+        if batch:
+            self._batch_subscriptions.append(function)
+        else:
+            self._subscriptions.append(function)
 
-    def subscribe(self, function):
-        self._subscriptions.append(function)
+    def subscribe_removals(self, function):
+        """Subscribe to the removals of graph elements
+
+        The subscribers of the changes are not notified when an element is
+        removed, e.g. by remove_vertex(). function is called with the Vertex
+        or Edge given to the removal, right after it, including in a
+        coalesce() block.
+        """
+        self._removal_subscriptions.append(function)
+
+    def async_stats(self):
+        """The delivery metrics of the asynchronous subscriptions
+
+        :rtype: list of dict
+        """
+        return [subscription.stats()
+                for subscription in self._async_subscriptions]
+
+    def log_async_stats(self):
+        """Log the delivery metrics of the asynchronous subscriptions"""
+        for stats in self.async_stats():
+            LOG.info('Graph subscriber %(name)s: %(queued)s queued, '
+                     '%(delivered)s delivered, %(dropped)s dropped '
+                     'notifications, lag %(last_lag).3f seconds (max '
+                     '%(max_lag).3f)', stats)
+
+    def flush(self):
+        """Wait until the asynchronous subscribers got all the changes"""
+        for subscription in self._async_subscriptions:
+            subscription.join()
 
     def is_subscribed(self):
-        return len(self._subscriptions) != 0
+        return len(self._subscriptions) != 0 or \
+            len(self._batch_subscriptions) != 0
+
+    @contextlib.contextmanager
+    def coalesce(self):
+        """Hold the changes of a block, and deliver them as one change-set
+
+        The changes of an element in the block are coalesced into one
+        change, from its state before the first change to its state after
+        the last one. Nested blocks are part of the outermost one.
+        """
+        if self._pending is not None:
+            yield
+            return
+        self._pending = OrderedDict()
+        try:
+            yield
+        finally:
+            pending, self._pending = self._pending, None
+            self._deliver([change for change in pending.values()
+                           if change.before is not None or
+                           change.current is not None])
 
     def notify(self, *args, **kwargs):
+        if self._pending is not None:
+            self._hold(ElementChange(*args, **kwargs))
+            return
         for func in self._subscriptions:
             func(*args, **kwargs)
+        if self._batch_subscriptions:
+            change = ElementChange(*args, **kwargs)
+            for func in self._batch_subscriptions:
+                func([change])
+
+    def notify_batch(self, changes):
+        """Deliver a change-set
+
+        :type changes: list of ElementChange
+        """
+        if self._pending is not None:
+            for change in changes:
+                self._hold(change)
+            return
+        self._deliver(changes)
+
+    def notify_removal(self, item):
+        for func in self._removal_subscriptions:
+            func(item)
+
+    def _deliver(self, changes):
+        if not changes:
+            return
+        for func in self._subscriptions:
+            for change in changes:
+                func(*change)
+        for func in self._batch_subscriptions:
+            func(changes)
+
+    def _hold(self, change):
+        key = change.key
+        held = self._pending.get(key)
+        if held is not None:
+            change = ElementChange(held.before,
+                                   change.current,
+                                   change.is_vertex)
+        self._pending[key] = change
 
     @staticmethod
     def update_notify(func):
@@ -54,6 +329,48 @@ class Notifier(object):
             _after_func(graph, item, data_before)
         return notified_func
 
+    @staticmethod
+    def update_notify_batch(func):
+        """Notify the changes of a bulk mutation as a single change-set
+
+        The decorated method receives a list of elements. Every element is
+        read once before and once after the whole batch is applied; an
+        element that appears more than once in the batch is reported once,
+        with its state before the first and after the last change.
+        """
+        @functools.wraps(func)
+        def notified_func(graph, items, *args, **kwargs):
+            if not graph.is_subscribed():
+                func(graph, items, *args, **kwargs)
+                return
+
+            items = list(items)
+            view = graph.read_only_view()
+            befores = OrderedDict()
+            for item in items:
+                key = _item_key(item)
+                if key not in befores:
+                    befores[key] = (item, view.get_item(item))
+
+            func(graph, items, *args, **kwargs)
+
+            changes = []
+            for item, before in befores.values():
+                changes.append(ElementChange(before,
+                                             view.get_item(item),
+                                             isinstance(item, Vertex)))
+            graph.notifier.notify_batch(changes)
+        return notified_func
+
+    @staticmethod
+    def remove_notify(func):
+        """Notify the removal subscribers, see subscribe_removals()"""
+        @functools.wraps(func)
+        def notified_func(graph, item, *args, **kwargs):
+            func(graph, item, *args, **kwargs)
+            graph.notifier.notify_removal(item)
+        return notified_func
+
     @staticmethod
     def add_notify(func):
         @functools.wraps(func)
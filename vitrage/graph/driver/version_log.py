@@ -0,0 +1,196 @@
+# Copyright 2016 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Versions of graph entries, for copy-on-write snapshots
+
+A snapshot pins the current version of the graph in O(1). From then on, the
+first change of every vertex, edge or adjacency entry in a new version
+records the previous state of that entry (its pre-image). A snapshot reads
+an entry from the oldest pre-image recorded after its version, or from the
+live graph if the entry has not changed since. Nothing is recorded while no
+snapshot is pinned, and pre-images that no pinned snapshot can see are
+dropped when snapshots are released.
+
+The graph replaces, rather than updates in place, the properties of the
+elements it changes, so a pre-image is the replaced properties object itself.
+"""
+
+from collections import defaultdict
+
+from vitrage.graph.driver.graph import Direction
+
+
+class VersionLog(object):
+
+    def __init__(self):
+        self.version = 0
+        self._pins = defaultdict(int)
+        # entry key -> list of (version, pre-image), ordered by version
+        self._vertices = {}
+        self._edges = {}
+        self._adjacency = {}
+
+    def is_recording(self):
+        return len(self._pins) != 0
+
+    def pin(self, version=None):
+        """Pin the current version, or pin again an already pinned version
+
+        :return: the pinned version, to be passed to unpin()
+        """
+        if version is not None:
+            self._pins[version] += 1
+            return version
+        pinned = self.version
+        self._pins[pinned] += 1
+        # Changes from now on belong to a version no snapshot has seen
+        self.version += 1
+        return pinned
+
+    def unpin(self, version):
+        count = self._pins.get(version)
+        if not count:
+            return
+        if count > 1:
+            self._pins[version] = count - 1
+            return
+        del self._pins[version]
+        self._prune()
+
+    def _prune(self):
+        if not self._pins:
+            self._vertices.clear()
+            self._edges.clear()
+            self._adjacency.clear()
+            return
+        oldest = min(self._pins)
+        for history in (self._vertices, self._edges, self._adjacency):
+            for key in list(history):
+                entries = [entry for entry in history[key]
+                           if entry[0] > oldest]
+                if entries:
+                    history[key] = entries
+                else:
+                    del history[key]
+
+    def _record(self, history, key, pre_image):
+        entries = history.get(key)
+        if entries is None:
+            entries = history[key] = []
+        elif entries[-1][0] == self.version:
+            # Already recorded in this version
+            return
+        entries.append((self.version, pre_image))
+
+    def record_vertex(self, v_id, data):
+        """Record the state of a vertex before it is changed
+
+        :param data: the current properties of the vertex, None if the
+        vertex does not exist
+        """
+        if self._pins:
+            self._record(self._vertices, v_id, data)
+
+    def record_edge(self, edge_key, data):
+        """Record the state of an edge before it is changed
+
+        :param edge_key: (source_id, target_id, label)
+        :param data: the current properties of the edge, None if the edge
+        does not exist
+        """
+        if self._pins:
+            self._record(self._edges, edge_key, data)
+
+    def record_adjacency(self, nx_graph, v_id):
+        """Record the edges of a vertex before one of them is added/removed"""
+        if self._pins:
+            entries = self._adjacency.get(v_id)
+            if entries and entries[-1][0] == self.version:
+                return
+            self._record(self._adjacency, v_id,
+                         self.live_edge_keys(nx_graph, v_id))
+
+    @staticmethod
+    def live_edge_keys(nx_graph, v_id):
+        """The (out edges, in edges) keys of a vertex in the live graph"""
+        if v_id not in nx_graph.succ:
+            return None
+        out_keys = tuple((v_id, target_id, label)
+                         for target_id, labels in nx_graph.succ[v_id].items()
+                         for label in labels)
+        in_keys = tuple((source_id, v_id, label)
+                        for source_id, labels in nx_graph.pred[v_id].items()
+                        for label in labels)
+        return out_keys, in_keys
+
+    @staticmethod
+    def _at(history, key, version):
+        """The state of an entry as seen by version
+
+        :return: (True, pre-image) if the entry changed after version,
+        (False, None) if the live entry should be read
+        """
+        entries = history.get(key)
+        if entries:
+            for entry_version, pre_image in entries:
+                if entry_version > version:
+                    return True, pre_image
+        return False, None
+
+    def vertex_at(self, v_id, version):
+        return self._at(self._vertices, v_id, version)
+
+    def edge_at(self, edge_key, version):
+        return self._at(self._edges, edge_key, version)
+
+    def edge_keys_at(self, nx_graph, v_id, version, direction):
+        """Keys of the edges of a vertex as seen by version
+
+        :rtype: list of (source_id, target_id, label)
+        """
+        changed, keys = self._at(self._adjacency, v_id, version)
+        if not changed:
+            keys = self.live_edge_keys(nx_graph, v_id)
+        if keys is None:
+            return []
+        out_keys, in_keys = keys
+        if direction == Direction.OUT:
+            return list(out_keys)
+        if direction == Direction.IN:
+            return list(in_keys)
+        return list(in_keys) + list(out_keys)
+
+    def adjacency_changed_after(self, v_id, version):
+        """Whether an edge of the vertex was added or removed after version"""
+        return self._at(self._adjacency, v_id, version)[0]
+
+    def vertices_changed_after(self, version):
+        """Vertices changed after version, with their state at version
+
+        :return: vertex id -> properties, None if the vertex did not exist
+        :rtype: dict
+        """
+        return self._changed_after(self._vertices, version)
+
+    def edges_changed_after(self, version):
+        return self._changed_after(self._edges, version)
+
+    @classmethod
+    def _changed_after(cls, history, version):
+        changed = {}
+        for key in history:
+            found, pre_image = cls._at(history, key, version)
+            if found:
+                changed[key] = pre_image
+        return changed
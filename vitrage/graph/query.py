@@ -12,6 +12,11 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from collections import OrderedDict
+import operator
+import re
+import threading
+
 from oslo_log import log as logging
 import six
 
@@ -27,6 +32,10 @@ operators = [
     '!=',
     '>=',
     '>',
+    'in',
+    'not in',
+    'exists',
+    'startswith',
 ]
 
 logical_operations = [
@@ -34,6 +43,89 @@ logical_operations = [
     'or'
 ]
 
+_range_operators = ('<', '<=', '>=', '>')
+
+_membership_operators = ('in', 'not in')
+
+_operator_functions = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>=': operator.ge,
+    '>': operator.gt,
+}
+
+# Number of compiled predicates kept by create_predicate
+PREDICATE_CACHE_SIZE = 256
+
+# A UTC timestamp, with a space or 'T' separator and an optional fraction of
+# a second, as the datasources and oslo_utils format them
+_TIMESTAMP_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})'
+                           r'(?:\.(\d{1,6}))?(?:Z|[+-]00:?00)?$')
+
+
+def range_key(value):
+    """The key by which the range terms compare a string value
+
+    Timestamps are compared in time order, whatever their format: their key
+    is the timestamp as 'YYYY-MM-DD HH:MM:SS.ffffff'. The key of any other
+    string is the string itself. A timestamp and its key start with the
+    same date.
+
+    :type value: str
+    """
+    match = _TIMESTAMP_RE.match(value)
+    if match is None:
+        return value
+    date, time_of_day, fraction = match.groups()
+    return '%s %s.%s' % (date, time_of_day, (fraction or '').ljust(6, '0'))
+
+
+class PredicateCache(object):
+    """Bounded LRU cache of compiled predicates
+
+    Keyed on the canonical form of a query (see _cache_key), so that the
+    same query, e.g. RCA_QUERY on every API request, is compiled once.
+    """
+
+    def __init__(self, maxsize=PREDICATE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._predicates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            predicate = self._predicates.pop(key, None)
+            if predicate is None:
+                self.misses += 1
+                return None
+            # Most recently used last
+            self._predicates[key] = predicate
+            self.hits += 1
+            return predicate
+
+    def put(self, key, predicate):
+        with self._lock:
+            self._predicates.pop(key, None)
+            self._predicates[key] = predicate
+            while len(self._predicates) > self.maxsize:
+                self._predicates.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._predicates.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._predicates)
+
+
+predicate_cache = PredicateCache()
+
 
 def create_predicate(query_dict):
     """Create predicate from a logical and/or/==/>/etc expression
@@ -52,8 +144,21 @@ def create_predicate(query_dict):
 
     Example Output:
     --------------
-    lambda item: ((item['TYPE']== 'ALARM') and
-                  ((item['TIME']> 150) or (item['IS_DELETED']== True)))
+    a predicate equivalent to
+    lambda item: ((item.get('TYPE') == 'ALARM') and
+                  ((item.get('TIME') > 150) or
+                   (item.get('IS_DELETED') == True)))
+
+    Besides the comparisons, the operators are:
+    {'in': {'TYPE': ['nova.host', 'nova.zone']}} - the value is in the list
+    {'not in': {'TYPE': ['nova.host', 'nova.zone']}}
+    {'exists': {'STATE': True}} - the item has a (not None) value for the
+    key, or has not if False
+    {'startswith': {'NAME': 'compute-'}} - the value is a string that
+    starts with the prefix
+
+    Strings are compared by their range_key(), so that timestamps of
+    different formats are compared in time order.
 
     Example Usage:
     --------------
@@ -61,14 +166,185 @@ def create_predicate(query_dict):
     if match(vertex):
         print vertex
 
+    The predicate is composed of closures, and is cached in predicate_cache
+    by the canonical form of query_dict.
+
     :param query_dict:
     :return: a predicate "match(item)"
     """
+    return _predicate(_parse(query_dict))
+
+
+def plan_query(query_dict, indexes):
+    """Plan how to find the items that match a query
+
+    Equality, 'in' and 'exists' (False) terms on indexed keys, and range
+    and 'startswith' terms on keys with a sorted index (see
+    vitrage.graph.driver.networkx_graph.SortedIndex), give candidate sets:
+    the smallest candidate set of the terms of an 'and', the union of the
+    candidate sets of the terms of an 'or'. The predicate of the query is
+    then only applied to the candidates, instead of to every item.
+
+    Example:
+    --------
+    plan = plan_query(ALARMS_ALL_QUERY, graph_indexes)
+    print(plan)  # and(index(category == 'ALARM') ~12)
+    candidates = plan.candidates()  # None means all the items
+
+    :param indexes: key -> index with lookup(values) and count(values), as
+    vitrage.graph.driver.networkx_graph.PropertyIndex, and also with
+    lookup_range(op, bound) and count_range(op, bound) for sorted indexes
+    :type indexes: dict
+    :rtype: QueryPlan
+    """
+    query = _parse(query_dict)
+    return QueryPlan(query, _plan(query, indexes), _predicate(query))
+
+
+class QueryPlan(object):
+
+    def __init__(self, query, root, predicate):
+        """A plan made by plan_query()
+
+        :param query: the parsed query, a tree of (operator, operands)
+        :param root: the plan node giving the candidates, None for a full
+        scan
+        :param predicate: the predicate of the query, see create_predicate
+        """
+        self.query = query
+        self.root = root
+        self.predicate = predicate
+
+    def candidates(self):
+        """The keys of the items that may match, None if all may match
+
+        :rtype: set
+        """
+        if self.root is None:
+            return None
+        return self.root.candidates()
+
+    def __str__(self):
+        return 'scan' if self.root is None else str(self.root)
+
+
+class _IndexLookup(object):
+
+    def __init__(self, key, op, value, values, index):
+        """The vertices whose value of key is one of values
+
+        :param op: the operator of the term, '==', 'in', 'exists' etc.
+        :param value: the value in the term, for display
+        """
+        self.key = key
+        self.op = op
+        self.value = value
+        self.values = values
+        self.index = index
+        self.estimate = index.count(values)
+
+    def candidates(self):
+        return self.index.lookup(self.values)
+
+    def __str__(self):
+        return 'index(%s %s %r) ~%d' % (self.key, self.op, self.value,
+                                        self.estimate)
+
+
+class _RangeLookup(object):
+
+    def __init__(self, key, op, bound, index):
+        self.key = key
+        self.op = op
+        self.bound = bound
+        self.index = index
+        self.estimate = index.count_range(op, bound)
+
+    def candidates(self):
+        return self.index.lookup_range(self.op, self.bound)
+
+    def __str__(self):
+        return 'range(%s %s %r) ~%d' % (self.key, self.op, self.bound,
+                                        self.estimate)
+
+
+class _Smallest(object):
+    """The candidates of the most selective term of an 'and'"""
+
+    def __init__(self, plans):
+        self.plans = plans
+        self.best = min(plans, key=lambda plan: plan.estimate)
+        self.estimate = self.best.estimate
+
+    def candidates(self):
+        return self.best.candidates()
+
+    def __str__(self):
+        return 'and(%s)' % self.best
+
+
+class _Union(object):
+    """The candidates of all the terms of an 'or'"""
+
+    def __init__(self, plans):
+        self.plans = plans
+        self.estimate = sum(plan.estimate for plan in plans)
+
+    def candidates(self):
+        result = set()
+        for plan in self.plans:
+            result.update(plan.candidates())
+        return result
+
+    def __str__(self):
+        return 'or(%s)' % ', '.join(str(plan) for plan in self.plans)
+
+
+def _plan(query, indexes):
+    """The plan node of a parsed query, None if it needs a full scan"""
+    op, operands = query
+    if op == 'or':
+        plans = [_plan(operand, indexes) for operand in operands]
+        if not plans or None in plans:
+            return None
+        return _Union(plans)
+
+    if op == 'and':
+        plans = [_plan(operand, indexes) for operand in operands]
+    else:
+        # The terms of a comparison must all match, as in an 'and'
+        plans = [_plan_term(op, key, value, indexes.get(key))
+                 for key, value in operands]
+    plans = [plan for plan in plans if plan is not None]
+    if len(plans) > 1:
+        return _Smallest(plans)
+    return plans[0] if plans else None
+
+
+def _plan_term(op, key, value, index):
+    """The plan node of a single term, None if index can not serve it"""
+    if index is None:
+        return None
+    if op == '==':
+        return _IndexLookup(key, op, value, [value], index)
+    if op == 'in':
+        return _IndexLookup(key, op, value, list(value), index)
+    if op == 'exists' and not value:
+        # The vertices without the property are indexed under None
+        return _IndexLookup(key, op, value, [None], index)
+    if op in _range_operators or op == 'startswith':
+        if hasattr(index, 'lookup_range') and \
+                index.count_range(op, value) is not None:
+            return _RangeLookup(key, op, value, index)
+        if op == 'startswith' and hasattr(index, 'values_with_prefix'):
+            return _IndexLookup(key, op, value,
+                                index.values_with_prefix(value), index)
+    return None
+
+
+def _parse(query_dict):
     try:
-        expression = _create_query_expression(query=query_dict)
-        LOG.debug('create_predicate::%s', expression)
-        expression = 'lambda item: ' + expression
-        return eval(expression)
+        return _parse_query(query_dict)
     except Exception as e:
         LOG.error('invalid query format %s. Exception: %s',
                   query_dict, e)
@@ -76,46 +352,134 @@ def create_predicate(query_dict):
                            query_dict, e)
 
 
-def _create_query_expression(query, parent_operator=None):
-    expressions = []
+def _predicate(query):
+    """The compiled predicate of a parsed query, from the cache if there"""
+    try:
+        key = _cache_key(query)
+        hash(key)
+    except TypeError:
+        # e.g. a list value, compared as is
+        key = None
+    if key is not None:
+        predicate = predicate_cache.get(key)
+        if predicate is not None:
+            return predicate
+
+    LOG.debug('create_predicate::%s', query)
+    predicate = _compile(query)
+    if key is not None:
+        predicate_cache.put(key, predicate)
+    return predicate
+
 
+def _parse_query(query, parent_operator=None):
+    """The query as a tree of (operator, operands) tuples
+
+    The operands of a logical operation are the parsed sub queries, those of
+    a comparison are the (key, value) pairs to compare.
+    """
     # First element or element under logical operation
     if not parent_operator and isinstance(query, dict):
         (key, value) = query.copy().popitem()
-        return _create_query_expression(value, key)
+        return _parse_query(value, key)
 
     # Continue recursion on logical (and/or) operation
     elif parent_operator in logical_operations and isinstance(query, list):
-        for val in query:
-            expressions.append(_create_query_expression(val))
-        return _join_logical_operator(parent_operator, expressions)
+        return parent_operator, tuple(_parse_query(val) for val in query)
 
     # Recursion evaluate leaf (stop condition)
     elif parent_operator in operators:
-        for key, val in query.items():
-            expressions.append('item.get(' + _evaluatable_str(key) + ')' +
-                               parent_operator + ' ' + _evaluatable_str(val))
-        return _join_logical_operator('and', expressions)
+        operands = tuple(query.items())
+        if parent_operator in _membership_operators:
+            for key, values in operands:
+                if not isinstance(values, (list, tuple, set, frozenset)):
+                    raise VitrageError('%s expects a list of values' %
+                                       parent_operator, key, values)
+        return parent_operator, operands
     else:
         raise VitrageError('invalid partial query format',
                            parent_operator, query)
 
 
-def _evaluatable_str(value):
-    """wrap string/unicode with back tick"""
-    if isinstance(value, six.string_types):
-        return '\'' + value + '\''
+def _cache_key(query):
+    """Canonical form of a parsed query
+
+    The order of the keys of a comparison does not matter, and the type of
+    the values is part of the key, so that e.g. 1 and True are not mixed.
+    """
+    op, operands = query
+    if op in logical_operations:
+        return op, tuple(_cache_key(operand) for operand in operands)
+    if op in _membership_operators:
+        return op, frozenset(
+            (key, frozenset((type(value), value) for value in values))
+            for key, values in operands)
+    return op, frozenset((key, type(value), value) for key, value in operands)
+
+
+def _compile(query):
+    op, operands = query
+    if op in logical_operations:
+        predicates = [_compile(operand) for operand in operands]
     else:
-        return str(value)
+        predicates = [_compile_comparison(op, key, value)
+                      for key, value in operands]
+        op = 'and'
 
+    if not predicates:
+        # As an empty expression, never matches
+        return lambda item: False
+    if len(predicates) == 1:
+        return predicates[0]
+    if op == 'and':
+        return lambda item: all(match(item) for match in predicates)
+    return lambda item: any(match(item) for match in predicates)
 
-def _join_logical_operator(op, expressions):
-    """Create an expressions string
 
-    Example input:
-        op='AND'
-        expressions=['a == b', 'c < d']
-    Example output: (a == b AND c < d)
-    """
-    separator = ' ' + op + ' '
-    return '(' + separator.join(expressions) + ')'
+def compile_term(op, key, value):
+    """The predicate of a single term of a query, e.g. ('<', 'TIME', 150)"""
+    return _compile_comparison(op, key, value)
+
+
+def _compile_comparison(op, key, value):
+    if op in _membership_operators:
+        return _compile_membership(op, key, value)
+    if op == 'exists':
+        if value:
+            return lambda item: item.get(key) is not None
+        return lambda item: item.get(key) is None
+    if op == 'startswith':
+        def match(item):
+            item_value = item.get(key)
+            return isinstance(item_value, six.string_types) and \
+                item_value.startswith(value)
+        return match
+
+    compare = _operator_functions[op]
+    if op in _range_operators and isinstance(value, six.string_types):
+        bound = range_key(value)
+
+        def match(item):
+            item_value = item.get(key)
+            if isinstance(item_value, six.string_types):
+                return compare(range_key(item_value), bound)
+            return compare(item_value, value)
+        return match
+    return lambda item: compare(item.get(key), value)
+
+
+def _compile_membership(op, key, values):
+    try:
+        values = frozenset(values)
+    except TypeError:
+        # Unhashable values are looked up in a tuple
+        values = tuple(values)
+    expected = op == 'in'
+
+    def match(item):
+        try:
+            return (item.get(key) in values) == expected
+        except TypeError:
+            # An unhashable item value is not in the frozenset
+            return not expected
+    return match
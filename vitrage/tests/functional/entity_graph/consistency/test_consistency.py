@@ -60,6 +60,9 @@ class TestConsistencyFunctional(TestFunctionalBase):
         cfg.StrOpt('notifier_topic',
                    default='vitrage.evaluator',
                    ),
+        cfg.BoolOpt('incremental_matching',
+                    default=False,
+                    ),
     ]
 
     # noinspection PyAttributeOutsideInit,PyPep8Naming
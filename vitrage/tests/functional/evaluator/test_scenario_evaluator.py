@@ -37,6 +37,9 @@ class TestScenarioEvaluator(TestFunctionalBase):
         cfg.StrOpt('notifier_topic',
                    default='vitrage.evaluator',
                    ),
+        cfg.BoolOpt('incremental_matching',
+                    default=False,
+                    ),
     ]
 
     # noinspection PyPep8Naming
@@ -92,6 +95,55 @@ class TestScenarioEvaluator(TestFunctionalBase):
         self.assertEqual('AVAILABLE', host_v[VProps.AGGREGATED_STATE],
                          'host should be RUNNING when starting')
 
+    def test_deduced_state_incremental(self):
+
+        # Test Setup
+        self.conf.set_override('incremental_matching', True, 'evaluator')
+        self.addCleanup(self.conf.clear_override, 'incremental_matching',
+                        'evaluator')
+        processor = self._create_processor_with_graph(self.conf)
+        event_queue = queue.Queue()
+        evaluator = ScenarioEvaluator(self.conf,
+                                      processor.entity_graph,
+                                      self.scenario_repository,
+                                      event_queue,
+                                      enabled=True)
+
+        target_host = 'host-2'
+        nagios_event = {'last_check': '2016-02-07 15:26:04',
+                        'resource_name': target_host,
+                        'resource_type': NOVA_HOST_DATASOURCE,
+                        'service': 'Check_MK',
+                        'status': 'CRITICAL',
+                        'status_info': 'ok',
+                        'sync_mode': 'snapshot',
+                        'sync_type': 'nagios',
+                        'sample_date': '2016-02-07 15:26:04'}
+        processor.process_event(nagios_event)
+        processor.process_event(event_queue.get())
+
+        host_v = self._get_host_from_graph(target_host, processor.entity_graph)
+        self.assertEqual('SUBOPTIMAL', host_v[VProps.AGGREGATED_STATE],
+                         'host should be SUBOPTIMAL after nagios alarm event')
+        num_matches = len(evaluator._active_matches)
+        self.assertGreater(num_matches, 0)
+
+        # The same alarm again does not change the matches
+        nagios_event['sample_date'] = '2016-02-07 15:27:04'
+        processor.process_event(nagios_event)
+        self.assertTrue(event_queue.empty(), 'no action is done again')
+        self.assertEqual(num_matches, len(evaluator._active_matches))
+
+        # next disable the alarm
+        nagios_event['status'] = 'OK'
+        processor.process_event(nagios_event)
+        processor.process_event(event_queue.get())
+
+        host_v = self._get_host_from_graph(target_host, processor.entity_graph)
+        self.assertEqual('AVAILABLE', host_v[VProps.AGGREGATED_STATE],
+                         'host should be AVAILABLE after the alarm is off')
+        self.assertEqual(0, len(evaluator._active_matches))
+
     @staticmethod
     def _get_host_from_graph(host_name, entity_graph):
         vertex_attrs = {VProps.TYPE: NOVA_HOST_DATASOURCE,
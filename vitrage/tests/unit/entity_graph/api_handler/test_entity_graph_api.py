@@ -0,0 +1,207 @@
+# Copyright 2016 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+
+from oslo_config import cfg
+
+from vitrage.common.constants import EdgeLabel
+from vitrage.common.constants import EntityCategory
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.datasources.nagios import NAGIOS_DATASOURCE
+from vitrage.datasources.nova.host import NOVA_HOST_DATASOURCE
+from vitrage.datasources.nova.instance import NOVA_INSTANCE_DATASOURCE
+from vitrage.datasources import OPENSTACK_CLUSTER
+from vitrage.entity_graph.api_handler.entity_graph_api import EntityGraphApis
+from vitrage.entity_graph.impact_index import ImpactIndex
+from vitrage.graph.driver.networkx_graph import merge_output_graph_parts
+from vitrage.graph import utils as graph_utils
+from vitrage.tests.unit.entity_graph.base import TestEntityGraphUnitBase
+
+
+class TestEntityGraphApis(TestEntityGraphUnitBase):
+
+    ROOT_ID = '%s:%s' % (EntityCategory.RESOURCE, OPENSTACK_CLUSTER)
+
+    # noinspection PyAttributeOutsideInit,PyPep8Naming
+    @classmethod
+    def setUpClass(cls):
+        super(TestEntityGraphApis, cls).setUpClass()
+        cls.conf = cfg.ConfigOpts()
+        cls.conf.register_opts(cls.PROCESSOR_OPTS, group='entity_graph')
+        cls.conf.register_opts(cls.DATASOURCES_OPTS, group='datasources')
+        cls.load_datasources(cls.conf)
+
+    def setUp(self):
+        super(TestEntityGraphApis, self).setUp()
+        processor = self._create_processor_with_graph(self.conf)
+        self.entity_graph = processor.entity_graph
+        self.apis = EntityGraphApis(self.entity_graph)
+
+    def test_get_topology_chunked(self):
+        topology = json.loads(self.apis.get_topology(
+            None, 'graph', None, None, self.ROOT_ID))
+
+        reply = self.apis.get_topology(
+            None, 'graph', None, None, self.ROOT_ID, chunked=True)
+        parts = [reply['part']]
+        while not reply['last']:
+            reply = self.apis.get_topology_part(None, reply['stream_id'])
+            parts.append(reply['part'])
+
+        self.assertGreater(len(parts), 1, 'streamed in parts')
+        self.assertEqual(topology, merge_output_graph_parts(parts))
+        self.assertEqual({}, self.apis._streams, 'finished stream is dropped')
+
+        reply = self.apis.get_topology_part(None, reply['stream_id'])
+        self.assertIsNone(reply['part'], 'unknown stream')
+
+    def test_get_topology_chunked_limits(self):
+        self.apis.MAX_STREAMS = 3
+        replies = [self.apis.get_topology(None, 'graph', None, None,
+                                          self.ROOT_ID, chunked=True)
+                   for _ in range(4)]
+        self.assertEqual(3, len(self.apis._streams), 'open streams are capped')
+        reply = self.apis.get_topology_part(None, replies[0]['stream_id'])
+        self.assertIsNone(reply['part'], 'the oldest stream is dropped')
+        reply = self.apis.get_topology_part(None, replies[3]['stream_id'])
+        self.assertIsNotNone(reply['part'], 'the newest stream is kept')
+
+        # Streams expire when any stream is read
+        for stream_id, (start_time, parts) in self.apis._streams.items():
+            self.apis._streams[stream_id] = \
+                (start_time - self.apis.STREAM_TIMEOUT - 1, parts)
+        reply = self.apis.get_topology_part(None, replies[1]['stream_id'])
+        self.assertIsNone(reply['part'], 'expired stream')
+        self.assertEqual({}, self.apis._streams, 'expired streams are purged')
+
+    def test_get_alarms_paging(self):
+        host = self.entity_graph.get_vertices(
+            {VProps.TYPE: NOVA_HOST_DATASOURCE})[0]
+        for i in range(5):
+            alarm = graph_utils.create_vertex(
+                'ALARM:%s' % i,
+                entity_id=str(i),
+                entity_category=EntityCategory.ALARM,
+                entity_type=NAGIOS_DATASOURCE,
+                is_deleted=False,
+                sample_timestamp='2016-01-01 00:00:00.000000',
+                is_placeholder=False)
+            self.entity_graph.add_vertex(alarm)
+            self.entity_graph.add_edge(graph_utils.create_edge(
+                alarm.vertex_id, host.vertex_id, EdgeLabel.ON))
+
+        alarms = json.loads(self.apis.get_alarms(None, 'all'))['alarms']
+        self.assertEqual(5, len(alarms))
+        alarm_ids = [alarm[VProps.VITRAGE_ID] for alarm in alarms]
+        self.assertEqual(sorted(alarm_ids), alarm_ids, 'ordered by id')
+
+        count = json.loads(self.apis.get_alarms(None, 'all',
+                                                count_only=True))
+        self.assertEqual({'count': len(alarms)}, count)
+
+        page = json.loads(self.apis.get_alarms(
+            None, 'all', limit=2, offset=1,
+            fields=[VProps.VITRAGE_ID, EntityGraphApis.RESOURCE_ID]))
+        self.assertEqual(alarm_ids[1:3],
+                         [alarm[VProps.VITRAGE_ID]
+                          for alarm in page['alarms']])
+        for alarm in page['alarms']:
+            self.assertEqual({VProps.VITRAGE_ID: alarm[VProps.VITRAGE_ID],
+                              EntityGraphApis.RESOURCE_ID: host[VProps.ID]},
+                             alarm, 'projected properties')
+
+        pages = [json.loads(self.apis.get_alarms(
+            None, host[VProps.VITRAGE_ID], limit=2, offset=offset))['alarms']
+            for offset in (0, 2, 4)]
+        self.assertEqual(alarm_ids,
+                         [alarm[VProps.VITRAGE_ID]
+                          for page in pages for alarm in page],
+                         'consecutive pages of the alarms of a resource')
+
+    def test_get_rcas(self):
+        # A -causes-> B -causes-> C, D -causes-> B, and E alone
+        for name in 'ABCDE':
+            self.entity_graph.add_vertex(graph_utils.create_vertex(
+                'ALARM:' + name,
+                entity_id=name,
+                entity_category=EntityCategory.ALARM,
+                entity_type=NAGIOS_DATASOURCE,
+                is_deleted=False,
+                is_placeholder=False))
+        for source, target in ('AB', 'BC', 'DB'):
+            self.entity_graph.add_edge(graph_utils.create_edge(
+                'ALARM:' + source, 'ALARM:' + target, EdgeLabel.CAUSES))
+
+        roots = ['ALARM:A', 'ALARM:B', 'ALARM:D', 'ALARM:E']
+        rcas = json.loads(self.apis.get_rcas(None, roots + ['ALARM:none']))
+
+        self.assertEqual(set(roots + ['ALARM:none']), set(rcas))
+        for root in roots:
+            self.assertEqual(
+                self._rca_content(json.loads(self.apis.get_rca(None, root))),
+                self._rca_content(rcas[root]))
+        self.assertEqual(4, len(rcas['ALARM:B']['nodes']))
+        self.assertEqual(2, len(rcas['ALARM:D']['links']))
+        self.assertEqual([], rcas['ALARM:none']['nodes'])
+
+    @staticmethod
+    def _rca_content(rca):
+        """The nodes and links of an RCA graph, whatever their order"""
+        ids = [node[VProps.VITRAGE_ID] for node in rca['nodes']]
+        nodes = sorted(
+            ({key: value for key, value in node.items()
+              if key != VProps.GRAPH_INDEX} for node in rca['nodes']),
+            key=lambda node: node[VProps.VITRAGE_ID])
+        links = []
+        for link in rca['links']:
+            link = dict(link)
+            link['source'] = ids[link['source']]
+            link['target'] = ids[link['target']]
+            links.append(json.dumps(link, sort_keys=True))
+        inspected = ids[rca['inspected_index']] if ids else None
+        return nodes, sorted(links), inspected
+
+    def test_get_impact(self):
+        host = self.entity_graph.get_vertices(
+            vertex_attr_filter={VProps.TYPE: NOVA_HOST_DATASOURCE})[0]
+        instances = self.entity_graph.neighbors(
+            host.vertex_id,
+            vertex_attr_filter={VProps.TYPE: NOVA_INSTANCE_DATASOURCE})
+        self.assertIsNotNone(self.apis._impact_index,
+                             'the index is built with the apis')
+
+        impact = json.loads(self.apis.get_impact(None, host.vertex_id))
+        self.assertEqual(
+            sorted(instance.vertex_id for instance in instances),
+            sorted(resource[VProps.VITRAGE_ID]
+                   for resource in impact['impacted']))
+
+        # The index follows the graph changes
+        self.entity_graph.mark_edge_as_deleted(self.entity_graph.get_edge(
+            host.vertex_id, instances[0].vertex_id, EdgeLabel.CONTAINS))
+        impact = json.loads(self.apis.get_impact(None, host.vertex_id))
+        self.assertEqual(len(instances) - 1, len(impact['impacted']))
+
+        self.assertEqual({'impacted': []},
+                         json.loads(self.apis.get_impact(None, 'unknown')))
+
+        # An index built beforehand, e.g. by vitrage-graph, is used as is
+        impact_index = ImpactIndex(self.entity_graph)
+        apis = EntityGraphApis(self.entity_graph, impact_index)
+        self.assertIs(impact_index, apis._impact_index)
+        self.entity_graph.remove_vertex(instances[1])
+        impact = json.loads(apis.get_impact(None, host.vertex_id))
+        self.assertEqual(len(instances) - 2, len(impact['impacted']),
+                         'removed vertex')
@@ -0,0 +1,122 @@
+# Copyright 2016 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import zlib
+
+import mock
+from oslo_config import cfg
+from six.moves import cPickle as pickle
+
+from vitrage.entity_graph import checkpoint as graph_checkpoint
+from vitrage.entity_graph.checkpoint import GraphCheckpoint
+from vitrage.entity_graph.processor.entity_graph import EntityGraph
+from vitrage.graph import Direction
+from vitrage.tests.unit.entity_graph.base import TestEntityGraphUnitBase
+
+
+class TestGraphCheckpoint(TestEntityGraphUnitBase):
+
+    CHECKPOINT_OPTS = [
+        cfg.StrOpt('checkpoint_file'),
+    ]
+
+    # noinspection PyAttributeOutsideInit,PyPep8Naming
+    @classmethod
+    def setUpClass(cls):
+        super(TestGraphCheckpoint, cls).setUpClass()
+        cls.conf = cfg.ConfigOpts()
+        cls.conf.register_opts(cls.PROCESSOR_OPTS, group='entity_graph')
+        cls.conf.register_opts(cls.CHECKPOINT_OPTS, group='entity_graph')
+        cls.conf.register_opts(cls.DATASOURCES_OPTS, group='datasources')
+        cls.load_datasources(cls.conf)
+
+    def setUp(self):
+        super(TestGraphCheckpoint, self).setUp()
+        self.checkpoint_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.checkpoint_dir)
+        self.conf.set_override(
+            'checkpoint_file',
+            os.path.join(self.checkpoint_dir, 'graph.checkpoint'),
+            'entity_graph')
+
+    def test_save_and_load(self):
+        processor = self._create_processor_with_graph(self.conf)
+        graph = processor.entity_graph
+        GraphCheckpoint(self.conf, graph).save()
+        self.assertTrue(os.path.isfile(self.conf.entity_graph.checkpoint_file))
+
+        loaded_graph = EntityGraph('Entity Graph', graph.root_id)
+        checkpoint = GraphCheckpoint(self.conf, loaded_graph)
+        timestamp = checkpoint.load()
+        self.assertIsNotNone(timestamp, 'checkpoint loaded')
+        self.assertIsNotNone(checkpoint.checkpoint_time, 'checkpoint time')
+
+        self.assertEqual(graph.num_vertices(), loaded_graph.num_vertices())
+        self.assertEqual(graph.num_edges(), loaded_graph.num_edges())
+        for vertex in graph.get_vertices():
+            self.assertEqual(vertex,
+                             loaded_graph.get_vertex(vertex.vertex_id))
+            self.assertEqual(
+                sorted(graph.get_edges(vertex.vertex_id,
+                                       direction=Direction.OUT), key=str),
+                sorted(loaded_graph.get_edges(vertex.vertex_id,
+                                              direction=Direction.OUT),
+                       key=str))
+
+    def test_load_missing_or_invalid_checkpoint(self):
+        graph = EntityGraph('Entity Graph')
+        checkpoint = GraphCheckpoint(self.conf, graph)
+        self.assertIsNone(checkpoint.load(), 'no checkpoint file')
+
+        with open(self.conf.entity_graph.checkpoint_file, 'wb') as f:
+            f.write(b'not a checkpoint')
+        self.assertIsNone(checkpoint.load(), 'invalid checkpoint file')
+        self.assertEqual(0, graph.num_vertices())
+
+    def test_load_unsupported_checkpoint(self):
+        vertices = [['v1', {'category': 'RESOURCE', 'type': 'nova.host'}]]
+        content = {'version': 2,
+                   'timestamp': '2016-02-07 15:26:04',
+                   'time': 1454858764.0,
+                   'vertices': vertices,
+                   'edges': []}
+        graph = EntityGraph('Entity Graph')
+        checkpoint = GraphCheckpoint(self.conf, graph)
+
+        # Pickles, as written by previous versions, are never unpickled
+        with open(self.conf.entity_graph.checkpoint_file, 'wb') as f:
+            f.write(graph_checkpoint.MAGIC)
+            f.write(zlib.compress(pickle.dumps(content, 2)))
+        with mock.patch.object(pickle, 'loads') as loads:
+            self.assertIsNone(checkpoint.load(), 'pickle checkpoint')
+            self.assertFalse(loads.called, 'not unpickled')
+
+        self._write_checkpoint(content)
+        self.assertIsNone(checkpoint.load(), 'unsupported version')
+        self.assertEqual(0, graph.num_vertices())
+
+        content['version'] = graph_checkpoint.FORMAT_VERSION
+        self._write_checkpoint(content)
+        self.assertIsNotNone(checkpoint.load(), 'checkpoint loaded')
+        self.assertEqual(content['time'], checkpoint.checkpoint_time)
+        self.assertEqual(1, graph.num_vertices())
+
+    def _write_checkpoint(self, content):
+        with open(self.conf.entity_graph.checkpoint_file, 'wb') as f:
+            f.write(graph_checkpoint.MAGIC)
+            f.write(zlib.compress(json.dumps(content).encode('utf-8')))
@@ -0,0 +1,124 @@
+# Copyright 2016 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo_config import cfg
+
+from vitrage.common.constants import EdgeLabel
+from vitrage.common.constants import EdgeProperties as EProps
+from vitrage.common.constants import EntityCategory
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.datasources.cinder.volume import CINDER_VOLUME_DATASOURCE
+from vitrage.datasources.nova.host import NOVA_HOST_DATASOURCE
+from vitrage.datasources.nova.instance import NOVA_INSTANCE_DATASOURCE
+from vitrage.datasources import OPENSTACK_CLUSTER
+from vitrage.entity_graph.impact_index import DEPENDENCY_LABELS
+from vitrage.entity_graph.impact_index import ImpactIndex
+from vitrage.graph import Direction
+from vitrage.graph import utils as graph_utils
+from vitrage.tests.unit.entity_graph.base import TestEntityGraphUnitBase
+
+
+class TestImpactIndex(TestEntityGraphUnitBase):
+
+    # noinspection PyAttributeOutsideInit,PyPep8Naming
+    @classmethod
+    def setUpClass(cls):
+        super(TestImpactIndex, cls).setUpClass()
+        cls.conf = cfg.ConfigOpts()
+        cls.conf.register_opts(cls.PROCESSOR_OPTS, group='entity_graph')
+        cls.conf.register_opts(cls.DATASOURCES_OPTS, group='datasources')
+        cls.load_datasources(cls.conf)
+
+    def setUp(self):
+        super(TestImpactIndex, self).setUp()
+        processor = self._create_processor_with_graph(self.conf)
+        self.entity_graph = processor.entity_graph
+        self.impact_index = ImpactIndex(self.entity_graph)
+
+    def test_impacted_ids(self):
+        self._assert_index_is_up_to_date()
+
+        root_impact = self.impact_index.impacted_ids(
+            '%s:%s' % (EntityCategory.RESOURCE, OPENSTACK_CLUSTER))
+        self.assertEqual(self.entity_graph.num_vertices() - 1,
+                         len(root_impact),
+                         'every resource depends on the cluster')
+        self.assertEqual([], self.impact_index.impacted_ids('unknown'))
+
+    def test_graph_changes(self):
+        host = self.entity_graph.get_vertices(
+            vertex_attr_filter={VProps.TYPE: NOVA_HOST_DATASOURCE})[0]
+        instance = self.entity_graph.neighbors(
+            host.vertex_id,
+            vertex_attr_filter={VProps.TYPE: NOVA_INSTANCE_DATASOURCE})[0]
+
+        # A volume attached to the instance of the host
+        volume = graph_utils.create_vertex(
+            'RESOURCE:cinder.volume:volume-0',
+            entity_id='volume-0',
+            entity_category=EntityCategory.RESOURCE,
+            entity_type=CINDER_VOLUME_DATASOURCE,
+            is_deleted=False,
+            is_placeholder=False)
+        self.entity_graph.add_vertex(volume)
+        volume_edge = graph_utils.create_edge(
+            volume.vertex_id, instance.vertex_id, EdgeLabel.ATTACHED)
+        self.entity_graph.add_edge(volume_edge)
+        self.assertEqual([instance.vertex_id],
+                         self.impact_index.impacted_ids(volume.vertex_id))
+        self._assert_index_is_up_to_date()
+
+        # The instance is moved out of the host
+        host_edge = self.entity_graph.get_edge(
+            host.vertex_id, instance.vertex_id, EdgeLabel.CONTAINS)
+        self.entity_graph.mark_edge_as_deleted(host_edge)
+        self.assertNotIn(instance.vertex_id,
+                         self.impact_index.impacted_ids(host.vertex_id))
+        self._assert_index_is_up_to_date()
+
+        # The volume is removed
+        self.entity_graph.remove_vertex(volume)
+        self.assertEqual([],
+                         self.impact_index.impacted_ids(volume.vertex_id))
+        self._assert_index_is_up_to_date()
+
+        # The instance is moved back, and out again, in a single event
+        with self.entity_graph.notifier.coalesce():
+            self.entity_graph.add_edge(graph_utils.create_edge(
+                host.vertex_id, instance.vertex_id, EdgeLabel.CONTAINS))
+            self.entity_graph.remove_edge(host_edge)
+        self.assertNotIn(instance.vertex_id,
+                         self.impact_index.impacted_ids(host.vertex_id))
+        self._assert_index_is_up_to_date()
+
+    def _assert_index_is_up_to_date(self):
+        for vertex in self.entity_graph.get_vertices():
+            self.assertEqual(
+                self._impacted_ids(vertex.vertex_id),
+                set(self.impact_index.impacted_ids(vertex.vertex_id)),
+                'impact of %s' % vertex.vertex_id)
+
+    def _impacted_ids(self, vertex_id):
+        impacted = set()
+        to_visit = [vertex_id]
+        while to_visit:
+            for edge in self.entity_graph.get_edges(to_visit.pop(),
+                                                    direction=Direction.OUT):
+                if edge.label in DEPENDENCY_LABELS \
+                        and not edge.get(EProps.IS_DELETED, False) \
+                        and edge.target_id not in impacted \
+                        and edge.target_id != vertex_id:
+                    impacted.add(edge.target_id)
+                    to_visit.append(edge.target_id)
+        return impacted
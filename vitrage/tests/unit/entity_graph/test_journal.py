@@ -0,0 +1,167 @@
+# Copyright 2016 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from datetime import datetime
+import shutil
+import tempfile
+
+import mock
+from oslo_config import cfg
+from six.moves import cPickle as pickle
+
+from vitrage.cmd.replay import replay
+from vitrage.entity_graph.initialization_status import InitializationStatus
+from vitrage.entity_graph.journal import EventJournal
+from vitrage.entity_graph.journal import read_events
+from vitrage.entity_graph.journal import RECORD_HEADER
+from vitrage.entity_graph.journal import segment_paths
+from vitrage.entity_graph.processor import processor as proc
+from vitrage.tests.unit.entity_graph.base import TestEntityGraphUnitBase
+
+
+class _Evaluator(object):
+    enabled = False
+
+
+class TestEventJournal(TestEntityGraphUnitBase):
+
+    JOURNAL_OPTS = [
+        cfg.StrOpt('journal_dir'),
+        cfg.IntOpt('journal_segment_size', default=1),
+        cfg.IntOpt('journal_max_segments', default=0),
+        cfg.IntOpt('journal_fsync_interval', default=1),
+    ]
+
+    # noinspection PyAttributeOutsideInit,PyPep8Naming
+    @classmethod
+    def setUpClass(cls):
+        super(TestEventJournal, cls).setUpClass()
+        cls.conf = cfg.ConfigOpts()
+        cls.conf.register_opts(cls.PROCESSOR_OPTS, group='entity_graph')
+        cls.conf.register_opts(cls.JOURNAL_OPTS, group='entity_graph')
+        cls.conf.register_opts(cls.DATASOURCES_OPTS, group='datasources')
+        cls.load_datasources(cls.conf)
+
+    def setUp(self):
+        super(TestEventJournal, self).setUp()
+        self.journal_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.journal_dir)
+        self.conf.set_override('journal_dir', self.journal_dir,
+                               'entity_graph')
+
+    def test_append_and_read(self):
+        journal = EventJournal(self.conf)
+        journal.segment_size = 50
+        events = [{'id': i, 'payload': 'x' * 50} for i in range(10)]
+        for event in events:
+            journal.append(event)
+        journal.close()
+
+        self.assertEqual(10, len(segment_paths(self.journal_dir)),
+                         'a segment per event over the segment size')
+        self.assertEqual(events,
+                         [event for t, event in read_events(self.journal_dir)])
+
+        # A new journal never appends to existing segments
+        journal = EventJournal(self.conf)
+        journal.max_segments = 3
+        journal.append({'id': 10})
+        journal.close()
+        self.assertEqual(3, len(segment_paths(self.journal_dir)),
+                         'old segments are removed')
+        self.assertEqual([8, 9, 10],
+                         [event['id'] for t, event
+                          in read_events(self.journal_dir)])
+
+    def test_truncated_record(self):
+        journal = EventJournal(self.conf)
+        journal.append({'id': 1})
+        journal.append({'id': 2})
+        journal.close()
+        path = segment_paths(self.journal_dir)[0]
+        with open(path, 'rb+') as f:
+            f.seek(-3, 2)
+            f.truncate()
+        self.assertEqual([{'id': 1}],
+                         [event for t, event in read_events(self.journal_dir)])
+
+    def test_unreadable_record(self):
+        journal = EventJournal(self.conf)
+        journal.append({'id': 1, 'date': datetime(2016, 2, 7)})
+        journal.close()
+        path = segment_paths(self.journal_dir)[0]
+        # e.g. a record of the pickle journals of previous versions
+        data = pickle.dumps((0, {'id': 2}), 2)
+        with open(path, 'ab') as f:
+            f.write(RECORD_HEADER.pack(len(data)))
+            f.write(data)
+        with mock.patch.object(pickle, 'loads') as loads:
+            self.assertEqual(
+                [{'id': 1, 'date': '2016-02-07 00:00:00'}],
+                [event for t, event in read_events(self.journal_dir)])
+            self.assertFalse(loads.called, 'not unpickled')
+
+    @mock.patch('os.fsync')
+    def test_fsync(self, fsync):
+        journal = EventJournal(self.conf)
+        journal.append({'id': 1})
+        journal.append({'id': 2})
+        self.assertEqual(0, fsync.call_count, 'fsynced on interval')
+        journal.sync()
+        self.assertEqual(1, fsync.call_count, 'explicit fsync')
+        journal.close()
+        self.assertEqual(2, fsync.call_count, 'fsynced on close')
+
+        journal = EventJournal(self.conf)
+        journal.fsync_interval = 0
+        journal.append({'id': 3})
+        journal.append({'id': 4})
+        self.assertEqual(4, fsync.call_count, 'fsynced on every append')
+        journal.close()
+        self.assertEqual(
+            [1, 2, 3, 4],
+            [event['id'] for t, event in read_events(self.journal_dir)])
+
+    def test_replay(self):
+        events = self._create_mock_events()
+        journal = EventJournal(self.conf)
+        processor = proc.Processor(self.conf, InitializationStatus())
+        for event in events:
+            journal.append(event)
+            processor.process_event(event)
+        journal.close()
+
+        replayed_processor = proc.Processor(self.conf, InitializationStatus())
+        num_events, duration = replay(read_events(self.journal_dir),
+                                      replayed_processor,
+                                      _Evaluator())
+        self.assertEqual(len(events), num_events)
+        self.assertEqual(processor.entity_graph.num_vertices(),
+                         replayed_processor.entity_graph.num_vertices())
+        self.assertEqual(processor.entity_graph.num_edges(),
+                         replayed_processor.entity_graph.num_edges())
+
+    def test_replay_initialized(self):
+        # e.g. from a checkpoint: the journal has no end message, and every
+        # event is evaluated
+        init_status = InitializationStatus()
+        init_status.status = InitializationStatus.FINISHED
+        processor = proc.Processor(self.conf, init_status)
+        evaluator = _Evaluator()
+        enabled = []
+        with mock.patch.object(
+                processor, 'process_event',
+                side_effect=lambda event: enabled.append(evaluator.enabled)):
+            replay([(0, {'id': 1}), (0, {'id': 2})], processor, evaluator)
+        self.assertEqual([True, True], enabled)
@@ -16,8 +16,10 @@ import os
 from oslo_config import cfg
 from oslo_log import log as logging
 
+from vitrage.common.constants import VertexProperties as VProps
 from vitrage.common import file_utils
 from vitrage.evaluator.scenario_repository import ScenarioRepository
+from vitrage.evaluator.template import ENTITY
 from vitrage.evaluator.template_validation.template_syntax_validator import \
     syntax_validation
 from vitrage.tests import base
@@ -72,6 +74,29 @@ class ScenarioRepositoryTest(base.BaseTest):
         scenario_templates = self.scenario_repository.templates
         self.assertEqual(valid_template_counter, len(scenario_templates))
 
+    def test_match_plans(self):
+        for template in self.scenario_repository.templates.values():
+            for scenario in template.scenarios:
+                plans = self.scenario_repository.get_match_plans(scenario)
+                self.assertEqual(len(scenario.condition), len(plans))
+                for clause, plan in zip(scenario.condition, plans):
+                    self.assertIsNotNone(plan)
+                    for vertex in plan.graph.get_vertices():
+                        self.assertFalse(vertex[VProps.IS_DELETED])
+                    for term in clause:
+                        self.assertIsNotNone(plan.matcher.prepare(
+                            self._term_vertex_ids(term)))
+
+            # The template itself is left unchanged
+            for entity in template.entities.values():
+                self.assertNotIn(VProps.IS_DELETED, entity.properties)
+
+    @staticmethod
+    def _term_vertex_ids(term):
+        if term.type == ENTITY:
+            return [term.variable.vertex_id]
+        return [term.variable.edge.source_id, term.variable.edge.target_id]
+
     def test_get_scenario_by_edge(self):
         pass
 
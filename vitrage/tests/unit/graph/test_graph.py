@@ -18,11 +18,31 @@ test_vitrage graph
 
 Tests for `vitrage` graph driver
 """
+import copy
+import json
+import threading
+
+import mock
+from oslo_serialization import jsonutils
+import testtools
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
 
 from vitrage.common.constants import EdgeProperties as EProps
 from vitrage.common.constants import VertexProperties as VProps
 from vitrage.graph import Direction
+from vitrage.graph.driver import columnar
+from vitrage.graph.driver.networkx_graph import merge_output_graph_parts
+from vitrage.graph.driver.networkx_graph import SortedIndex
+from vitrage.graph.driver import notifier
+from vitrage.graph.driver.notifier import OverflowPolicy
+from vitrage.graph import NXGraph
+from vitrage.graph.query import create_predicate
 from vitrage.graph import utils
+from vitrage.graph import Vertex
 from vitrage.tests.unit.graph.base import *  # noqa
 
 LOG = logging.getLogger(__name__)
@@ -388,6 +408,573 @@ class GraphTest(GraphTestBase):
         self.assertEqual(OPENSTACK_CLUSTER, found_vertex[VProps.TYPE],
                          'get_vertices check node vertex')
 
+    def test_get_vertices_indexed_properties(self):
+        g = self.entity_graph.copy()
+
+        def scan(attr_filter):
+            return {v_id for v_id, data in g._g.nodes_iter(data=True)
+                    if all(data.get(k) in (c if isinstance(c, list) else [c])
+                           for k, c in attr_filter.items())}
+
+        def found(attr_filter):
+            return {v.vertex_id for v in g.get_vertices(
+                vertex_attr_filter=attr_filter)}
+
+        alarms_filter = {VProps.CATEGORY: ALARM, VProps.IS_DELETED: False}
+        self.assertEqual(scan(alarms_filter), found(alarms_filter),
+                         'indexed get_vertices matches a full scan')
+        self.assertEqual(
+            ENTITY_GRAPH_HOSTS_PER_CLUSTER * ENTITY_GRAPH_ALARMS_PER_HOST +
+            ENTITY_GRAPH_HOSTS_PER_CLUSTER * ENTITY_GRAPH_VMS_PER_HOST *
+            ENTITY_GRAPH_ALARMS_PER_VM,
+            len(found(alarms_filter)), 'number of alarms')
+
+        types_filter = {VProps.TYPE: [NOVA_HOST_DATASOURCE, SWITCH],
+                        'missing_key': None}
+        self.assertEqual(ENTITY_GRAPH_HOSTS_PER_CLUSTER + 1,
+                         len(found(types_filter)), 'list of indexed values')
+
+        # the indexes follow update, add (of an existing vertex) and remove
+        host = g.get_vertices({VProps.TYPE: NOVA_HOST_DATASOURCE})[0]
+        host[VProps.IS_DELETED] = True
+        g.update_vertex(host)
+        vm = g.get_vertex(self.vms[0].vertex_id)
+        vm[VProps.CATEGORY] = ALARM
+        g.add_vertex(vm)
+        alarm = g.get_vertices(alarms_filter)[0]
+        g.remove_vertex(alarm)
+
+        deleted = found({VProps.IS_DELETED: True})
+        self.assertEqual({host.vertex_id}, deleted, 'updated vertex')
+        self.assertIn(vm.vertex_id, found(alarms_filter), 'added vertex')
+        self.assertNotIn(alarm.vertex_id, found(alarms_filter),
+                         'removed vertex')
+        self.assertEqual(scan(alarms_filter), found(alarms_filter),
+                         'indexed get_vertices matches a full scan')
+
+        # query results are not indexed, and are still queried correctly
+        sub_graph = g.subgraph(scan(alarms_filter) | {host.vertex_id})
+        self.assertEqual({}, sub_graph._indexes, 'sub graph indexes')
+        self.assertEqual(
+            scan(alarms_filter),
+            {v.vertex_id for v in sub_graph.get_vertices(alarms_filter)},
+            'unindexed get_vertices of a sub graph')
+
+    def test_get_vertices_query_plan(self):
+        g = self.entity_graph.copy()
+        alarms_query = {'and': [{'==': {VProps.CATEGORY: ALARM}},
+                                {'==': {VProps.IS_DELETED: False}}]}
+        hosts_or_switches_query = {
+            'and': [{'==': {VProps.IS_PLACEHOLDER: False}},
+                    {'or': [{'==': {VProps.TYPE: NOVA_HOST_DATASOURCE}},
+                            {'==': {VProps.TYPE: SWITCH}}]}]}
+        scan_query = {'or': [{'==': {VProps.TYPE: SWITCH}},
+                             {'!=': {VProps.STATE: 'OK'}}]}
+
+        num_alarms = \
+            ENTITY_GRAPH_HOSTS_PER_CLUSTER * ENTITY_GRAPH_ALARMS_PER_HOST + \
+            ENTITY_GRAPH_HOSTS_PER_CLUSTER * ENTITY_GRAPH_VMS_PER_HOST * \
+            ENTITY_GRAPH_ALARMS_PER_VM
+        plan = g.query_plan(alarms_query)
+        self.assertEqual(
+            'and(index(%s == %r) ~%d)' % (VProps.CATEGORY, ALARM, num_alarms),
+            str(plan), 'the most selective term')
+        self.assertEqual(num_alarms, len(plan.candidates()))
+
+        plan = g.query_plan(hosts_or_switches_query)
+        self.assertEqual(ENTITY_GRAPH_HOSTS_PER_CLUSTER + 1,
+                         len(plan.candidates()), 'union of the or terms')
+        self.assertEqual('scan', str(g.query_plan(scan_query)))
+
+        types_query = {
+            'and': [{'in': {VProps.TYPE: [NOVA_HOST_DATASOURCE, SWITCH]}},
+                    {'exists': {VProps.STATE: False}}]}
+        self.assertEqual(ENTITY_GRAPH_HOSTS_PER_CLUSTER + 1,
+                         len(g.query_plan(types_query).candidates()),
+                         'in operator')
+
+        for query in (alarms_query, hosts_or_switches_query, scan_query,
+                      types_query):
+            match = create_predicate(query)
+            self.assertEqual(
+                {v_id for v_id, data in g._g.nodes_iter(data=True)
+                 if match(data)},
+                {v.vertex_id for v in g.get_vertices(query_dict=query)},
+                'planned get_vertices matches a full scan')
+            with g.snapshot() as snapshot:
+                self.assertEqual(
+                    len(g.get_vertices(query_dict=query)),
+                    len(snapshot.get_vertices(query_dict=query)),
+                    'planned get_vertices on a snapshot')
+
+    def test_get_vertices_range_query(self):
+        g = NXGraph('test_get_vertices_range_query')
+        for i in range(20):
+            g.add_vertex(Vertex(str(i), {
+                VProps.CATEGORY: RESOURCE if i % 2 else ALARM,
+                VProps.SAMPLE_TIMESTAMP: '2016-01-01 00:00:%02d' % i}))
+
+        def found(query):
+            return {v.vertex_id for v in g.get_vertices(query_dict=query)}
+
+        before_5 = {'<': {VProps.SAMPLE_TIMESTAMP: '2016-01-01 00:00:05'}}
+        self.assertEqual('range(%s < %r) ~5' % (
+            VProps.SAMPLE_TIMESTAMP, '2016-01-01 00:00:05'),
+            str(g.query_plan(before_5)))
+        self.assertEqual({'0', '1', '2', '3', '4'}, found(before_5))
+        self.assertEqual(
+            {'1', '3', '5', '15'},
+            found({'and': [
+                {'==': {VProps.CATEGORY: RESOURCE}},
+                {'or': [
+                    {'<=': {VProps.SAMPLE_TIMESTAMP: '2016-01-01 00:00:05'}},
+                    {'>=': {VProps.SAMPLE_TIMESTAMP: '2016-01-01 00:00:15'}}
+                ]},
+                {'<': {VProps.SAMPLE_TIMESTAMP: '2016-01-01 00:00:17'}}]}))
+
+        # The index follows the updates and removals
+        v = g.get_vertex('10')
+        v[VProps.SAMPLE_TIMESTAMP] = '2015-12-31 23:59:59'
+        g.update_vertex(v)
+        g.remove_vertex(g.get_vertex('0'))
+        self.assertEqual({'1', '2', '3', '4', '10'}, found(before_5))
+        self.assertEqual(
+            {'17', '18', '19'},
+            found({'>': {VProps.SAMPLE_TIMESTAMP: '2016-01-01 00:00:16'}}))
+        prefix_query = {'startswith': {
+            VProps.SAMPLE_TIMESTAMP: '2016-01-01 00:00:1'}}
+        self.assertEqual('range(%s startswith %r) ~9' % (
+            VProps.SAMPLE_TIMESTAMP, '2016-01-01 00:00:1'),
+            str(g.query_plan(prefix_query)))
+        self.assertEqual({str(i) for i in range(11, 20)}, found(prefix_query))
+
+    def test_sorted_index(self):
+        def timestamp(i):
+            # Several vertices per timestamp, in several formats
+            minutes, seconds = divmod(i // 5, 60)
+            if i % 3 == 0:
+                return '2016-01-01T00:%02d:%02dZ' % (minutes, seconds)
+            return '2016-01-01 00:%02d:%02d.%06d' % (minutes, seconds, i % 2)
+
+        SortedIndex.BUCKET_SIZE = 4
+        self.addCleanup(setattr, SortedIndex, 'BUCKET_SIZE', 512)
+        values = {str(i): timestamp(i) for i in range(200)}
+        values['none'] = None
+        values['name'] = 'compute-1'
+        index = SortedIndex(VProps.SAMPLE_TIMESTAMP, values.items())
+        for i in range(200, 400):
+            values[str(i)] = timestamp(i)
+            index.add(str(i), values[str(i)])
+        for i in range(0, 400, 3):
+            index.remove(str(i), values.pop(str(i)))
+        index.remove('unknown', timestamp(10))
+        self.assertEqual(len(values), len(index), 'removed by exact key')
+
+        for op, bound in (('<', '2016-01-01 00:00:20'),
+                          ('<=', '2016-01-01T00:00:20.000000'),
+                          ('>', '2016-01-01 00:00:20.000000+00:00'),
+                          ('>=', '2016-01-01 00:01:00'),
+                          ('<', 'compute-2'),
+                          ('startswith', '2016-01-01T00:00:2'),
+                          ('startswith', '2016-01-01 00:01:1'),
+                          ('startswith', 'comp')):
+            match = create_predicate({op: {VProps.SAMPLE_TIMESTAMP: bound}})
+            expected = {v_id for v_id, value in values.items()
+                        if value is not None and
+                        match({VProps.SAMPLE_TIMESTAMP: value})}
+            candidates = index.lookup_range(op, bound)
+            self.assertIn('none', candidates, 'kept aside')
+            candidates.discard('none')
+            if op == 'startswith':
+                self.assertTrue(expected.issubset(candidates),
+                                'candidates of %s %s' % (op, bound))
+            else:
+                self.assertEqual(expected, candidates,
+                                 'candidates of %s %s' % (op, bound))
+            self.assertEqual(len(candidates) + 1,
+                             index.count_range(op, bound))
+
+        self.assertEqual({'none', '1'},
+                         index.lookup(['2016-01-01T00:00:00.000001']))
+
+    @testtools.skipUnless(columnar.is_available(), 'requires NumPy')
+    def test_columnar_scan(self):
+        g = NXGraph('test_columnar_scan', columnar_scan=True)
+        for i in range(3000):
+            g.add_vertex(Vertex(str(i), {
+                VProps.CATEGORY: ALARM if i % 3 else RESOURCE,
+                VProps.STATE: 'state-%d' % (i % 7),
+                'severity': i % 10,
+                'tags': ['a'] if i % 100 == 0 else None}))
+
+        queries = [
+            {'>=': {'severity': 8}},
+            {'and': [{'<': {VProps.STATE: 'state-3'}},
+                     {'or': [{'==': {'severity': 1}},
+                             {'!=': {VProps.STATE: 'state-0'}}]}]},
+            {'and': [{'startswith': {VProps.STATE: 'state-1'}},
+                     {'not in': {'severity': [1, 2, 3]}}]},
+            {'==': {'tags': ['a']}},
+            {'exists': {'tags': True}},
+            {'or': []},
+            {'<': {'severity': 3}},
+            {'>': {'severity': 2 ** 60}},
+        ]
+
+        def scan(query):
+            # Incomparable values, e.g. 'unknown' >= 8, never match
+            match = create_predicate(query)
+            result = set()
+            for v_id, data in g._g.nodes_iter(data=True):
+                try:
+                    if match(data):
+                        result.add(v_id)
+                except TypeError:
+                    pass
+            return result
+
+        def check():
+            for query in queries:
+                self.assertEqual('scan', str(g.query_plan(query)))
+                self.assertEqual(
+                    scan(query),
+                    {v.vertex_id for v in g.get_vertices(query_dict=query)},
+                    'columnar scan matches a full scan: %s' % query)
+        check()
+
+        # The columns follow the changes of the vertices
+        for i in range(0, 3000, 7):
+            g.remove_vertex(Vertex(str(i)))
+        for i in range(1, 3000, 11):
+            v = g.get_vertex(str(i))
+            if v:
+                v['severity'] = 'unknown'
+                v[VProps.STATE] = 'state-new-%d' % i
+                g.update_vertex(v)
+        for i in range(3000, 3100):
+            g.add_vertex(Vertex(str(i), {VProps.STATE: 'state-1',
+                                         'severity': 9.5}))
+        # compared as in Python, not as float64
+        for i, severity in enumerate([True, False, 2 ** 60 + 1]):
+            g.add_vertex(Vertex(str(3100 + i), {'severity': severity}))
+        check()
+
+    def test_get_vertices_paging(self):
+        g = self.entity_graph.copy()
+        alarms_filter = {VProps.CATEGORY: ALARM}
+        alarm_ids = sorted(
+            v.vertex_id for v in g.get_vertices(alarms_filter))
+
+        self.assertEqual(len(alarm_ids),
+                         g.get_vertices(alarms_filter, count_only=True))
+        pages = [g.get_vertices(alarms_filter, limit=10, offset=offset)
+                 for offset in range(0, len(alarm_ids), 10)]
+        self.assertEqual(alarm_ids,
+                         [v.vertex_id for page in pages for v in page],
+                         'pages ordered by vertex id')
+        self.assertEqual(
+            alarm_ids[5:],
+            [v.vertex_id for v in g.get_vertices(alarms_filter, offset=5)])
+        self.assertEqual([], g.get_vertices(alarms_filter, limit=0))
+
+        query = {'==': {VProps.CATEGORY: ALARM}}
+        vertices = g.get_vertices(query_dict=query, limit=3,
+                                  fields=[VProps.CATEGORY, 'missing'])
+        self.assertEqual(alarm_ids[:3], [v.vertex_id for v in vertices])
+        self.assertEqual([{VProps.CATEGORY: ALARM}] * 3,
+                         [dict(v.properties) for v in vertices],
+                         'projected properties')
+        with g.snapshot() as snapshot:
+            self.assertEqual(
+                len(alarm_ids),
+                snapshot.get_vertices(query_dict=query, count_only=True))
+            self.assertEqual(
+                alarm_ids[2:4],
+                [v.vertex_id for v in snapshot.get_vertices(
+                    query_dict=query, limit=2, offset=2)])
+
+    def test_get_edges_by_relationship_type(self):
+        g = self.entity_graph.copy()
+        host_id = g.get_vertices(
+            vertex_attr_filter={VProps.TYPE: NOVA_HOST_DATASOURCE})[0].\
+            vertex_id
+
+        def scan(attr_filter):
+            return sorted((e for e in g.get_edges(host_id)
+                           if all(e.get(k) in (c if isinstance(c, list)
+                                               else [c])
+                                  for k, c in attr_filter.items())),
+                          key=str)
+
+        def found(graph, attr_filter):
+            return sorted(graph.get_edges(host_id, attr_filter=attr_filter),
+                          key=str)
+
+        on_filter = {EProps.RELATIONSHIP_TYPE: ELabel.ON}
+        both_filter = {EProps.RELATIONSHIP_TYPE: [ELabel.ON, ELabel.CONTAINS],
+                       EProps.IS_DELETED: False}
+        for attr_filter in (on_filter, both_filter):
+            self.assertEqual(scan(attr_filter), found(g, attr_filter),
+                             'indexed get_edges matches a full scan')
+        self.assertEqual(
+            len(scan(on_filter)),
+            len(g.neighbors(host_id, edge_attr_filter=on_filter)),
+            'neighbors by relationship type')
+
+        # The index follows added, updated and removed edges, including an
+        # edge whose relationship type is not its label
+        snapshot = g.snapshot()
+        snapshot_edges = found(snapshot, on_filter)
+        g.add_edge(utils.create_edge(source_id=self.vms[0].vertex_id,
+                                     target_id=host_id,
+                                     relationship_type=ELabel.ON))
+        removed_edge = found(g, on_filter)[0]
+        g.remove_edge(removed_edge)
+        updated_edge = g.get_edges(
+            host_id, Direction.OUT,
+            attr_filter={EProps.RELATIONSHIP_TYPE: ELabel.CONTAINS})[0]
+        updated_edge[EProps.RELATIONSHIP_TYPE] = ELabel.ON
+        g.update_edge(updated_edge)
+
+        on_edges = found(g, on_filter)
+        self.assertEqual(scan(on_filter), on_edges,
+                         'indexed get_edges matches a full scan')
+        self.assertNotIn(removed_edge, on_edges, 'removed edge')
+        self.assertIn(updated_edge, on_edges, 'relabeled edge')
+        self.assertEqual(snapshot_edges, found(snapshot, on_filter),
+                         'snapshot edges by relationship type')
+        snapshot.release()
+
+    def test_read_only_view(self):
+        g = create_graph('test_read_only_view')
+        g.add_vertex(v_node)
+        g.add_vertex(v_host)
+        g.add_edge(e_node_to_host)
+        view = g.read_only_view()
+        self.assertIs(view, g.read_only_view(), 'view is reused')
+        self.assertIs(view, view.read_only_view(), 'view of a view')
+
+        v = view.get_vertex(v_node.vertex_id)
+        self.assertEqual(v_node, v, 'view vertex equals the graph vertex')
+        self.assertRaises(TypeError, v.__setitem__, 'KUKU', 'KUKU')
+        self.assertRaises(TypeError, v.__delitem__, VProps.TYPE)
+
+        e = view.get_edges(v_host.vertex_id)[0]
+        self.assertEqual(e_node_to_host, e, 'view edge equals the graph edge')
+        self.assertRaises(TypeError, e.__setitem__, 'KUKU', 'KUKU')
+
+        # Serialization of the properties of view elements
+        for element, expected in ((v, v_node), (e, e_node_to_host)):
+            self.assertEqual(expected.properties,
+                             json.loads(jsonutils.dumps(element.properties)),
+                             'jsonutils serializes a view')
+            self.assertEqual(expected.properties,
+                             jsonutils.to_primitive(element.properties),
+                             'notification payload of a view')
+            self.assertEqual(
+                expected.properties,
+                json.loads(json.dumps(copy.copy(element.properties))),
+                'json serializes a copy of a view')
+            self.assertRaises(TypeError, json.dumps, element.properties)
+
+        # The view shares the data of the graph
+        updated_vertex = g.get_vertex(v_node.vertex_id)
+        updated_vertex['KUKU'] = 'KUKU'
+        g.update_vertex(updated_vertex)
+        self.assertEqual('KUKU', view.get_vertex(v_node.vertex_id)['KUKU'],
+                         'graph update is visible through the view')
+        self.assertEqual(
+            1, len(view.get_vertices(query_dict={'==': {'KUKU': 'KUKU'}})),
+            'view query')
+        self.assertEqual(
+            [v_host.vertex_id],
+            [n.vertex_id for n in view.neighbors(v_node.vertex_id)],
+            'view neighbors')
+
+        # A copy of a view element is a regular mutable vertex
+        g.add_vertex(Vertex('copied', copy.copy(v.properties)))
+        copied = g.get_vertex('copied')
+        copied['KUKU'] = 'ZIG'
+        g.update_vertex(copied)
+        self.assertEqual('KUKU', g.get_vertex(v_node.vertex_id)['KUKU'],
+                         'copied properties are not shared')
+
+    def test_compact_storage(self):
+        g = NXGraph('test_compact_storage', compact_storage=True)
+        for vertex in self.entity_graph.get_vertices():
+            g.add_vertex(vertex)
+        store = g._vertex_store
+        self.assertEqual(len(self.entity_graph), len(store), 'rows in use')
+
+        expected = sorted(self.entity_graph.get_vertices(),
+                          key=lambda v: v.vertex_id)
+        actual = sorted(g.get_vertices(), key=lambda v: v.vertex_id)
+        self.assertEqual(expected, actual, 'same vertices as a dict graph')
+        self.assertIsInstance(actual[0].properties, dict,
+                              'returned vertices are copies')
+
+        query = {'and': [{'==': {VProps.CATEGORY: ALARM}},
+                         {'==': {VProps.IS_DELETED: False}}]}
+        self.assertEqual(
+            len(self.entity_graph.get_vertices(query_dict=query)),
+            len(g.get_vertices(query_dict=query)), 'query on compact graph')
+
+        # Known, unknown, None and unhashable values
+        v = g.get_vertex(v_node.vertex_id)
+        v[VProps.STATE] = None
+        v[VProps.IS_DELETED] = 1
+        v['some_meta'] = ['a', 'b']
+        v[VProps.TYPE] = {'unhashable': True}
+        g.add_vertex(v)
+        v = g.get_vertex(v_node.vertex_id)
+        self.assertIsNone(v[VProps.STATE], 'None value is kept')
+        self.assertIs(1, v[VProps.IS_DELETED], 'int is not turned to bool')
+        self.assertEqual(['a', 'b'], v['some_meta'], 'free-form property')
+        self.assertEqual({'unhashable': True}, v[VProps.TYPE],
+                         'unhashable value of an encoded property')
+
+        v[VProps.STATE] = None
+        v['some_meta'] = None
+        g.update_vertex(v)
+        v = g.get_vertex(v_node.vertex_id)
+        self.assertNotIn(VProps.STATE, v.properties, 'update removes None')
+        self.assertNotIn('some_meta', v.properties, 'update removes None')
+
+        # Rows of removed vertices are reused
+        g.remove_vertex(v)
+        self.assertEqual(len(self.entity_graph) - 1, len(store),
+                         'row released on remove')
+        g.add_vertex(v_node)
+        self.assertEqual(len(self.entity_graph), len(store), 'row reused')
+
+        graph_copy = g.copy()
+        self.assertEqual(2 * len(self.entity_graph), len(store),
+                         'copy shares the store')
+        self.assertEqual(g.get_vertex(v_node.vertex_id),
+                         graph_copy.get_vertex(v_node.vertex_id),
+                         'copied vertex')
+
+    @testtools.skipIf(tracemalloc is None, 'tracemalloc is not available')
+    def test_compact_storage_memory(self):
+        # Whole-graph memory of the same instances, as they are built from
+        # the decoded events: the strings of the values belong to the graph
+        def instance_event(i, host_id):
+            properties = {
+                VProps.CATEGORY: RESOURCE,
+                VProps.TYPE: NOVA_INSTANCE_DATASOURCE,
+                VProps.ID: '8b8e0c6a-%012d' % i,
+                VProps.VITRAGE_ID: 'RESOURCE:nova.instance:%d' % i,
+                VProps.NAME: 'instance-%d' % i,
+                VProps.STATE: 'ACTIVE',
+                VProps.AGGREGATED_STATE: 'ACTIVE',
+                VProps.PROJECT_ID: 'project-%d' % (i % 10),
+                VProps.IS_DELETED: False,
+                VProps.IS_PLACEHOLDER: False,
+                VProps.UPDATE_TIMESTAMP: '2016-02-07 15:26:04.%06d' % i,
+                VProps.SAMPLE_TIMESTAMP: '2016-02-07 15:26:04'}
+            if host_id:
+                properties['host_id'] = 'host-%d' % (i % 100)
+            return json.dumps(properties)
+
+        def graph_memory(compact_storage, events):
+            tracemalloc.start()
+            try:
+                g = NXGraph('test_memory', compact_storage=compact_storage)
+                for event in events:
+                    properties = json.loads(event)
+                    g.add_vertex(Vertex(properties[VProps.VITRAGE_ID],
+                                        properties))
+                del properties
+                return tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+
+        for host_id in (False, True):
+            events = [instance_event(i, host_id) for i in range(2000)]
+            plain = graph_memory(False, events)
+            compact = graph_memory(True, events)
+            LOG.info('Graph of %d instances, host_id %s: %d bytes, '
+                     'compact %d bytes', len(events), host_id, plain, compact)
+            self.assertLess(compact, plain / 2,
+                            'compact graph takes half the memory, '
+                            'host_id %s' % host_id)
+
+    def test_snapshot(self):
+        g = self.entity_graph.copy()
+        num_vertices = g.num_vertices()
+        num_edges = g.num_edges()
+        host = g.get_vertices(
+            vertex_attr_filter={VProps.TYPE: NOVA_HOST_DATASOURCE})[0]
+        host_id = host.vertex_id
+        host_edges = g.get_edges(host_id)
+        host_neighbors = sorted(n.vertex_id for n in g.neighbors(host_id))
+
+        snapshot = g.snapshot()
+        old_host = g.get_vertex(host_id)
+
+        # Change the graph after the snapshot was taken
+        updated_host = g.get_vertex(host_id)
+        updated_host[VProps.STATE] = 'SUSPENDED'
+        g.update_vertex(updated_host)
+        new_vertex = Vertex('new_vertex', {VProps.CATEGORY: RESOURCE})
+        g.add_vertex(new_vertex)
+        g.add_edge(utils.create_edge(source_id=new_vertex.vertex_id,
+                                     target_id=host_id,
+                                     relationship_type='KUKU'))
+        removed_edge = host_edges[0]
+        g.remove_edge(removed_edge)
+        removed_vertex = g.get_vertices(
+            vertex_attr_filter={VProps.CATEGORY: ALARM})[0]
+        g.remove_vertex(removed_vertex)
+
+        # The snapshot sees the graph as it was
+        self.assertEqual(old_host, snapshot.get_vertex(host_id),
+                         'vertex before the update')
+        self.assertIsNone(snapshot.get_vertex(new_vertex.vertex_id),
+                          'vertex added after the snapshot')
+        self.assertEqual(removed_vertex,
+                         snapshot.get_vertex(removed_vertex.vertex_id),
+                         'vertex removed after the snapshot')
+        self.assertEqual(num_vertices, snapshot.num_vertices())
+        self.assertEqual(num_edges, snapshot.num_edges())
+        self.assertEqual(num_vertices, len(snapshot.get_vertices()))
+        self.assertEqual(
+            sorted(host_edges, key=str),
+            sorted(snapshot.get_edges(host_id), key=str), 'edges')
+        self.assertEqual(
+            host_neighbors,
+            sorted(n.vertex_id for n in snapshot.neighbors(host_id)),
+            'neighbors')
+        self.assertEqual(
+            0, len(snapshot.get_vertices(
+                vertex_attr_filter={VProps.STATE: 'SUSPENDED'})),
+            'filter on the snapshot')
+        self.assertEqual(
+            len(self.entity_graph.get_vertices(
+                vertex_attr_filter={VProps.CATEGORY: ALARM})),
+            len(snapshot.get_vertices(
+                vertex_attr_filter={VProps.CATEGORY: ALARM})),
+            'indexed filter on the snapshot')
+        self.assertRaises(TypeError, snapshot.add_vertex, new_vertex)
+
+        # Algorithms and copies work on the snapshot state
+        snapshot_copy = snapshot.copy()
+        self.assertEqual(num_vertices, snapshot_copy.num_vertices())
+        self.assertEqual(num_edges, snapshot_copy.num_edges())
+        self.assertEqual(old_host, snapshot_copy.get_vertex(host_id))
+
+        # The live graph is changed
+        self.assertEqual(num_vertices, g.num_vertices())
+        self.assertEqual('SUSPENDED', g.get_vertex(host_id)[VProps.STATE])
+
+        # Released snapshots do not keep history
+        snapshot.release()
+        self.assertFalse(g._version_log.is_recording(), 'not recording')
+        self.assertEqual({}, g._version_log.vertices_changed_after(-1))
+        with g.snapshot() as other_snapshot:
+            self.assertEqual(g.num_vertices(), other_snapshot.num_vertices())
+        self.assertFalse(g._version_log.is_recording(), 'context manager')
+
     def _check_callback_result(self, result, msg, exp_prev, exp_curr):
 
         def assert_none_or_equals(exp, act, message):
@@ -457,6 +1044,188 @@ class GraphTest(GraphTestBase):
         self._check_callback_result(self.result, 'update edge', e_node_to_host,
                                     updated_edge)
 
+    def test_graph_bulk_mutations(self):
+        g = create_graph('test_graph_bulk_mutations')
+        change_sets = []
+        element_changes = []
+        g.subscribe(lambda changes: change_sets.append(changes), batch=True)
+        g.subscribe(lambda *args: element_changes.append(args))
+
+        g.add_vertices([v_node, v_host, v_instance])
+        self.assertEqual(3, g.num_vertices(), 'add_vertices')
+        self.assertEqual(1, len(change_sets), 'one change-set per batch')
+        self.assertEqual([(None, v_node, True),
+                          (None, v_host, True),
+                          (None, v_instance, True)],
+                         [tuple(change) for change in change_sets[0]],
+                         'add_vertices change-set')
+        self.assertEqual(3, len(element_changes),
+                         'element subscribers called per element')
+
+        e_host_to_instance = utils.create_edge(
+            source_id=v_host.vertex_id,
+            target_id=v_instance.vertex_id,
+            relationship_type='contains')
+        g.add_edges([e_node_to_host, e_host_to_instance])
+        self.assertEqual(2, g.num_edges(), 'add_edges')
+        self.assertEqual(2, len(change_sets[-1]), 'add_edges change-set')
+        self.assertFalse(change_sets[-1][0].is_vertex, 'edge change')
+
+        # A vertex updated twice in the batch is reported once
+        updated_host = g.get_vertex(v_host.vertex_id)
+        updated_host[VProps.STATE] = 'SUSPENDED'
+        updated_host_again = g.get_vertex(v_host.vertex_id)
+        updated_host_again['ZIG'] = 'ZAG'
+        updated_node = g.get_vertex(v_node.vertex_id)
+        updated_node['ZIG'] = 'ZAG'
+        g.update_vertices([updated_host, updated_node, updated_host_again])
+        changes = change_sets[-1]
+        self.assertEqual(2, len(changes), 'duplicates are coalesced')
+        self.assertEqual(v_host, changes[0].before, 'state before the batch')
+        self.assertEqual('SUSPENDED', changes[0].current[VProps.STATE])
+        self.assertEqual('ZAG', changes[0].current['ZIG'])
+        self.assertNotIsInstance(changes[0].current.properties, dict,
+                                 'a read only view, not a copy')
+        self.assertEqual('ZAG', g.get_vertex(v_node.vertex_id)['ZIG'])
+        self.assertEqual(
+            1, len(g.get_vertices(vertex_attr_filter={
+                VProps.STATE: 'SUSPENDED'})), 'indexes are maintained')
+
+        updated_edge = g.get_edge(e_node_to_host.source_id,
+                                  e_node_to_host.target_id,
+                                  e_node_to_host.label)
+        updated_edge['ZIG'] = 'ZAG'
+        g.update_edges([updated_edge])
+        self.assertEqual([(e_node_to_host, updated_edge, False)],
+                         [tuple(change) for change in change_sets[-1]],
+                         'update_edges change-set')
+
+        num_change_sets = len(change_sets)
+        g.update_vertices([])
+        self.assertEqual(num_change_sets, len(change_sets),
+                         'no notification for an empty batch')
+
+    def test_graph_coalesced_notifications(self):
+        g = create_graph('test_graph_coalesced_notifications')
+        g.add_vertex(v_host)
+        change_sets = []
+        element_changes = []
+        removals = []
+        g.subscribe(lambda changes: change_sets.append(changes), batch=True)
+        g.subscribe(lambda *args: element_changes.append(args))
+        g.subscribe_removals(removals.append)
+
+        with g.notifier.coalesce():
+            updated_host = g.get_vertex(v_host.vertex_id)
+            updated_host[VProps.STATE] = 'SUSPENDED'
+            g.update_vertex(updated_host)
+            updated_host['ZIG'] = 'ZAG'
+            g.update_vertex(updated_host)
+            g.add_vertices([v_node])
+            g.add_vertex(v_instance)
+            g.remove_vertex(v_instance)
+            self.assertEqual([], change_sets, 'held until the block ends')
+            self.assertEqual([v_instance], removals,
+                             'removals are not held, nor coalesced')
+
+        self.assertEqual(1, len(change_sets), 'one change-set per block')
+        self.assertEqual(3, len(element_changes),
+                         'element subscribers called per element')
+        host_change, node_change, instance_change = change_sets[0]
+        self.assertEqual((None, v_instance, True), tuple(instance_change),
+                         'a removal is not a change')
+        self.assertEqual(v_host.vertex_id, host_change.key)
+        self.assertEqual(v_host, host_change.before,
+                         'state before the first change')
+        self.assertEqual({VProps.STATE: (v_host.get(VProps.STATE),
+                                         'SUSPENDED'),
+                          'ZIG': (None, 'ZAG')},
+                         host_change.changed_properties())
+        self.assertEqual((None, v_node, True), tuple(node_change))
+
+        # The state before is kept by later changes
+        g.update_vertex(Vertex(v_host.vertex_id, {'ZIG': 'ZOG'}))
+        self.assertEqual('ZAG', change_sets[-1][0].before['ZIG'])
+        self.assertEqual('ZAG', host_change.current['ZIG'])
+
+    def test_graph_async_subscription(self):
+        g = create_graph('test_graph_async_subscription')
+        released = threading.Event()
+        element_changes = []
+        change_sets = []
+
+        def slow_subscriber(*args):
+            released.wait()
+            element_changes.append(args)
+
+        g.subscribe(slow_subscriber, asynchronous=True)
+        g.subscribe(lambda changes: change_sets.append(changes), batch=True,
+                    asynchronous=True, max_queue_size=1,
+                    overflow_policy=OverflowPolicy.DROP_OLDEST)
+
+        # The graph changes do not wait for the subscribers
+        g.add_vertex(v_node)
+        g.add_vertex(v_host)
+        g.add_vertices([v_instance])
+        self.assertEqual([], element_changes)
+
+        released.set()
+        g.notifier.flush()
+        self.assertEqual([(None, v_node, True),
+                          (None, v_host, True),
+                          (None, v_instance, True)],
+                         element_changes, 'delivered in order')
+        self.assertEqual((None, v_instance, True), tuple(change_sets[-1][0]))
+
+        stats = {subscription['name']: subscription
+                 for subscription in g.notifier.async_stats()}
+        self.assertEqual(3, stats['slow_subscriber']['delivered'])
+        self.assertEqual(0, stats['slow_subscriber']['dropped'])
+        self.assertEqual(0, stats['slow_subscriber']['queued'])
+        self.assertGreater(stats['slow_subscriber']['max_lag'], 0)
+        self.assertEqual(3, sum(stats['<lambda>'][key]
+                                for key in ('delivered', 'dropped')))
+        with mock.patch.object(notifier.LOG, 'info') as log_info:
+            g.notifier.log_async_stats()
+        self.assertEqual(
+            sorted(stats),
+            sorted(call[0][1]['name'] for call in log_info.call_args_list),
+            'a log per asynchronous subscription')
+
+        self.assertRaises(ValueError, g.subscribe, slow_subscriber,
+                          asynchronous=True, overflow_policy='unknown')
+
+    def test_output_graph_chunks(self):
+        g = self.entity_graph
+        output = json.loads(g.output_graph(inspected_index=1))
+        self.assertEqual(len(g), len(output['nodes']))
+        self.assertEqual(g.num_edges(), len(output['links']))
+        self.assertEqual(1, output['inspected_index'])
+        for index, node in enumerate(output['nodes']):
+            self.assertEqual(index, node[VProps.GRAPH_INDEX])
+            vertex = g.get_vertex(node[VProps.VITRAGE_ID])
+            self.assertEqual(vertex[VProps.ID], node[VProps.ID])
+        for link in output['links']:
+            source = output['nodes'][link['source']]
+            target = output['nodes'][link['target']]
+            self.assertIsNotNone(g.get_edge(source[VProps.VITRAGE_ID],
+                                            target[VProps.VITRAGE_ID],
+                                            link['key']))
+
+        chunks = list(g.output_graph_chunks(chunk_size=10, inspected_index=1))
+        self.assertGreater(len(chunks), 10, 'several chunks')
+        self.assertEqual(output, json.loads(''.join(chunks)))
+
+        parts = list(g.output_graph_parts(chunk_size=10, inspected_index=1))
+        self.assertTrue(all(len(elements) <= 10 for part in parts[1:]
+                            for elements in part.values()))
+        self.assertEqual(output, merge_output_graph_parts(parts))
+
+        empty_graph = create_graph('empty')
+        self.assertEqual(json.loads(empty_graph.output_graph()),
+                         merge_output_graph_parts(
+                             empty_graph.output_graph_parts()))
+
     def test_union(self):
         v1 = v_node
         v2 = v_host
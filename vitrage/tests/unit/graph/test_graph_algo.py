@@ -20,6 +20,7 @@ Tests for `vitrage` graph driver algorithms
 """
 from vitrage.common.constants import VertexProperties as VProps
 from vitrage.graph import create_algorithm, Mapping, Direction  # noqa
+from vitrage.graph import Vertex
 from vitrage.tests.unit.graph.base import *  # noqa
 
 
@@ -136,6 +137,117 @@ class GraphAlgorithmTest(GraphTestBase):
         self.assertEqual(1, subgraph.num_vertices(),
                          'num of BOTH vertices Node (depth 3)')
 
+    def test_graph_query_vertices_union(self):
+        ga = create_algorithm(self.entity_graph)
+        host_id = self.entity_graph.neighbors(
+            v_node.vertex_id,
+            {VProps.TYPE: NOVA_HOST_DATASOURCE}).pop().vertex_id
+
+        for query in ({'!=': {'NOTHING': 'IS EVERYTHING'}},
+                      {'or': [{'==': {VProps.CATEGORY: ALARM}},
+                              {'==': {VProps.TYPE: NOVA_HOST_DATASOURCE}}]}):
+            expected = ga.graph_query_vertices(
+                query_dict=query, root_id=host_id, direction=Direction.IN)
+            expected.union(ga.graph_query_vertices(
+                query_dict=query, root_id=host_id, direction=Direction.OUT))
+
+            subgraph = ga.graph_query_vertices_union(
+                query_dict=query, root_id=host_id,
+                directions=(Direction.IN, Direction.OUT))
+            self.assertEqual(expected.num_vertices(), subgraph.num_vertices())
+            self.assertEqual(expected.num_edges(), subgraph.num_edges())
+            self.assertEqual(
+                sorted(v.vertex_id for v in expected.get_vertices()),
+                sorted(v.vertex_id for v in subgraph.get_vertices()))
+
+    def test_graph_query_vertices_unions(self):
+        ga = create_algorithm(self.entity_graph)
+        hosts = self.entity_graph.get_vertices(
+            {VProps.TYPE: NOVA_HOST_DATASOURCE})
+        root_ids = [hosts[0].vertex_id, hosts[1].vertex_id,
+                    v_node.vertex_id, 'unknown vertex'] + \
+            [v.vertex_id for v in self.entity_graph.neighbors(
+                hosts[0].vertex_id, {VProps.CATEGORY: ALARM})][:2]
+        query = {'or': [{'==': {VProps.CATEGORY: ALARM}},
+                        {'==': {VProps.TYPE: NOVA_HOST_DATASOURCE}}]}
+
+        graphs = ga.graph_query_vertices_unions(query_dict=query,
+                                                root_ids=root_ids)
+        self.assertEqual(set(root_ids), set(graphs))
+        self.assertEqual(0, graphs['unknown vertex'].num_vertices())
+        self.assertEqual(0, graphs[v_node.vertex_id].num_vertices(),
+                         'root that does not match')
+        for root_id in root_ids[:2] + root_ids[4:]:
+            expected = ga.graph_query_vertices_union(query_dict=query,
+                                                     root_id=root_id)
+            self.assertEqual(
+                sorted(v.vertex_id for v in expected.get_vertices()),
+                sorted(v.vertex_id for v in graphs[root_id].get_vertices()))
+            self.assertEqual(expected.num_edges(),
+                             graphs[root_id].num_edges())
+
+    def test_graph_query_vertices_unions_components(self):
+        # A -> B -> C -> A, D -> B, F -> D, and E alone; G does not match
+        g = create_graph('test_graph_query_vertices_unions_components')
+        for name in 'ABCDEFG':
+            g.add_vertex(Vertex(name, {VProps.CATEGORY: ALARM if name != 'G'
+                                       else RESOURCE}))
+        for source, target in ('AB', 'BC', 'CA', 'DB', 'FD', 'GD', 'EE'):
+            g.add_edge(graph_utils.create_edge(source, target, 'causes'))
+        ga = create_algorithm(g)
+        query = {'==': {VProps.CATEGORY: ALARM}}
+
+        root_ids = list('ABCDEFG')
+        for directions in ((Direction.IN, Direction.OUT),
+                           (Direction.OUT,),
+                           (Direction.BOTH,)):
+            graphs = ga.graph_query_vertices_unions(query_dict=query,
+                                                    root_ids=root_ids,
+                                                    directions=directions)
+            for root_id in root_ids:
+                expected = ga.graph_query_vertices_union(
+                    query_dict=query, root_id=root_id, directions=directions)
+                self.assertEqual(
+                    sorted((e.source_id, e.target_id)
+                           for v in expected.get_vertices()
+                           for e in expected.get_edges(
+                               v.vertex_id, direction=Direction.OUT)),
+                    sorted((e.source_id, e.target_id)
+                           for v in graphs[root_id].get_vertices()
+                           for e in graphs[root_id].get_edges(
+                               v.vertex_id, direction=Direction.OUT)),
+                    'edges of %s in %s' % (root_id, directions))
+                self.assertEqual(
+                    sorted(v.vertex_id for v in expected.get_vertices()),
+                    [v.vertex_id for v in graphs[root_id].get_vertices()],
+                    'vertices of %s in %s, in order' % (root_id, directions))
+
+    def test_graph_query_vertices_snapshot(self):
+        graph = self.entity_graph.copy()
+        ga = create_algorithm(graph)
+        query = {'!=': {VProps.TYPE: NOVA_INSTANCE_DATASOURCE}}
+
+        def _query(algorithm, depth, direction):
+            subgraph = algorithm.graph_query_vertices(
+                query_dict=query, depth=depth, direction=direction)
+            return (sorted(v.vertex_id for v in subgraph.get_vertices()),
+                    subgraph.num_edges())
+
+        expected = {(depth, direction): _query(ga, depth, direction)
+                    for depth in (None, 1, 2)
+                    for direction in (Direction.BOTH, Direction.OUT)}
+        self.assertLess(len(expected[(1, Direction.BOTH)][0]),
+                        len(expected[(2, Direction.BOTH)][0]))
+
+        with graph.snapshot() as snapshot:
+            # Changes after the snapshot are not traversed
+            graph.remove_vertex(graph.get_vertices(
+                {VProps.TYPE: NOVA_HOST_DATASOURCE})[0])
+            snapshot_ga = create_algorithm(snapshot)
+            for (depth, direction), result in expected.items():
+                self.assertEqual(result,
+                                 _query(snapshot_ga, depth, direction))
+
     def test_no_match_graph_query_vertices(self):
         ga = create_algorithm(self.entity_graph)
 
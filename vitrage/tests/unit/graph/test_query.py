@@ -0,0 +1,132 @@
+# Copyright 2016 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from vitrage.common.exception import VitrageError
+from vitrage.graph.query import create_predicate
+from vitrage.graph.query import predicate_cache
+from vitrage.graph.query import range_key
+from vitrage.tests import base
+
+
+class TestQuery(base.BaseTest):
+
+    QUERY = {
+        'and': [
+            {'==': {'TYPE': 'ALARM'}},
+            {'or': [
+                {'>': {'TIME': 150}},
+                {'==': {'IS_DELETED': True}}
+            ]}
+        ]
+    }
+
+    def setUp(self):
+        super(TestQuery, self).setUp()
+        predicate_cache.clear()
+
+    def test_create_predicate(self):
+        match = create_predicate(self.QUERY)
+        self.assertTrue(match({'TYPE': 'ALARM', 'TIME': 200}))
+        self.assertTrue(match({'TYPE': 'ALARM', 'TIME': 100,
+                               'IS_DELETED': True}))
+        self.assertFalse(match({'TYPE': 'ALARM', 'TIME': 100,
+                                'IS_DELETED': False}))
+        self.assertFalse(match({'TYPE': "RESOURCE'S", 'TIME': 200}))
+
+        match = create_predicate({'!=': {'TYPE': 'ALARM', 'STATE': 'OK'}})
+        self.assertTrue(match({'TYPE': 'RESOURCE'}))
+        self.assertFalse(match({'TYPE': 'RESOURCE', 'STATE': 'OK'}))
+        self.assertFalse(create_predicate({'and': []})({}))
+
+        self.assertRaises(VitrageError, create_predicate, {'=': {'A': 1}})
+        self.assertRaises(VitrageError, create_predicate, {'and': {'A': 1}})
+        self.assertRaises(VitrageError, create_predicate, {'==': ['A']})
+
+    def test_membership_and_existence_operators(self):
+        match = create_predicate({'in': {'TYPE': ['nova.host', 'nova.zone']}})
+        self.assertTrue(match({'TYPE': 'nova.zone'}))
+        self.assertFalse(match({'TYPE': 'nova.instance'}))
+        self.assertFalse(match({}))
+        self.assertFalse(match({'TYPE': ['nova.zone']}), 'unhashable value')
+
+        match = create_predicate({'not in': {'TYPE': ['nova.host']}})
+        self.assertTrue(match({'TYPE': 'nova.zone'}))
+        self.assertFalse(match({'TYPE': 'nova.host'}))
+        self.assertTrue(match({'TYPE': ['nova.host']}), 'unhashable value')
+
+        match = create_predicate({'exists': {'STATE': True}})
+        self.assertTrue(match({'STATE': 'OK'}))
+        self.assertFalse(match({'STATE': None}))
+        self.assertTrue(create_predicate({'exists': {'STATE': False}})({}))
+
+        match = create_predicate({'startswith': {'NAME': 'compute-'}})
+        self.assertTrue(match({'NAME': 'compute-1'}))
+        self.assertFalse(match({'NAME': 'network-1'}))
+        self.assertFalse(match({'NAME': 1}))
+
+        self.assertRaises(VitrageError, create_predicate,
+                          {'in': {'TYPE': 'nova.host'}})
+        self.assertIs(create_predicate({'in': {'TYPE': ['a', 'b']}}),
+                      create_predicate({'in': {'TYPE': ['b', 'a', 'b']}}),
+                      'cached by the set of values')
+
+    def test_timestamp_range(self):
+        self.assertEqual('2016-02-07 15:26:04.000000',
+                         range_key('2016-02-07T15:26:04Z'))
+        self.assertEqual('2016-02-07 15:26:04.500000',
+                         range_key('2016-02-07 15:26:04.5+00:00'))
+        self.assertEqual('compute-1', range_key('compute-1'))
+
+        match = create_predicate(
+            {'<': {'TIME': '2016-02-07 15:26:04.100000'}})
+        self.assertTrue(match({'TIME': '2016-02-07T15:26:04Z'}),
+                        'earlier, in another format')
+        self.assertTrue(match({'TIME': '2016-02-07 15:26:04.05'}))
+        self.assertFalse(match({'TIME': '2016-02-07 15:26:04.2'}))
+        self.assertFalse(match({'TIME': '2016-02-07T15:26:05'}))
+
+        match = create_predicate({'>=': {'NAME': 'compute-2'}})
+        self.assertTrue(match({'NAME': 'compute-3'}))
+        self.assertFalse(match({'NAME': 'compute-1'}))
+
+    def test_predicate_cache(self):
+        match = create_predicate(self.QUERY)
+        self.assertEqual((0, 1), (predicate_cache.hits,
+                                  predicate_cache.misses))
+
+        # The same query, with the keys of the comparisons in any order
+        self.assertIs(match, create_predicate(self.QUERY))
+        query = {'==': {'TYPE': 'ALARM', 'STATE': 'OK'}}
+        match = create_predicate(query)
+        self.assertIs(match, create_predicate(
+            {'==': {'STATE': 'OK', 'TYPE': 'ALARM'}}))
+        self.assertEqual((2, 2), (predicate_cache.hits,
+                                  predicate_cache.misses))
+
+        # Values of different types are not mixed
+        self.assertIsNot(create_predicate({'==': {'A': 1}}),
+                         create_predicate({'==': {'A': True}}))
+
+        # Unhashable values are compiled, not cached
+        self.assertTrue(create_predicate({'==': {'A': [1]}})({'A': [1]}))
+        self.assertEqual(4, len(predicate_cache))
+
+        # The least recently used predicates are dropped
+        self.addCleanup(setattr, predicate_cache, 'maxsize',
+                        predicate_cache.maxsize)
+        predicate_cache.maxsize = 2
+        create_predicate(query)
+        create_predicate({'==': {'B': 1}})
+        self.assertEqual(2, len(predicate_cache))
+        self.assertIs(match, create_predicate(query))